@@ -14,6 +14,8 @@ os.makedirs(os.path.join(os.path.dirname(__file__), '..', '..', 'data'), exist_o
 db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'emails.json')
 db = TinyDB(db_path)
 emails_table = db.table('emails')
+# Idempotency keys of replies sent through batches, with the ID of the reply they created
+sent_keys_table = db.table('sent_keys')
 
 # Query object
 Email = Query()
@@ -67,6 +69,22 @@ def get_all_emails(folder: Optional[str] = None) -> List[Dict[str, Any]]:
         return emails_table.search(Email.folder == folder)
     return emails_table.all()
 
+def search_emails(folder: Optional[str] = None, is_read: Optional[bool] = None, ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Get the emails matching every given filter (all emails if no filter is given)"""
+    conditions = []
+    if folder:
+        conditions.append(Email.folder == folder)
+    if is_read is not None:
+        conditions.append(Email.is_read == is_read)
+    if ids is not None:
+        conditions.append(Email.id.one_of(ids))
+    if not conditions:
+        return emails_table.all()
+    condition = conditions[0]
+    for other in conditions[1:]:
+        condition = condition & other
+    return emails_table.search(condition)
+
 def get_email_by_id(email_id: str) -> Optional[Dict[str, Any]]:
     """Get a specific email by ID"""
     results = emails_table.search(Email.id == email_id)
@@ -96,4 +114,63 @@ def delete_email(email_id: str) -> bool:
 def mark_email_as_read(email_id: str) -> Optional[Dict[str, Any]]:
     """Mark an email as read"""
     emails_table.update(set('is_read', True), Email.id == email_id)
-    return get_email_by_id(email_id) 
\ No newline at end of file
+    return get_email_by_id(email_id) 
+
+def apply_batch(replies: List[Dict[str, Any]], read_states: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Send replies and change read states in one write per table.
+    
+    A reply whose idempotency key was already used is not sent again; its
+    result points at the reply that was created the first time.
+    """
+    ids = {item["email_id"] for item in replies} | {item["email_id"] for item in read_states}
+    originals = {email["id"]: email for email in emails_table.search(Email.id.one_of(list(ids)))}
+    keys = [item["idempotency_key"] for item in replies if item.get("idempotency_key")]
+    sent = {row["key"]: row["reply_id"] for row in sent_keys_table.search(Query().key.one_of(keys))}
+    
+    reply_results, new_emails, new_keys = [], [], []
+    for item in replies:
+        original = originals.get(item["email_id"])
+        key = item.get("idempotency_key")
+        if original is None:
+            reply_results.append({"email_id": item["email_id"], "status": "not_found"})
+        elif key and key in sent:
+            reply_results.append({"email_id": item["email_id"], "status": "duplicate", "reply_id": sent[key]})
+        else:
+            subject = original["subject"]
+            if not subject.startswith("RE: "):
+                subject = f"RE: {subject}"
+            reply = {
+                "id": generate_email_id(),
+                "timestamp": datetime.now().isoformat(),
+                "is_read": False,
+                "attachments": [],
+                "sender": original["recipient"],
+                "recipient": original["sender"],
+                "subject": subject,
+                "body": item["body"],
+                "folder": "sent"
+            }
+            new_emails.append(reply)
+            if key:
+                sent[key] = reply["id"]
+                new_keys.append({"key": key, "reply_id": reply["id"]})
+            reply_results.append({"email_id": item["email_id"], "status": "created", "reply_id": reply["id"]})
+    if new_emails:
+        emails_table.insert_multiple(new_emails)
+    if new_keys:
+        sent_keys_table.insert_multiple(new_keys)
+    
+    read_results = []
+    changes = {True: [], False: []}
+    for item in read_states:
+        if item["email_id"] in originals:
+            changes[item["is_read"]].append(item["email_id"])
+            read_results.append({"email_id": item["email_id"], "status": "updated"})
+        else:
+            read_results.append({"email_id": item["email_id"], "status": "not_found"})
+    for is_read, email_ids in changes.items():
+        if email_ids:
+            emails_table.update(set('is_read', is_read), Email.id.one_of(email_ids))
+    
+    return {"replies": reply_results, "read_states": read_results}
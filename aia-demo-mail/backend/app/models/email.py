@@ -29,6 +29,33 @@ class EmailResponse(EmailBase):
     class Config:
         from_attributes = True
 
+class BatchReply(BaseModel):
+    """A reply to send as part of a batch"""
+    email_id: str
+    body: str
+    idempotency_key: Optional[str] = None
+
+class BatchReadState(BaseModel):
+    """A read-state change as part of a batch"""
+    email_id: str
+    is_read: bool = True
+
+class BatchWrite(BaseModel):
+    """Replies and read-state changes applied in one request"""
+    replies: List[BatchReply] = []
+    read_states: List[BatchReadState] = []
+
+class BatchItemResult(BaseModel):
+    """Outcome of one item of a batch"""
+    email_id: str
+    status: Literal["created", "updated", "duplicate", "not_found"]
+    reply_id: Optional[str] = None
+
+class BatchWriteResponse(BaseModel):
+    """Outcome of every item of a batch, in request order"""
+    replies: List[BatchItemResult] = []
+    read_states: List[BatchItemResult] = []
+
 def generate_email_id() -> str:
     """Generate a unique ID for an email"""
     return str(uuid.uuid4()) 
\ No newline at end of file
@@ -1,15 +1,26 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from typing import List, Optional
 
-from app.models.email import EmailCreate, EmailUpdate, EmailResponse
+from app.models.email import EmailCreate, EmailUpdate, EmailResponse, BatchWrite, BatchWriteResponse
 from app.database import db
 
 router = APIRouter()
 
 @router.get("/emails", response_model=List[EmailResponse])
-async def get_emails(folder: Optional[str] = Query(None, description="Filter emails by folder (inbox or sent)")):
+async def get_emails(
+    response: Response,
+    folder: Optional[str] = Query(None, description="Filter emails by folder (inbox or sent)"),
+    is_read: Optional[bool] = Query(None, description="Filter emails by read state"),
+    ids: Optional[List[str]] = Query(None, description="Only return the emails with these IDs"),
+    offset: int = Query(0, ge=0, description="Number of emails to skip"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of emails to return")
+):
     """
-    Get all emails, optionally filtered by folder.
+    Get all emails, optionally filtered by folder, read state or IDs.
+    
+    Emails are sorted newest first and can be fetched in pages with offset and
+    limit. The number of matching emails is returned in the X-Total-Count
+    header. Unlike getting a single email, this does not mark emails as read.
     """
     if folder and folder not in ["inbox", "sent"]:
         raise HTTPException(
@@ -17,10 +28,27 @@ async def get_emails(folder: Optional[str] = Query(None, description="Filter ema
             detail="Folder must be either 'inbox' or 'sent'"
         )
     
-    emails = db.get_all_emails(folder)
+    emails = db.search_emails(folder, is_read=is_read, ids=ids)
     # Sort emails by timestamp (newest first)
     emails.sort(key=lambda x: x["timestamp"], reverse=True)
-    return emails
+    response.headers["X-Total-Count"] = str(len(emails))
+    if limit is None:
+        return emails[offset:]
+    return emails[offset:offset + limit]
+
+@router.post("/emails/batch", response_model=BatchWriteResponse)
+async def write_batch(batch: BatchWrite):
+    """
+    Send replies and mark emails as read or unread in one request.
+    
+    Every reply goes to the sender of the email it answers and ends up in the
+    sent folder. Replies carrying an idempotency key that was used before are
+    not sent again, so a client can safely retry a batch.
+    """
+    return db.apply_batch(
+        [reply.model_dump() for reply in batch.replies],
+        [state.model_dump() for state in batch.read_states]
+    )
 
 @router.get("/emails/{email_id}", response_model=EmailResponse)
 async def get_email(email_id: str):
@@ -216,8 +216,9 @@ export const AutomatePopup: React.FC<AutomatePopupProps> = ({ isOpen, onClose })
         headers: {
           'Content-Type': 'application/json',
         },
+        // Only the IDs are sent; the agent service fetches the emails from the mail backend
         body: JSON.stringify({
-          emails: emailsToProcess,
+          email_ids: emailsToProcess.map(email => email.id),
           action_level: actionLevel
         }),
       });
@@ -55,7 +55,8 @@ interface Operation {
 
 interface JobStatusResponse {
   job_id: string;
-  status: "initialized" | "processing" | "completed" | "error";
+  status: "queued" | "initialized" | "processing" | "completed" | "error" | "cancelled" | "timed_out";
+  version: number;
   total_emails: number;
   processed_emails: number;
   human_review_count: number;
@@ -93,6 +94,11 @@ export const ProcessingStatusRefactored: React.FC<ProcessingStatusProps> = ({
   const [showActions, setShowActions] = useState(false);
   const jobCompletedRef = useRef(false);
   const pollingIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  const eventSourceRef = useRef<EventSource | null>(null);
+  // Polling state: the last ETag, and the operations and status received so far
+  const etagRef = useRef<string | null>(null);
+  const operationsRef = useRef<Operation[]>([]);
+  const statusRef = useRef<Partial<JobStatusResponse>>({});
 
   // Function to mark emails as read
   const markEmailsAsRead = async (operations: Operation[]) => {
@@ -123,14 +129,32 @@ export const ProcessingStatusRefactored: React.FC<ProcessingStatusProps> = ({
     if (jobCompletedRef.current) return;
     
     try {
-      const response = await fetch(`http://localhost:4000/job-status/${jobId}`);
-      const data = await response.json();
+      // Ask only for what changed since the last poll
+      const headers: Record<string, string> = {};
+      if (etagRef.current) {
+        headers["If-None-Match"] = etagRef.current;
+      }
+      const response = await fetch(
+        `http://localhost:4000/job-status/${jobId}?since_operation=${operationsRef.current.length}`,
+        { headers }
+      );
+      
+      // Nothing changed since the last poll
+      if (response.status === 304) return;
+      
+      const delta = await response.json();
+      etagRef.current = response.headers.get("ETag");
+      // After a restart of the job the delta is its full state, which replaces ours
+      const previous = delta.reset ? {} : statusRef.current;
+      operationsRef.current = delta.reset ? delta.operations : [...operationsRef.current, ...delta.operations];
+      const data = { ...previous, ...delta, operations: operationsRef.current } as JobStatusResponse;
+      statusRef.current = data;
       
       setJobStatus(data);
       setIsLoading(false);
       
       // Check if job is completed or has error
-      if (data.status === "completed" || data.status === "error") {
+      if (["completed", "error", "cancelled", "timed_out"].includes(data.status)) {
         jobCompletedRef.current = true;
         
         // Clear polling interval
@@ -146,7 +170,7 @@ export const ProcessingStatusRefactored: React.FC<ProcessingStatusProps> = ({
       }
       
       // Set error if job has error
-      if (data.status === "error" && data.error) {
+      if (data.status !== "completed" && data.error) {
         setError(data.error);
       }
     } catch (error) {
@@ -156,18 +180,80 @@ export const ProcessingStatusRefactored: React.FC<ProcessingStatusProps> = ({
     }
   };
 
-  // Set up polling for job status
-  useEffect(() => {
+  // Start polling for job status (used when server-sent events are unavailable)
+  const startPolling = () => {
+    if (pollingIntervalRef.current) return;
+    
     // Initial fetch
     fetchJobStatus();
     
     // Set up polling interval (every 3 seconds)
     pollingIntervalRef.current = setInterval(fetchJobStatus, 3000);
+  };
+
+  // Subscribe to job events, falling back to polling
+  useEffect(() => {
+    if (typeof EventSource === "undefined") {
+      startPolling();
+    } else {
+      // The browser reconnects on its own and resumes via Last-Event-ID
+      const source = new EventSource(`http://localhost:4000/job-events/${jobId}`);
+      eventSourceRef.current = source;
+      let operations: Operation[] = [];
+      let receivedEvent = false;
+      
+      const applyState = (state: Partial<JobStatusResponse>) => {
+        receivedEvent = true;
+        setJobStatus(prev => ({
+          ...(prev || { job_id: jobId, review_report: "" }),
+          ...state,
+          job_id: jobId,
+          operations
+        } as JobStatusResponse));
+        setIsLoading(false);
+      };
+      
+      source.addEventListener("operation", (event) => {
+        operations = [...operations, JSON.parse((event as MessageEvent).data)];
+        applyState({});
+      });
+      
+      source.addEventListener("state", (event) => {
+        applyState(JSON.parse((event as MessageEvent).data));
+      });
+      
+      source.addEventListener("end", async (event) => {
+        const state = JSON.parse((event as MessageEvent).data);
+        source.close();
+        jobCompletedRef.current = true;
+        applyState(state);
+        
+        if (state.status === "completed") {
+          await markEmailsAsRead(operations);
+        }
+        if (state.status !== "completed" && state.error) {
+          setError(state.error);
+        }
+      });
+      
+      source.onerror = () => {
+        // If the stream never worked, fall back to polling
+        if (!receivedEvent && !jobCompletedRef.current) {
+          source.close();
+          startPolling();
+        }
+      };
+    }
     
     // Clean up on unmount
     return () => {
+      if (eventSourceRef.current) {
+        eventSourceRef.current.close();
+        eventSourceRef.current = null;
+      }
       if (pollingIntervalRef.current) {
         clearInterval(pollingIntervalRef.current);
+        pollingIntervalRef.current = null;
       }
     };
   }, [jobId]);
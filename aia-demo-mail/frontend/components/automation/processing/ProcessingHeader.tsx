@@ -5,21 +5,23 @@ import { Chip } from "@heroui/react";
 import { CheckCircle2, Clock } from "lucide-react";
 
 interface ProcessingHeaderProps {
-  status: "initialized" | "processing" | "completed" | "error";
+  status: "queued" | "initialized" | "processing" | "completed" | "error" | "cancelled" | "timed_out";
   jobId: string;
 }
 
 export const ProcessingHeader: React.FC<ProcessingHeaderProps> = ({ status, jobId }) => {
   const isCompleted = status === "completed";
+  // Cancelled and timed out jobs keep their partial results
+  const isStopped = status === "cancelled" || status === "timed_out";
   
   return (
     <div className="flex items-center justify-between">
       <div className="flex items-center gap-2">
         <h3 className="text-lg font-medium">
-          {isCompleted ? "Processing Complete" : "Processing Emails"}
+          {isCompleted ? "Processing Complete" : isStopped ? "Processing Stopped" : "Processing Emails"}
         </h3>
         <Chip 
-          color={isCompleted ? "success" : "primary"} 
+          color={isCompleted ? "success" : isStopped ? "warning" : "primary"} 
           variant="flat"
           startContent={
             isCompleted ? 
@@ -28,7 +30,7 @@ export const ProcessingHeader: React.FC<ProcessingHeaderProps> = ({ status, jobI
           }
           size="sm"
         >
-          {isCompleted ? "Complete" : "In Progress"}
+          {isCompleted ? "Complete" : status === "cancelled" ? "Cancelled" : status === "timed_out" ? "Timed Out" : "In Progress"}
         </Chip>
       </div>
       <Chip variant="flat" size="sm">Job ID: {jobId.slice(0, 8)}</Chip>
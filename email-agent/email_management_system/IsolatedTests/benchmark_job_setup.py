@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from agents import set_default_openai_key
+from agents.models.multi_provider import MultiProvider
+
+from ..models.email_models import Email, EmailContext
+from ..magents.model_client import configure_model_client, close_model_client
+from ..main import EmailManagementSystem
+
+MODEL_NAME = "o1-2024-12-17"
+
+def make_emails(count: int):
+    """Create a synthetic mailbox."""
+    return [
+        Email(
+            id=str(uuid.uuid4()),
+            sender=f"sender{i}@example.com",
+            recipient="user@example.com",
+            subject=f"Message {i}",
+            body="Hello, this is a sample email used to measure job setup time.",
+            timestamp="2025-03-14T10:15:20.123456",
+            is_read=False,
+            folder="inbox",
+            attachments=[]
+        )
+        for i in range(count)
+    ]
+
+def setup_per_job(emails, api_key: str):
+    """The setup every job used to do: build the whole system, set the key and get a fresh model client."""
+    system = EmailManagementSystem()
+    set_default_openai_key(api_key)
+    context = EmailContext(emails)
+    # Without a default client each run's provider creates its own OpenAI client
+    MultiProvider().get_model(MODEL_NAME)
+    return system, context
+
+def setup_shared(system, emails):
+    """The setup a job does now: only its own context; the provider reuses the shared client."""
+    context = EmailContext(emails)
+    MultiProvider().get_model(MODEL_NAME)
+    return system, context
+
+async def run_benchmark(jobs: int, emails_per_job: int):
+    # No requests are sent, so any key will do
+    api_key = os.getenv("OPENAI_API_KEY", "sk-benchmark")
+    emails = make_emails(emails_per_job)
+
+    start = time.perf_counter()
+    for _ in range(jobs):
+        system, _ = setup_per_job(emails, api_key)
+        system.close()
+    before = (time.perf_counter() - start) / jobs
+
+    start = time.perf_counter()
+    configure_model_client(api_key)
+    shared_system = EmailManagementSystem()
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(jobs):
+        setup_shared(shared_system, emails)
+    after = (time.perf_counter() - start) / jobs
+
+    shared_system.close()
+    await close_model_client()
+
+    print("\n=== Per-job setup overhead ===")
+    print(f"Jobs: {jobs}, emails per job: {emails_per_job}")
+    print(f"Before (system built per job): {before * 1000:.3f} ms/job")
+    print(f"After (shared system and client): {after * 1000:.3f} ms/job")
+    print(f"One-time startup cost: {startup * 1000:.3f} ms")
+    if after > 0:
+        print(f"Speedup: {before / after:.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-job setup overhead of the email management system")
+    parser.add_argument("--jobs", type=int, default=50, help="Number of jobs to set up")
+    parser.add_argument("--emails", type=int, default=20, help="Emails per job")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.jobs, args.emails))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from agents import set_tracing_disabled
+
+from ..models.email_models import Email, EmailContext
+from ..magents.manager_agent import ManagerAgent
+from ..magents.router import ModelRouter
+from .fake_model import FakeModelProvider
+
+# Synthetic mailbox mix: (weight, subjects, bodies)
+MAILBOX_MIX = [
+    (0.35, ["Weekly newsletter #{n}", "Your digest for week {n}"], "Here are this week's top stories. Click here to unsubscribe."),
+    (0.2, ["Big sale: {n}% off", "Exclusive offer {n} inside"], "Limited time promo on everything. Don't miss this deal."),
+    (0.2, ["Your order {n} has shipped", "Password changed on account {n}"], "This is an automated notification, no action is required."),
+    (0.2, ["Question about order {n}", "Meeting on project {n}", "Invoice {n} for March"], "Hi, could you take a look at this when you have a moment? Thanks."),
+    (0.05, ["Contract review {n}", "Confidential: proposal {n}"], "Please review the attached confidential contract before Friday. " * 20),
+]
+
+def make_mailbox(count: int, seed: int = 0):
+    """Create a deterministic synthetic mailbox with a realistic mix of emails."""
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in MAILBOX_MIX]
+    emails = []
+    for i in range(count):
+        _, subjects, body = rng.choices(MAILBOX_MIX, weights)[0]
+        emails.append(Email(
+            id=f"bench-{seed}-{i}",
+            sender=f"sender{rng.randrange(50)}@example.com",
+            recipient="user@example.com",
+            subject=rng.choice(subjects).format(n=rng.randrange(1, 100)),
+            body=body,
+            timestamp=f"2025-03-{1 + i % 28:02d}T10:15:20",
+            is_read=False,
+            folder="inbox",
+            attachments=[]
+        ))
+    return emails
+
+# How the manager classifies: tool calls, or one structured-output turn per chunk
+CLASSIFICATION_MODES = {"tools": False, "structured": True}
+
+async def run_pipeline(count: int, latency: float, reasoning_latency: float, parallel_automation: bool, seed: int, structured_output: bool = False):
+    """Run the whole manager pipeline on a synthetic mailbox against the fake model."""
+    provider = FakeModelProvider(latency_seconds=latency, latencies={"reasoning": reasoning_latency})
+    manager = ManagerAgent(
+        pre_classifiers=[],
+        router=ModelRouter("fast", "reasoning"),
+        model_provider=provider,
+        parallel_automation=parallel_automation,
+        structured_output=structured_output
+    )
+    emails = make_mailbox(count, seed)
+    context = EmailContext(emails)
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = await manager.process_emails(emails, context)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    stats = provider.stats
+    busy = stats.busy_seconds()
+    return {
+        "emails": count,
+        "error": result.get("error"),
+        "classified": len(context.human_review_ids) + len(context.automation_ids),
+        # Emails the model saw after the pre-classifiers and near-duplicate clustering
+        "to_model": context.public_state.get("near_duplicates", {}).get("sent_to_model", count),
+        "actions": len(context.automation_results),
+        "turns": stats.turns,
+        "tool_calls": stats.tool_calls,
+        "tokens": stats.input_tokens + stats.output_tokens,
+        "wall_seconds": wall,
+        "model_seconds": busy,
+        "code_seconds": max(wall - busy, 0.0),
+        "cpu_seconds": cpu
+    }
+
+async def run_benchmark(sizes, latency: float, reasoning_latency: float, parallel_automation: bool, seed: int, classification=("tools",)):
+    # The fake model never leaves the process, so there is nothing to trace
+    set_tracing_disabled(True)
+    mode = "parallel automation" if parallel_automation else "handoff"
+
+    print("\n=== Agent pipeline (offline fake model) ===")
+    print(f"Mode: {mode}, latency: {latency * 1000:.0f} ms fast / {reasoning_latency * 1000:.0f} ms reasoning, seed: {seed}")
+    print(f"{'classify':>10} {'emails':>7} {'to model':>9} {'turns':>6} {'tools':>6} {'tokens':>8} {'wall s':>8} {'model s':>8} {'code s':>8} {'cpu s':>7} {'code ms/email':>14}")
+    for size, name in itertools.product(sizes, classification):
+        r = await run_pipeline(size, latency, reasoning_latency, parallel_automation, seed, CLASSIFICATION_MODES[name])
+        print(
+            f"{name:>10} {r['emails']:>7} {r['to_model']:>9} {r['turns']:>6} {r['tool_calls']:>6} {r['tokens']:>8} {r['wall_seconds']:>8.3f} "
+            f"{r['model_seconds']:>8.3f} {r['code_seconds']:>8.3f} {r['cpu_seconds']:>7.3f} "
+            f"{r['code_seconds'] / size * 1000:>14.3f}"
+        )
+        if r["error"] or r["classified"] != size:
+            print(f"  warning: {r['classified']}/{size} emails classified, error: {r['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline offline with a deterministic fake model")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500], help="Mailbox sizes to run")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fast model call")
+    parser.add_argument("--reasoning-latency", type=float, default=0.2, help="Seconds per reasoning model call")
+    parser.add_argument("--handoff", action="store_true", help="Use the automation handoff instead of parallel automation runs")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic mailbox")
+    parser.add_argument(
+        "--classification", nargs="+", choices=list(CLASSIFICATION_MODES), default=list(CLASSIFICATION_MODES),
+        help="Classification modes to compare: tool calls and/or one structured-output turn per chunk"
+    )
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.sizes, args.latency, args.reasoning_latency, not args.handoff, args.seed, args.classification))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from agents.items import ModelResponse
+from agents.models.interface import Model, ModelProvider
+from agents.models.multi_provider import MultiProvider
+from agents.usage import Usage
+from openai.types.responses import Response, ResponseCompletedEvent, ResponseOutputItem, ResponseUsage
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+from pydantic import TypeAdapter
+
+# Where cassettes are stored, one JSON file per recorded model call
+CASSETTE_DIR = os.getenv("EMAIL_CASSETTE_DIR", os.path.join(os.path.dirname(__file__), "cassettes"))
+
+# "replay": only replay (a missing cassette is an error), "record": always call the model and
+# (re)record, "auto": replay when a cassette exists and record otherwise
+CASSETTE_MODE = os.getenv("EMAIL_CASSETTE_MODE", "replay")
+CASSETTE_MODES = ("replay", "record", "auto")
+
+# Sample emails get fresh uuid4 ids on every run, so ids are replaced by placeholders
+_UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+_PLACEHOLDER = re.compile(r"<uuid:(\d+)>")
+_OUTPUT_ITEM = TypeAdapter(ResponseOutputItem)
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when no cassette matches a model request."""
+
+class RequestNormalizer:
+    """
+    Turns a model request into a stable form for hashing.
+
+    Run-specific values are replaced: uuids become <uuid:n> and call ids
+    become call_n in order of first appearance, and item ids are dropped.
+    The same mapping is used to store responses with placeholders and to
+    put this run's values back into a replayed response.
+    """
+
+    def __init__(self):
+        self.uuids: Dict[str, str] = {}
+
+    def _uuid(self, match: re.Match) -> str:
+        return self.uuids.setdefault(match.group(0), f"<uuid:{len(self.uuids) + 1}>")
+
+    def text(self, value: str) -> str:
+        return _UUID.sub(self._uuid, value)
+
+    def restore(self, value: str) -> str:
+        originals = {placeholder: original for original, placeholder in self.uuids.items()}
+        return _PLACEHOLDER.sub(lambda m: originals.get(m.group(0), m.group(0)), value)
+
+    def request(self, model_name: str, system_instructions, input, model_settings, tools, output_schema, handoffs) -> Dict[str, Any]:
+        items = [{"role": "user", "content": input}] if isinstance(input, str) else [
+            item if isinstance(item, dict) else item.model_dump(exclude_none=True) for item in input
+        ]
+        call_ids: Dict[str, str] = {}
+        normalized = []
+        for item in items:
+            item = {key: value for key, value in item.items() if key != "id"}
+            if "call_id" in item:
+                item["call_id"] = call_ids.setdefault(item["call_id"], f"call_{len(call_ids) + 1}")
+            normalized.append(item)
+
+        request = {
+            "model": model_name,
+            "system_instructions": system_instructions or "",
+            "input": normalized,
+            "model_settings": model_settings.to_json_dict() if model_settings is not None else None,
+            "tools": [
+                {"name": tool.name, "parameters": getattr(tool, "params_json_schema", None)} for tool in tools
+            ],
+            "handoffs": [handoff.tool_name for handoff in handoffs],
+            "output_schema": output_schema.name() if output_schema is not None else None
+        }
+        return json.loads(self.text(json.dumps(request, sort_keys=True, default=str)))
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Hash of a normalized request, used as the cassette file name."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+@dataclass
+class CassetteStats:
+    """Counters shared by every model of a provider."""
+    replayed: int = 0
+    recorded: int = 0
+    model_seconds: float = 0.0  # time spent waiting for real model calls
+    misses: List[str] = field(default_factory=list)
+
+class CassetteModel(Model):
+    """
+    Records the responses of a real model to cassettes and replays them.
+
+    The real model is only created on the first call that needs it, so
+    replaying needs no API key and never touches the network.
+    """
+
+    def __init__(self, name: Optional[str], provider: "CassetteProvider"):
+        self.name = name or "default"
+        self.model_name = name
+        self.provider = provider
+        self._model: Optional[Model] = None
+
+    def _real_model(self) -> Model:
+        if self._model is None:
+            self._model = self.provider.provider.get_model(self.model_name)
+        return self._model
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.provider.cassette_dir, self.name.replace("/", "_"), f"{key}.json")
+
+    def _lookup(self, system_instructions, input, model_settings, tools, output_schema, handoffs) -> Tuple[RequestNormalizer, Dict[str, Any], str, Optional[Dict[str, Any]]]:
+        normalizer = RequestNormalizer()
+        request = normalizer.request(self.name, system_instructions, input, model_settings, tools, output_schema, handoffs)
+        key = request_key(request)
+        path = self._path(key)
+
+        if self.provider.mode != "record" and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return normalizer, request, key, json.load(f)["response"]
+        if self.provider.mode == "replay":
+            self.provider.stats.misses.append(key)
+            raise CassetteMissError(
+                f"No cassette for {self.name} request {key}. Record it with EMAIL_CASSETTE_MODE=record or auto."
+            )
+        return normalizer, request, key, None
+
+    def _replay(self, normalizer: RequestNormalizer, recorded: Dict[str, Any]) -> Tuple[List[Any], Usage]:
+        self.provider.stats.replayed += 1
+        output = [_OUTPUT_ITEM.validate_python(json.loads(normalizer.restore(json.dumps(item)))) for item in recorded["output"]]
+        return output, Usage(requests=1, **recorded["usage"])
+
+    def _record(self, normalizer: RequestNormalizer, request: Dict[str, Any], key: str, output: List[Any], usage: Usage):
+        self.provider.stats.recorded += 1
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cassette = {
+            "request": request,
+            "response": {
+                "output": [json.loads(normalizer.text(json.dumps(item.model_dump(exclude_none=True)))) for item in output],
+                "usage": {
+                    "input_tokens": usage.input_tokens,
+                    "output_tokens": usage.output_tokens,
+                    "total_tokens": usage.total_tokens
+                }
+            }
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cassette, f, indent=2, sort_keys=True)
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> ModelResponse:
+        normalizer, request, key, recorded = self._lookup(system_instructions, input, model_settings, tools, output_schema, handoffs)
+        if recorded is not None:
+            output, usage = self._replay(normalizer, recorded)
+            return ModelResponse(output=output, usage=usage, response_id=None)
+
+        start = time.perf_counter()
+        response = await self._real_model().get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+        )
+        self.provider.stats.model_seconds += time.perf_counter() - start
+        self._record(normalizer, request, key, response.output, response.usage)
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        normalizer, request, key, recorded = self._lookup(system_instructions, input, model_settings, tools, output_schema, handoffs)
+        if recorded is not None:
+            output, usage = self._replay(normalizer, recorded)
+            # The whole recorded response arrives as a single completed event
+            response = Response.model_construct(
+                id="resp_cassette", created_at=time.time(), model=self.name, object="response", output=output,
+                parallel_tool_calls=True, tool_choice="auto", tools=[],
+                usage=ResponseUsage.model_construct(
+                    input_tokens=usage.input_tokens, output_tokens=usage.output_tokens, total_tokens=usage.total_tokens,
+                    input_tokens_details=InputTokensDetails.model_construct(cached_tokens=0),
+                    output_tokens_details=OutputTokensDetails.model_construct(reasoning_tokens=0)
+                )
+            )
+            yield ResponseCompletedEvent(type="response.completed", response=response, sequence_number=0)
+            return
+
+        start = time.perf_counter()
+        async for event in self._real_model().stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+        ):
+            if isinstance(event, ResponseCompletedEvent):
+                self.provider.stats.model_seconds += time.perf_counter() - start
+                completed = event.response
+                usage = Usage(
+                    requests=1,
+                    input_tokens=completed.usage.input_tokens if completed.usage else 0,
+                    output_tokens=completed.usage.output_tokens if completed.usage else 0,
+                    total_tokens=completed.usage.total_tokens if completed.usage else 0
+                )
+                self._record(normalizer, request, key, completed.output, usage)
+            yield event
+
+class CassetteProvider(ModelProvider):
+    """
+    ModelProvider that records and replays model calls, for RunConfig(model_provider=...).
+
+    Each request is normalized (see RequestNormalizer) and hashed; the hash
+    names the cassette file holding the recorded response. Misses go to the
+    wrapped provider in "record" and "auto" mode and fail in "replay" mode.
+    """
+
+    def __init__(self, mode: str = CASSETTE_MODE, cassette_dir: str = CASSETTE_DIR, provider: ModelProvider = None):
+        """
+        Args:
+            mode: "replay", "record" or "auto"
+            cassette_dir: Directory of the cassette files
+            provider: Provider of the real models (defaults to the SDK's MultiProvider)
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Invalid cassette mode: {mode}. Must be one of {', '.join(CASSETTE_MODES)}")
+        self.mode = mode
+        self.cassette_dir = cassette_dir
+        self.provider = provider or MultiProvider()
+        self.stats = CassetteStats()
+        self._models: Dict[str, CassetteModel] = {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        name = model_name or "default"
+        if name not in self._models:
+            self._models[name] = CassetteModel(model_name, self)
+        return self._models[name]
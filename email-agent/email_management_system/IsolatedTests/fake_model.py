@@ -0,0 +1,345 @@
+import asyncio
+import itertools
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from agents.agent_output import AgentOutputSchemaBase
+from agents.items import ModelResponse
+from agents.models.interface import Model, ModelProvider, ModelTracing
+from agents.tracing import generation_span
+from agents.usage import Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionCallArgumentsDeltaEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputItemAddedEvent,
+    ResponseOutputItemDoneEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseUsage
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+from ..processing.chunking import estimate_tokens
+
+# Rows of the compact email table (see processing/encoding.py): alias|from|subject|date|body
+_ROW = re.compile(r"^(e\d+)\|([^|]*)\|([^|]*)\|([^|]*)\|(.*)$", re.MULTILINE)
+
+# Keywords the default mailbox policy uses to decide
+HUMAN_REVIEW_KEYWORDS = ("urgent", "contract", "meeting", "invoice", "confidential", "proposal", "review", "question")
+UNSUBSCRIBE_KEYWORDS = ("newsletter", "unsubscribe", "promo", "offer", "sale", "digest", "deal")
+ESCALATE_KEYWORDS = ("ambiguous",)
+
+# Characters of function call arguments per streamed delta
+STREAM_CHUNK_CHARS = 16
+
+# Call ids must be unique within a run; a counter also keeps them deterministic
+_call_ids = itertools.count(1)
+
+def tool_call(name: str, **arguments) -> ResponseFunctionToolCall:
+    """A function call output item (tool or handoff) for a scripted response."""
+    call_id = f"call_{next(_call_ids)}"
+    return ResponseFunctionToolCall(
+        id=f"fc_{call_id}", call_id=call_id, name=name, arguments=json.dumps(arguments), type="function_call"
+    )
+
+def message(text: str) -> ResponseOutputMessage:
+    """An assistant message output item (a final answer) for a scripted response."""
+    return ResponseOutputMessage(
+        id="msg_fake", role="assistant", status="completed", type="message",
+        content=[ResponseOutputText(text=text, type="output_text", annotations=[])]
+    )
+
+@dataclass
+class FakeRequest:
+    """What a scripted policy sees of a model call."""
+    system_instructions: str
+    items: List[Dict[str, Any]]  # input items since the current agent took over
+    tool_names: List[str]
+    handoff_names: List[str]
+    output_schema: Optional[AgentOutputSchemaBase] = None  # set when the agent answers with structured output
+
+    @property
+    def called(self) -> List[str]:
+        """Names of the tools the current agent has already called."""
+        return [item["name"] for item in self.items if item.get("type") == "function_call"]
+
+    @property
+    def text(self) -> str:
+        """All user messages and tool outputs the current agent has seen."""
+        parts = []
+        for item in self.items:
+            if item.get("role") == "user" and isinstance(item.get("content"), str):
+                parts.append(item["content"])
+            elif item.get("type") == "function_call_output":
+                parts.append(str(item.get("output", "")))
+        return "\n".join(parts)
+
+    def rows(self) -> List[Tuple[str, str, str, str]]:
+        """
+        (alias, sender, subject, body) of every email row the current agent has seen.
+
+        Without any table rows, emails that a user message lists as JSON objects
+        (as the isolated agent tests send them) are the rows, with their real id
+        as the alias.
+        """
+        seen = {}
+        for alias, sender, subject, _, body in _ROW.findall(self.text):
+            seen.setdefault(alias, (alias, sender, subject, body))
+        if seen:
+            return list(seen.values())
+        for item in self.items:
+            if item.get("role") == "user" and isinstance(item.get("content"), str):
+                for email in _json_emails(item["content"]):
+                    seen.setdefault(email["id"], (email["id"], email.get("sender", ""), email.get("subject", ""), email.get("body", "")))
+        return list(seen.values())
+
+def _json_emails(text: str) -> List[Dict[str, Any]]:
+    """The email objects (dicts with an id) of every JSON list in a message."""
+    decoder = json.JSONDecoder()
+    emails = []
+    index = text.find("[")
+    while index != -1:
+        try:
+            value, end = decoder.raw_decode(text, index)
+        except ValueError:
+            index = text.find("[", index + 1)
+            continue
+        if isinstance(value, list):
+            emails.extend(item for item in value if isinstance(item, dict) and "id" in item)
+        index = text.find("[", end)
+    return emails
+
+# A policy maps a request to the output items of the response
+Policy = Callable[[FakeRequest], List[Any]]
+
+def _matches(row: Tuple[str, str, str, str], keywords: Tuple[str, ...]) -> bool:
+    text = f"{row[2]} {row[3]}".lower()
+    return any(keyword in text for keyword in keywords)
+
+def structured(request: FakeRequest, value: Any) -> ResponseOutputMessage:
+    """A final answer for an agent with an output type, wrapped the way the SDK wraps non-object types."""
+    schema = request.output_schema.json_schema()
+    if list(schema.get("properties", {})) == ["response"] and not isinstance(value, dict):
+        value = {"response": value}
+    return message(json.dumps(value))
+
+def _handoff_to(request: FakeRequest, agent_name: str) -> Optional[str]:
+    return next((name for name in request.handoff_names if name.endswith(agent_name)), None)
+
+def mailbox_policy(request: FakeRequest) -> List[Any]:
+    """
+    Deterministic stand-in for the manager, automation and worker agents.
+
+    The agent is recognised by its tools, or by its output type. Emails are classified and acted on
+    by keywords, every decision for a turn is made in one batch of parallel
+    tool calls, and handoffs are taken whenever the real flow would take them.
+    """
+    rows = request.rows()
+    called = request.called
+
+    # Structured-output manager agent: every decision in one typed answer
+    if request.output_schema is not None and not request.output_schema.is_plain_text():
+        escalating = '"escalate"' in request.system_instructions
+        results = []
+        for r in rows:
+            if escalating and _matches(r, ESCALATE_KEYWORDS):
+                results.append({"email_id": r[0], "classification": "escalate", "reasoning": "ambiguous request", "action_needed": None})
+            elif _matches(r, HUMAN_REVIEW_KEYWORDS):
+                results.append({"email_id": r[0], "classification": "human_review", "reasoning": "Needs a decision.", "action_needed": f"Answer {r[2]}"})
+            else:
+                results.append({"email_id": r[0], "classification": "automated", "reasoning": "Routine email.", "action_needed": None})
+        return [structured(request, results)]
+
+    # Manager agent: classify, report, then hand off (or finish)
+    if "save_emails_to_human_review" in request.tool_names:
+        if not called:
+            calls = []
+            escalated = [r for r in rows if _matches(r, ESCALATE_KEYWORDS)] if "escalate_emails" in request.tool_names else []
+            decided = [r for r in rows if r not in escalated]
+            human = [r[0] for r in decided if _matches(r, HUMAN_REVIEW_KEYWORDS)]
+            automated = [r[0] for r in decided if not _matches(r, HUMAN_REVIEW_KEYWORDS)]
+            if escalated:
+                calls.append(tool_call("escalate_emails", email_ids=[r[0] for r in escalated], reason="ambiguous request"))
+            if human:
+                calls.append(tool_call("save_emails_to_human_review", email_ids=human))
+                if "write_human_review_report" in request.tool_names:
+                    report = "# Review\n## High Priority\n" + "\n".join(f"- [{r[2]}]({r[0]})" for r in decided if r[0] in human)
+                    calls.append(tool_call("write_human_review_report", report=report + "\n### Summary\nDone."))
+            if automated:
+                calls.append(tool_call("save_emails_to_automation", email_ids=automated))
+            return calls or [message("No emails to process.")]
+        handoff = _handoff_to(request, "automation_agent")
+        if handoff and "save_emails_to_automation" in called and handoff not in called:
+            return [tool_call(handoff)]
+        return [message(f"Processed {len(rows)} emails.")]
+
+    # Automation agent (handoff flow): list the emails, act on all of them, hand back
+    if "get_automated_emails" in request.tool_names and "get_automated_emails" not in called:
+        return [tool_call("get_automated_emails")]
+
+    # Automation agent or executor worker: one batched action call
+    if "apply_email_actions" in request.tool_names and "apply_email_actions" not in called:
+        actions = [
+            {"email_id": r[0], "action": "unsubscribe", "response": None} if _matches(r, UNSUBSCRIBE_KEYWORDS)
+            else {"email_id": r[0], "action": "reply", "response": f"Thanks for your email about {r[2]}."}
+            for r in rows
+        ]
+        if actions:
+            return [tool_call("apply_email_actions", actions=actions)]
+
+    handoff = _handoff_to(request, "manager_agent")
+    if handoff and handoff not in called:
+        return [tool_call(handoff)]
+    return [message(f"Handled {len(rows)} emails.")]
+
+@dataclass
+class FakeModelStats:
+    """Counters shared by every model of a provider."""
+    turns: int = 0
+    tool_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    intervals: List[Tuple[float, float]] = field(default_factory=list)
+
+    def busy_seconds(self) -> float:
+        """Wall time during which at least one model call was in flight."""
+        total, end = 0.0, float("-inf")
+        for start, stop in sorted(self.intervals):
+            if stop > end:
+                total += stop - max(start, end)
+                end = stop
+        return total
+
+class FakeModel(Model):
+    """
+    Offline, deterministic stand-in for a model.
+
+    Each call sleeps for latency_seconds (plus seconds_per_output_token per
+    scripted output token) and returns whatever the policy scripts for the
+    request: tool calls, handoffs (calls to transfer_to_* tools) or a final
+    message, which is JSON for agents with an output type. Token usage is estimated from the text in and out. Streamed
+    responses deliver function call arguments in small deltas, so consumers
+    of the stream see them arrive over the call like with a real model.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        policy: Policy = mailbox_policy,
+        latency_seconds: float = 0.0,
+        seconds_per_output_token: float = 0.0,
+        stats: FakeModelStats = None
+    ):
+        self.name = name
+        self.policy = policy
+        self.latency_seconds = latency_seconds
+        self.seconds_per_output_token = seconds_per_output_token
+        self.stats = stats or FakeModelStats()
+
+    def _respond(self, system_instructions, input, tools, handoffs, output_schema=None) -> Tuple[List[Any], Usage]:
+        items = [{"role": "user", "content": input}] if isinstance(input, str) else [
+            item if isinstance(item, dict) else item.model_dump() for item in input
+        ]
+        handoff_names = [handoff.tool_name for handoff in handoffs]
+
+        # The current agent's turn starts after the last handoff
+        start = 0
+        for index, item in enumerate(items):
+            if item.get("type") == "function_call_output" and any(
+                h.get("call_id") == item.get("call_id") and str(h.get("name", "")).startswith("transfer_to_")
+                for h in items[:index] if h.get("type") == "function_call"
+            ):
+                start = index + 1
+        request = FakeRequest(
+            system_instructions=system_instructions or "",
+            items=items[start:],
+            tool_names=[tool.name for tool in tools],
+            handoff_names=handoff_names,
+            output_schema=output_schema
+        )
+        output = self.policy(request)
+
+        input_tokens = estimate_tokens((system_instructions or "") + json.dumps(items, default=str))
+        output_tokens = estimate_tokens(json.dumps([item.model_dump() for item in output]))
+        self.stats.turns += 1
+        self.stats.tool_calls += sum(1 for item in output if isinstance(item, ResponseFunctionToolCall))
+        self.stats.input_tokens += input_tokens
+        self.stats.output_tokens += output_tokens
+        usage = Usage(requests=1, input_tokens=input_tokens, output_tokens=output_tokens, total_tokens=input_tokens + output_tokens)
+        return output, usage
+
+    async def _sleep(self, usage: Usage, tracing: ModelTracing):
+        # Like the SDK's own models, each call is a generation span in the trace
+        with generation_span(model=self.name, usage={"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}, disabled=tracing.is_disabled()):
+            start = time.perf_counter()
+            await asyncio.sleep(self.latency_seconds + self.seconds_per_output_token * usage.output_tokens)
+            self.stats.intervals.append((start, time.perf_counter()))
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> ModelResponse:
+        output, usage = self._respond(system_instructions, input, tools, handoffs, output_schema)
+        await self._sleep(usage, tracing)
+        return ModelResponse(output=output, usage=usage, response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        output, usage = self._respond(system_instructions, input, tools, handoffs, output_schema)
+        sequence = itertools.count()
+        with generation_span(model=self.name, usage={"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}, disabled=tracing.is_disabled()):
+            start = time.perf_counter()
+            await asyncio.sleep(self.latency_seconds)
+            # Function call arguments arrive in small deltas, paced like the tokens of a real stream
+            for index, item in enumerate(output):
+                if not isinstance(item, ResponseFunctionToolCall):
+                    yield ResponseOutputItemAddedEvent(type="response.output_item.added", item=item, output_index=index, sequence_number=next(sequence))
+                    continue
+                yield ResponseOutputItemAddedEvent(
+                    type="response.output_item.added", item=item.model_copy(update={"arguments": ""}),
+                    output_index=index, sequence_number=next(sequence)
+                )
+                for offset in range(0, len(item.arguments), STREAM_CHUNK_CHARS):
+                    delta = item.arguments[offset:offset + STREAM_CHUNK_CHARS]
+                    await asyncio.sleep(self.seconds_per_output_token * estimate_tokens(delta))
+                    yield ResponseFunctionCallArgumentsDeltaEvent(
+                        type="response.function_call_arguments.delta", delta=delta, item_id=item.id,
+                        output_index=index, sequence_number=next(sequence)
+                    )
+                yield ResponseOutputItemDoneEvent(type="response.output_item.done", item=item, output_index=index, sequence_number=next(sequence))
+            self.stats.intervals.append((start, time.perf_counter()))
+
+        response = Response.model_construct(
+            id="resp_fake", created_at=time.time(), model=self.name, object="response", output=output,
+            parallel_tool_calls=True, tool_choice="auto", tools=[],
+            usage=ResponseUsage.model_construct(
+                input_tokens=usage.input_tokens, output_tokens=usage.output_tokens, total_tokens=usage.total_tokens,
+                input_tokens_details=InputTokensDetails.model_construct(cached_tokens=0),
+                output_tokens_details=OutputTokensDetails.model_construct(reasoning_tokens=0)
+            )
+        )
+        yield ResponseCompletedEvent(type="response.completed", response=response, sequence_number=next(sequence))
+
+class FakeModelProvider(ModelProvider):
+    """
+    ModelProvider returning FakeModels, for RunConfig(model_provider=...) or ManagerAgent(model_provider=...).
+
+    Every model name gets its own FakeModel, all sharing one set of counters.
+    Per-name latencies let a "reasoning" model be slower than a "fast" one.
+    """
+
+    def __init__(self, policy: Policy = mailbox_policy, latency_seconds: float = 0.0, latencies: Dict[str, float] = None, seconds_per_output_token: float = 0.0):
+        self.policy = policy
+        self.latency_seconds = latency_seconds
+        self.latencies = latencies or {}
+        self.seconds_per_output_token = seconds_per_output_token
+        self.stats = FakeModelStats()
+        self._models: Dict[str, FakeModel] = {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        name = model_name or "default"
+        if name not in self._models:
+            self._models[name] = FakeModel(
+                name, self.policy, self.latencies.get(name, self.latency_seconds), self.seconds_per_output_token, self.stats
+            )
+        return self._models[name]
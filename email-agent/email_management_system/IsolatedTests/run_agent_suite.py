@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import importlib
+import time
+from agents import RunConfig, set_tracing_disabled
+
+from .cassettes import CASSETTE_DIR, CASSETTE_MODE, CASSETTE_MODES, CassetteMissError, CassetteProvider
+from .fake_model import FakeModelProvider
+
+# Providers that cassettes can be recorded from: the real models (needs OPENAI_API_KEY), or the
+# scripted offline models of fake_model.py, which the committed cassettes are recorded from
+RECORD_PROVIDERS = {"openai": lambda: None, "fake": FakeModelProvider}
+
+# (module, coroutine) of every agent test the suite runs. test_human_review_agent is left out:
+# the manager agent writes the human review report now and HumanReviewAgent no longer exists.
+AGENT_TESTS = [
+    ("test_manager_agent", "test_manager_agent"),
+    ("test_automation_agent", "test_automation_agent")
+]
+
+async def run_test(module_name: str, test_name: str, provider: CassetteProvider):
+    """
+    Run one agent test against the cassettes. Returns (outcome, seconds, error).
+
+    The outcome is "PASS" or "FAIL". Replaying a request that has no cassette
+    (a prompt or tool schema changed since it was recorded) fails the test.
+    """
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(f"{__package__}.{module_name}")
+        await getattr(module, test_name)(run_config=RunConfig(model_provider=provider))
+    except CassetteMissError as e:
+        return "FAIL", time.perf_counter() - start, str(e)
+    except Exception as e:
+        return "FAIL", time.perf_counter() - start, f"{type(e).__name__}: {str(e)}"
+    return "PASS", time.perf_counter() - start, None
+
+async def run_suite(mode: str, cassette_dir: str, tests, record_provider: str = "openai"):
+    provider = CassetteProvider(mode=mode, cassette_dir=cassette_dir, provider=RECORD_PROVIDERS[record_provider]())
+    if mode == "replay" or record_provider == "fake":
+        # Nothing leaves the process when replaying or recording the fakes, so there is nothing to trace
+        set_tracing_disabled(True)
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    results = await asyncio.gather(*(run_test(module, test, provider) for module, test in tests))
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    print("\n=== Agent suite ===")
+    print(f"Mode: {mode}, cassettes: {cassette_dir}")
+    for (module, _), (outcome, seconds, error) in zip(tests, results):
+        print(f"{outcome} {module} ({seconds:.3f}s){f': {error}' if error else ''}")
+
+    stats = provider.stats
+    print(f"\nModel calls: {stats.replayed} replayed, {stats.recorded} recorded, {len(stats.misses)} missing")
+    print(f"Wall time: {wall:.3f}s (tests run concurrently)")
+    print(f"Waiting for the model: {stats.model_seconds:.3f}s")
+    print(f"Our own code: {max(wall - stats.model_seconds, 0.0):.3f}s wall, {cpu:.3f}s cpu")
+    if stats.misses:
+        print(
+            "\nSome requests have no cassette. Record them again with --mode record --provider fake "
+            "and commit IsolatedTests/cassettes/."
+        )
+    return all(outcome == "PASS" for outcome, _, _ in results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the agent tests concurrently against recorded model responses")
+    parser.add_argument("--mode", choices=CASSETTE_MODES, default=CASSETTE_MODE, help="replay (default), record or auto")
+    parser.add_argument("--cassettes", default=CASSETTE_DIR, help="Directory of the cassette files")
+    parser.add_argument(
+        "--provider", choices=sorted(RECORD_PROVIDERS), default="openai",
+        help="Models to record from: the real ones (default) or the scripted offline fakes"
+    )
+    parser.add_argument("--only", nargs="+", help="Run only these test modules, e.g. test_manager_agent")
+    args = parser.parse_args()
+
+    tests = [test for test in AGENT_TESTS if not args.only or test[0] in args.only]
+    passed = asyncio.run(run_suite(args.mode, args.cassettes, tests, args.provider))
+    raise SystemExit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
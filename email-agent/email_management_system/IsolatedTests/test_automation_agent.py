@@ -4,7 +4,7 @@ import logging
 import json
 import argparse
 from typing import List, Dict, Any
-from agents import Runner, RunContextWrapper
+from agents import Runner, RunConfig, RunContextWrapper
 
 from ..models.email_models import Email, EmailContext
 from ..magents.automation_agent import AutomationAgent
@@ -54,7 +54,7 @@ SAMPLE_EMAILS = [
     )
 ]
 
-async def test_automation_agent(verbose=False):
+async def test_automation_agent(verbose=False, run_config: RunConfig = None):
     """Test the automation agent's ability to process emails."""
     if verbose:
         enable_verbose_logging()
@@ -91,7 +91,8 @@ async def test_automation_agent(verbose=False):
     result = await Runner.run(
         automation_agent.agent,
         [{"role": "user", "content": f"Process these {len(email_data)} emails marked for automated processing: {json.dumps(email_data, indent=2)}"}],
-        context=context
+        context=context,
+        run_config=run_config
     )
     
     # Output results
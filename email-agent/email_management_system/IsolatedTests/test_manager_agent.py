@@ -3,7 +3,7 @@ import uuid
 import logging
 import json
 from typing import List, Dict, Any
-from agents import Agent, Runner, RunContextWrapper 
+from agents import Agent, Runner, RunConfig, RunContextWrapper 
 
 from ..models.email_models import Email, EmailContext
 from ..magents.manager_agent import MANAGER_INSTRUCTIONS
@@ -88,8 +88,8 @@ MANAGER_TEST_TOOLS = [
     get_statistics
 ]
 
-async def test_manager_agent():
-    """Test the manager agent's ability to classify emails."""
+async def test_manager_agent(run_config: RunConfig = None):
+    """Test the manager agent's ability to classify emails. Pass a run_config with a CassetteProvider to record or replay."""
     test_logger.info("Creating email context with sample emails")
     # Create standard context with sample emails
     context = EmailContext(SAMPLE_EMAILS)
@@ -121,7 +121,8 @@ async def test_manager_agent():
     result = await Runner.run(
         test_agent,
         [{"role": "user", "content": f"Process these {len(SAMPLE_EMAILS)} emails: {json.dumps(email_data, indent=2)}"}],
-        context=context
+        context=context,
+        run_config=run_config
     )
     
     # Print results
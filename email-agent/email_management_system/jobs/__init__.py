@@ -0,0 +1,16 @@
+from .store import JobStore, JobRecord
+from .backend import JobBackend, SQLiteJobBackend
+from .worker import JobWorker
+from .events import JobEvents, stream_job_events
+from .journal import JobJournal
+
+__all__ = [
+    'JobStore',
+    'JobRecord',
+    'JobBackend',
+    'SQLiteJobBackend',
+    'JobWorker',
+    'JobEvents',
+    'stream_job_events',
+    'JobJournal'
+]
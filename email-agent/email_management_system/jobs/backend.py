@@ -0,0 +1,332 @@
+import json
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Tuple, Union
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+# Shared job database used by every worker process
+JOB_DB_PATH = os.getenv("EMAIL_JOB_DB", os.path.join(_DATA_DIR, 'jobs.sqlite3'))
+# A running job whose worker has not sent a heartbeat for this long can be claimed by another worker
+JOB_LEASE_SECONDS = float(os.getenv("EMAIL_JOB_LEASE_SECONDS", "60"))
+
+# Jobs a worker may claim (queued, or running with an expired lease), in the order they are claimed:
+# the client with the fewest running jobs first, oldest first within a client
+_CLAIMABLE = "status = 'queued' OR (status = 'running' AND heartbeat < ?)"
+_CLAIM_ORDER = "(SELECT COUNT(*) FROM jobs AS r WHERE r.client_id = j.client_id AND r.status = 'running'), created"
+# A running job still held by the given worker (parameters: job_id, worker_id)
+_CLAIMED = "job_id = ? AND claimed_by = ? AND status = 'running'"
+
+class JobBackend(ABC):
+    """
+    Job state shared between worker processes.
+
+    A job is created as "queued" with its input payload, claimed by exactly one
+    worker, has its public state saved as it runs and is finally marked as
+    finished. Implementations must make claim_job atomic across processes.
+
+    A job whose lease expired can be claimed by another worker while the first
+    one is still running it, so the writes of a running job name the worker and
+    only apply while that worker still holds the claim. The methods block, so
+    async code calls them through asyncio.to_thread.
+    """
+
+    @abstractmethod
+    def create_job(self, job_id: str, payload: Dict[str, Any], public_state: Dict[str, Any], client_id: str = ""):
+        """Create a queued job with its input payload and initial public state."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_job(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Claim the next job for a worker. Returns (job_id, payload) or None.
+
+        Jobs are handed out fairly between clients: the next job comes from the
+        client with the fewest running jobs, oldest first within a client.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def queue_depth(self, client_id: str = None) -> int:
+        """Number of queued jobs, overall or for one client."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def queue_info(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position, depth and time spent waiting for a job, or None if it is unknown."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_state(self, job_id: str, worker_id: str, public_state: Union[Dict[str, Any], str]) -> bool:
+        """
+        Save the public state (a dict or its JSON) of a running job. Also acts as a heartbeat.
+
+        Returns False, without saving, if the worker no longer holds the job's claim.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renew the lease of the worker running a job. Returns False if the worker no longer holds the claim."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish_job(self, job_id: str, worker_id: str, public_state: Dict[str, Any]) -> bool:
+        """
+        Save the final public state of a job and drop its input payload.
+
+        Returns False, leaving the job alone, if the worker no longer holds the job's claim.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_job(self, job_id: str, worker_id: str, public_state: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Give up a running job without finishing it, e.g. because its worker is stopping.
+
+        The job stays "running" but its lease is expired, so any worker can claim
+        it again right away and resume it.
+
+        Args:
+            job_id: The job
+            worker_id: The worker giving the job up; nothing happens if it no longer holds the claim
+            public_state: The job's latest public state, if any
+
+        Returns:
+            bool: Whether the job was released
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_orphans(self, is_orphaned: Callable[[str], bool]) -> int:
+        """Release every running job whose worker id is_orphaned() says is gone. Returns the number released."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """
+        Ask for a job to be cancelled. Returns the job's status before the request, or None if it is unknown.
+
+        A queued job is finished right away with the "cancelled" status. A
+        running job is only flagged; the worker running it sees the flag (see
+        is_cancel_requested) and stops it. Finished jobs are left alone.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_cancel_requested(self, job_id: str) -> bool:
+        """Whether cancelling a running job was requested."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the public state of a job, or None if it is unknown."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_version(self, job_id: str) -> Optional[int]:
+        """Get the version of a job's public state without loading it, or None if the job is unknown."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def purge(self, ttl_seconds: float) -> int:
+        """Delete jobs that finished more than ttl_seconds ago. Returns the number deleted."""
+        raise NotImplementedError
+
+class SQLiteJobBackend(JobBackend):
+    """
+    JobBackend stored in a SQLite file.
+
+    Every uvicorn worker on the host opens the same database. Claims run inside
+    BEGIN IMMEDIATE transactions, so only one worker can move a job from queued
+    to running. The database is in WAL mode, whose shared-memory index only
+    works between processes of one host, so the file must not be shared over a
+    network filesystem; workers on several hosts need a backend on a database server.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT, state TEXT NOT NULL, "
+            "claimed_by TEXT, heartbeat REAL, created REAL NOT NULL, finished REAL, "
+            "client_id TEXT NOT NULL DEFAULT '', started REAL, cancel_requested INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Databases created before client fairness and cancellation were added lack these columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "client_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN client_id TEXT NOT NULL DEFAULT ''")
+        if "started" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN started REAL")
+        if "cancel_requested" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+
+    def create_job(self, job_id: str, payload: Dict[str, Any], public_state: Dict[str, Any], client_id: str = ""):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, payload, state, created, client_id) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), json.dumps(public_state), time.time(), client_id)
+            )
+
+    def claim_job(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT job_id, payload FROM jobs AS j WHERE {_CLAIMABLE} ORDER BY {_CLAIM_ORDER} LIMIT 1",
+                    (now - self.lease_seconds,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', claimed_by = ?, heartbeat = ?, started = ? WHERE job_id = ?",
+                    (worker_id, now, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row[0], json.loads(row[1])
+
+    def queue_depth(self, client_id: str = None) -> int:
+        with self._lock:
+            if client_id is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND client_id = ?", (client_id,)
+                ).fetchone()
+        return row[0]
+
+    def queue_info(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT status, created, started FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status, created, started = row
+            depth = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            position = None
+            if status == "queued":
+                # Ranked like claim_job ranks them, so a job behind a busy client's jobs moves ahead of them
+                position = self._conn.execute(
+                    f"SELECT position FROM (SELECT job_id, ROW_NUMBER() OVER (ORDER BY {_CLAIM_ORDER}) AS position "
+                    f"FROM jobs AS j WHERE {_CLAIMABLE}) WHERE job_id = ?",
+                    (now - self.lease_seconds, job_id)
+                ).fetchone()[0]
+        return {
+            "position": position,
+            "queue_depth": depth,
+            "wait_seconds": (started if started is not None else now) - created
+        }
+
+    def save_state(self, job_id: str, worker_id: str, public_state: Union[Dict[str, Any], str]) -> bool:
+        if not isinstance(public_state, str):
+            public_state = json.dumps(public_state)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET state = ?, heartbeat = ? WHERE {_CLAIMED}",
+                (public_state, time.time(), job_id, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE jobs SET heartbeat = ? WHERE {_CLAIMED}", (time.time(), job_id, worker_id))
+        return cursor.rowcount > 0
+
+    def finish_job(self, job_id: str, worker_id: str, public_state: Dict[str, Any]) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET status = 'finished', payload = NULL, state = ?, heartbeat = ?, finished = ? WHERE {_CLAIMED}",
+                (json.dumps(public_state), now, now, job_id, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def release_job(self, job_id: str, worker_id: str, public_state: Optional[Dict[str, Any]] = None) -> bool:
+        with self._lock:
+            if public_state is None:
+                cursor = self._conn.execute(f"UPDATE jobs SET heartbeat = 0 WHERE {_CLAIMED}", (job_id, worker_id))
+            else:
+                cursor = self._conn.execute(
+                    f"UPDATE jobs SET state = ?, heartbeat = 0 WHERE {_CLAIMED}",
+                    (json.dumps(public_state), job_id, worker_id)
+                )
+        return cursor.rowcount > 0
+
+    def release_orphans(self, is_orphaned: Callable[[str], bool]) -> int:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, claimed_by FROM jobs WHERE status = 'running' AND heartbeat > 0"
+            ).fetchall()
+            orphaned = [(job_id, worker_id) for job_id, worker_id in rows if worker_id and is_orphaned(worker_id)]
+            if orphaned:
+                self._conn.executemany(
+                    "UPDATE jobs SET heartbeat = 0 WHERE job_id = ? AND claimed_by = ? AND status = 'running'", orphaned
+                )
+        return len(orphaned)
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT status, state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                status, state = row
+                if status == "queued":
+                    state = json.loads(state)
+                    state.update({"status": "cancelled", "error": "Cancelled before it started"})
+                    state["version"] = state.get("version", 0) + 1
+                    state.setdefault("field_versions", {}).update(status=state["version"], error=state["version"])
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'finished', payload = NULL, state = ?, heartbeat = ?, finished = ? WHERE job_id = ?",
+                        (json.dumps(state), now, now, job_id)
+                    )
+                elif status == "running":
+                    self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return status
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def get_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_version(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(json_extract(state, '$.version'), 0) FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge(self, ttl_seconds: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status = 'finished' AND finished < ?",
+                (time.time() - ttl_seconds,)
+            )
+        return cursor.rowcount
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional
+from email_management_system.models.email_models import EmailContext
+
+# Keep-alive comment interval for idle streams, and how often jobs on other workers are polled
+KEEPALIVE_SECONDS = float(os.getenv("EMAIL_EVENTS_KEEPALIVE_SECONDS", "15"))
+REMOTE_POLL_SECONDS = float(os.getenv("EMAIL_EVENTS_POLL_SECONDS", "1.0"))
+
+FINISHED_STATUSES = ("completed", "error", "cancelled", "timed_out")
+
+# Public state keys that are not part of "state" events
+_NON_SCALAR_KEYS = ("operations", "review_report", "field_versions")
+
+class JobEvents:
+    """
+    Change notifications for a job running in this process.
+
+    Subscribers read the operations straight from the context's public state
+    and keep only a cursor into it, so many subscribers share one copy of the
+    state. Each operation is serialized once and the JSON is shared too.
+    """
+
+    def __init__(self, context: EmailContext):
+        self.context = context
+        self.finished = False
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._serialized: List[str] = []
+        context.add_listener(self._on_change)
+
+    def _on_change(self, event_type: str, data: Dict[str, Any]):
+        # Tools may run outside the event loop thread
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def finish(self):
+        """Mark the job as finished and wake every subscriber."""
+        self.finished = True
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def operation_json(self, index: int) -> str:
+        """Get the shared JSON of an operation."""
+        operations = self.context.public_state["operations"]
+        while len(self._serialized) <= index:
+            self._serialized.append(json.dumps(operations[len(self._serialized)]))
+        return self._serialized[index]
+
+# Events of the jobs running in this process, by job id
+_job_events: Dict[str, JobEvents] = {}
+
+def register(job_id: str, context: EmailContext) -> JobEvents:
+    """Start publishing events for a job running in this process."""
+    events = JobEvents(context)
+    _job_events[job_id] = events
+    return events
+
+def unregister(job_id: str):
+    """Stop publishing events for a job; its current subscribers receive the end event."""
+    events = _job_events.pop(job_id, None)
+    if events is not None:
+        events.finish()
+
+def _format(event_id: int, event_type: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+def _scalar_state(public_state: Dict[str, Any]) -> str:
+    return json.dumps({k: v for k, v in public_state.items() if k not in _NON_SCALAR_KEYS})
+
+def _end_state(public_state: Dict[str, Any]) -> str:
+    return json.dumps({k: v for k, v in public_state.items() if k not in ("operations", "field_versions")})
+
+async def stream_job_events(job_id: str, last_event_id: int, get_state: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> AsyncIterator[str]:
+    """
+    Stream a job's progress as server-sent events.
+
+    Event ids are operation counts: the "operation" event for the n-th
+    operation has id n, and "state" events carry the id of the latest
+    operation. A client that reconnects with Last-Event-ID: n therefore resumes
+    right after the n-th operation. The stream ends with an "end" event that
+    carries the final state, including the review report.
+
+    Jobs running in this process are streamed from their JobEvents as changes
+    happen; jobs queued or running on another worker are polled through
+    get_state until they show up here or finish.
+
+    Args:
+        job_id: The job to stream
+        last_event_id: Number of operations the client has already seen
+        get_state: Coroutine function returning a job's public state from the shared backend
+    """
+    cursor = max(last_event_id, 0)
+    last_state = None
+    local = None
+
+    while True:
+        # Once a job has been seen running here, keep following it until its end event
+        events = _job_events.get(job_id) or local
+        local = events
+
+        if events is not None:
+            changed = events._changed
+            operations = events.context.public_state["operations"]
+            while cursor < len(operations):
+                yield _format(cursor + 1, "operation", events.operation_json(cursor))
+                cursor += 1
+            public_state = events.context.public_state
+            finished = events.finished
+        else:
+            changed = None
+            public_state = await get_state(job_id)
+            if public_state is None:
+                return
+            operations = public_state.get("operations", [])
+            while cursor < len(operations):
+                yield _format(cursor + 1, "operation", json.dumps(operations[cursor]))
+                cursor += 1
+            finished = public_state.get("status") in FINISHED_STATUSES
+
+        if finished:
+            yield _format(cursor, "end", _end_state(public_state))
+            return
+
+        state = _scalar_state(public_state)
+        if state != last_state:
+            yield _format(cursor, "state", state)
+            last_state = state
+
+        if changed is not None:
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+        else:
+            await asyncio.sleep(REMOTE_POLL_SECONDS)
@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from email_management_system.models.email_models import EmailContext
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+# Directory of the append-only journals of running jobs ("" disables journaling)
+JOURNAL_DIR = os.getenv("EMAIL_JOB_JOURNAL_DIR", os.path.join(_DATA_DIR, 'journals'))
+# fsync every record, so a journal also survives a crash of the machine (not just of the process)
+JOURNAL_FSYNC = os.getenv("EMAIL_JOB_JOURNAL_FSYNC", "0") == "1"
+
+class JobJournal:
+    """
+    Append-only checkpoint of a running job's EmailContext.
+
+    Every operation recorded on the context (classifications, escalations,
+    automation results, review summaries and the review report) is appended to
+    data/journals/<job_id>.jsonl as one JSON line the moment it happens, so a
+    tool call that returned is never lost. Operations of child contexts
+    (chunks of large jobs, reasoning-tier runs) are only written when the child
+    is merged, and chunks merge in order: if the worker dies while an early
+    chunk is still running, the chunks after it that had finished are lost and
+    classified again. Decisions saved while their tool call was still
+    streaming are journaled as unconfirmed and only restored once an
+    "emails_confirmed" record follows; the others are classified again. If
+    the worker dies mid-job, the job is
+    claimed again and replay() rebuilds the context from the journal; only the
+    emails without a decision (or without an automation result) are then
+    processed again. The journal is deleted once the job has finished.
+    """
+
+    def __init__(self, job_id: str, journal_dir: str = JOURNAL_DIR, fsync: bool = JOURNAL_FSYNC):
+        """
+        Args:
+            job_id: The job, which names the journal file
+            journal_dir: Directory of the journal files ("" disables the journal)
+            fsync: Whether to fsync after every record
+        """
+        self.job_id = job_id
+        self.path = os.path.join(journal_dir, f"{job_id}.jsonl") if journal_dir else None
+        self.fsync = fsync
+        self._file = None
+        self._context: Optional[EmailContext] = None
+        self._written = 0
+        self._lock = threading.Lock()
+        self._valid_bytes: Optional[int] = None
+
+    def replay(self, context: EmailContext) -> Optional[Dict[str, int]]:
+        """
+        Rebuild a fresh context from the journal of an earlier, interrupted run of the job.
+
+        The journaled operations are applied in order and then restored as the
+        context's operations history, with their original timestamps. A summary
+        is published as public_state["resumed"].
+
+        Args:
+            context: The new context of the job, before anything was processed
+
+        Returns:
+            dict: Counts of what was restored, or None if there was nothing to replay
+        """
+        records = self._read()
+        if not records:
+            return None
+        for record in records:
+            self._apply(record, context)
+
+        context.public_state["operations"] = [record["operation"] for record in records]
+        resumed = {
+            "operations": len(records),
+            "classified": context.processed_count,
+            "automated": len(context.automation_results),
+            "reviewed": len(context.human_review_results)
+        }
+        context.public_state["resumed"] = resumed
+        context.touch("operations", "resumed")
+        return resumed
+
+    def attach(self, context: EmailContext):
+        """Start journaling every new operation of the context."""
+        if self.path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if self._valid_bytes is None:
+                self._file = open(self.path, "w", encoding="utf-8")
+            else:
+                # Drop a record that was cut off by the crash before appending to it
+                self._file = open(self.path, "r+", encoding="utf-8")
+                self._file.truncate(self._valid_bytes)
+                self._file.seek(self._valid_bytes)
+        except OSError as e:
+            print(f"Error opening job journal {self.path}: {str(e)}")
+            return
+        self._context = context
+        self._written = len(context.public_state["operations"])
+        context.add_listener(self._on_change)
+
+    def close(self, remove: bool = True):
+        """Stop journaling, and delete the journal unless remove is False."""
+        if self._context is not None:
+            self._context.remove_listener(self._on_change)
+            self._context = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove and self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing job journal {self.path}: {str(e)}")
+
+    def _on_change(self, event_type: str, data: Any):
+        # Checked on state changes too, since merge_from appends a child's operations without notifying each one.
+        # Tools may record operations from worker threads, so appends are serialized.
+        with self._lock:
+            operations = self._context.public_state["operations"]
+            if len(operations) <= self._written:
+                return
+            lines = [json.dumps(self._record(operation)) + "\n" for operation in operations[self._written:]]
+            self._written = len(operations)
+            try:
+                self._file.write("".join(lines))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            except (OSError, ValueError) as e:
+                print(f"Error writing job journal {self.path}: {str(e)}")
+
+    def _record(self, operation: Dict[str, Any]) -> Dict[str, Any]:
+        """The journal line of an operation, with the data the operation itself leaves out."""
+        record = {"operation": operation}
+        if operation["type"] in ("emails_added_to_review", "emails_added_to_automation"):
+            record["confirmed"] = operation.get("confirmed", True)
+        elif operation["type"] == "email_review_added":
+            record["summary"] = self._context.human_review_results.get(operation["email_id"], "")
+        elif operation["type"] == "review_report_added":
+            record["report"] = self._context.human_review_report
+        return record
+
+    def _read(self) -> List[Dict[str, Any]]:
+        """Read the journal's complete records. A torn last line (the crash hit mid-write) is dropped."""
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        records = []
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+        self._valid_bytes = valid_bytes
+        return records
+
+    @staticmethod
+    def _apply(record: Dict[str, Any], context: EmailContext):
+        """
+        Apply one journaled operation to the context.
+
+        Unconfirmed decisions are skipped: the tool call that would have confirmed
+        them may never have run, so the emails keep their earlier decision (or are
+        classified again) unless an "emails_confirmed" record restores them.
+        """
+        operation = record["operation"]
+        kind = operation["type"]
+        if kind in ("emails_added_to_review", "emails_added_to_automation") and not record.get("confirmed", True):
+            return
+        if kind == "emails_added_to_review":
+            context.save_to_human_review(operation["email_ids"], source=operation.get("source"))
+        elif kind == "emails_added_to_automation":
+            context.save_to_automation(operation["email_ids"], source=operation.get("source"))
+        elif kind == "emails_confirmed":
+            context.save_classifications(dict.fromkeys(operation["email_ids"], operation["classification"]))
+        elif kind == "emails_escalated":
+            context.escalate(operation["email_ids"], operation.get("reason", ""))
+        elif kind == "email_action_performed":
+            context.add_automation_result(
+                operation["email_id"], operation["action"], operation["result"], content=operation.get("content")
+            )
+        elif kind == "email_review_added":
+            context.add_human_review_result(operation["email_id"], record.get("summary", ""))
+        elif kind == "review_report_added":
+            context.set_human_review_report(record.get("report", ""))
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from email_management_system.models.email_models import EmailContext
+from email_management_system.jobs.backend import JobBackend
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+# Finished jobs are kept this long, and at most this many jobs are kept in total
+JOB_TTL_SECONDS = float(os.getenv("EMAIL_JOB_TTL_SECONDS", "3600"))
+MAX_JOBS = int(os.getenv("EMAIL_MAX_JOBS", "1000"))
+# Directory that full payloads of finished jobs are written to ("" disables spilling)
+JOB_SPILL_DIR = os.getenv("EMAIL_JOB_SPILL_DIR", os.path.join(_DATA_DIR, 'jobs'))
+
+# Public state keys that are too big to keep in memory once a job has finished
+_LARGE_KEYS = ("operations", "review_report")
+
+FINISHED_STATUSES = ("completed", "error", "cancelled", "timed_out")
+
+class JobRecord:
+    """A job in the store: the live system and context while running, a compact result once finished."""
+
+    def __init__(self, job_id: str, system: Any, context: EmailContext):
+        self.job_id = job_id
+        self.system = system
+        self.context = context
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.spill_path: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+class JobStore:
+    """
+    Bounded store for processing jobs.
+
+    Running jobs keep their full EmailManagementSystem and EmailContext. When a
+    job finishes it is compacted: the emails, results and operations history
+    are dropped from memory and only the public counters are kept, with the
+    full public state optionally spilled to a JSON file that is read back on
+    demand. Finished jobs expire after ttl_seconds, and the oldest finished
+    jobs are evicted once the store holds more than max_jobs.
+
+    With a shared JobBackend, the store only holds the jobs running in this
+    process; the state of every other job is read from the backend, in a
+    thread so the event loop is not blocked.
+    """
+
+    def __init__(self, ttl_seconds: float = JOB_TTL_SECONDS, max_jobs: int = MAX_JOBS, spill_dir: str = JOB_SPILL_DIR, backend: JobBackend = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self.spill_dir = spill_dir
+        self.backend = backend
+        self._jobs: "OrderedDict[str, JobRecord]" = OrderedDict()
+
+        # Metrics
+        self.evictions = 0
+        self.spilled = 0
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __contains__(self, job_id: str) -> bool:
+        self._evict()
+        return job_id in self._jobs
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def add(self, job_id: str, system: Any, context: EmailContext) -> JobRecord:
+        """Add a new running job."""
+        record = JobRecord(job_id, system, context)
+        self._jobs[job_id] = record
+        self._evict()
+        return record
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """Get a job record, or None if it is unknown or has been evicted."""
+        self._evict()
+        return self._jobs.get(job_id)
+
+    async def get_public_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the public state of a job, reading a spilled payload back from disk if needed."""
+        record = self.get(job_id)
+        if record is not None and not record.finished:
+            return record.context.public_state
+        if self.backend is not None:
+            return await asyncio.to_thread(self.backend.get_state, job_id)
+        if record is None:
+            return None
+        state = dict(record.result)
+        if record.spill_path:
+            try:
+                with open(record.spill_path) as f:
+                    state.update(json.load(f))
+            except OSError:
+                pass
+        return state
+
+    async def get_version(self, job_id: str) -> Optional[int]:
+        """Get the version of a job's public state, without loading a spilled or shared payload."""
+        record = self.get(job_id)
+        if record is not None and not record.finished:
+            return record.context.public_state["version"]
+        if self.backend is not None:
+            return await asyncio.to_thread(self.backend.get_version, job_id)
+        if record is None:
+            return None
+        return record.result.get("version", 0)
+
+    def finish(self, job_id: str):
+        """Compact a finished job into a small result record."""
+        record = self._jobs.get(job_id)
+        if record is None or record.finished:
+            return
+        public_state = record.context.public_state
+        record.result = {key: value for key, value in public_state.items() if key not in _LARGE_KEYS}
+        record.result["operations_count"] = len(public_state.get("operations", []))
+
+        if self.spill_dir:
+            path = os.path.join(self.spill_dir, f"{job_id}.json")
+            with open(path, "w") as f:
+                json.dump({key: public_state.get(key) for key in _LARGE_KEYS}, f)
+            record.spill_path = path
+            self.spilled += 1
+
+        record.system = None
+        record.context = None
+        record.finished_at = time.time()
+        self._evict()
+
+    def _drop(self, job_id: str):
+        record = self._jobs.pop(job_id)
+        if record.spill_path:
+            try:
+                os.remove(record.spill_path)
+            except OSError:
+                pass
+        self.evictions += 1
+
+    def _evict(self):
+        """Drop expired finished jobs, then the oldest finished jobs above the size cap."""
+        now = time.time()
+        expired = [job_id for job_id, r in self._jobs.items() if r.finished and now - r.finished_at > self.ttl_seconds]
+        for job_id in expired:
+            self._drop(job_id)
+
+        if len(self._jobs) > self.max_jobs:
+            # Running jobs are never evicted; the oldest finished ones go first
+            finished = [job_id for job_id, r in self._jobs.items() if r.finished]
+            for job_id in finished[:len(self._jobs) - self.max_jobs]:
+                self._drop(job_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get job counts and an estimate of the memory held by the store."""
+        self._evict()
+        running = [r for r in self._jobs.values() if not r.finished]
+        return {
+            "jobs": len(self._jobs),
+            "running": len(running),
+            "finished": len(self._jobs) - len(running),
+            "evictions": self.evictions,
+            "spilled": self.spilled,
+            "approx_bytes": sum(_record_size(r) for r in self._jobs.values())
+        }
+
+def _record_size(record: JobRecord) -> int:
+    """Rough number of bytes held by a job record (strings dominate, so count those)."""
+    if record.finished:
+        return sys.getsizeof(record.result) + sum(sys.getsizeof(v) for v in record.result.values())
+    context = record.context
+    size = sum(
+        len(e.body) + len(e.subject) + len(e.sender) + len(e.recipient) + len(e.id) + len(e.timestamp)
+        for e in context.emails
+    )
+    size += len(context.human_review_report)
+    size += sum(sum(len(str(v)) for v in op.values()) for op in context.public_state["operations"])
+    return size
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from email_management_system.jobs.backend import JobBackend
+
+# How often a worker looks for claimable jobs, and how often a running job's state is saved
+POLL_INTERVAL_SECONDS = float(os.getenv("EMAIL_JOB_POLL_SECONDS", "1.0"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("EMAIL_JOB_FLUSH_SECONDS", "0.5"))
+# Maximum number of jobs a single worker process runs at once
+MAX_CONCURRENT_JOBS = int(os.getenv("EMAIL_MAX_CONCURRENT_JOBS", "4"))
+
+class JobWorker:
+    """
+    Claims queued jobs from a shared JobBackend and runs them in this process.
+
+    Every server process runs one worker, so a job submitted to any process can
+    be picked up by whichever worker claims it first. A worker runs at most
+    max_concurrent_jobs jobs and only claims a job when it has a free slot, so
+    excess jobs wait in the shared queue for any worker. While a job runs its
+    public state is saved to the backend every flush interval, which doubles as
+    the heartbeat that keeps other workers from reclaiming it.
+
+    Each job runs in its own task, which cancel() cancels cooperatively: the
+    handler gets a CancelledError at its next await and can keep the partial
+    results (see stop_reason). Cancellations requested through the backend
+    by any process are picked up on the next flush.
+
+    Jobs still running when the worker stops are released rather than
+    finished, so the next worker to start claims them again right away and
+    resumes them from their journal (see JobJournal). Jobs left claimed by a
+    worker process on this host that died without stopping are released when a
+    worker starts, instead of waiting for their lease to expire. A job whose
+    lease expired anyway (e.g. while the process was suspended) may have been
+    claimed by another worker; once a flush finds the claim gone, the job is
+    stopped here without writing to the backend, and the new owner carries on.
+
+    Backend calls block, so they run in a thread (asyncio.to_thread) and never
+    hold up the event loop the jobs run on.
+    """
+
+    def __init__(
+        self,
+        backend: JobBackend,
+        handler: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+        ttl_seconds: float = None,
+        max_concurrent_jobs: int = MAX_CONCURRENT_JOBS
+    ):
+        """
+        Args:
+            backend: The shared job backend
+            handler: Coroutine function run for each claimed job with (job_id, payload).
+                It should register the job's context with track() before processing
+                so the state is flushed while the job runs.
+            ttl_seconds: If set, finished jobs older than this are purged from the backend
+            max_concurrent_jobs: Size of this worker's pool
+        """
+        self.backend = backend
+        self.handler = handler
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._slots = asyncio.Semaphore(max_concurrent_jobs)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task = None
+        self._contexts: Dict[str, Any] = {}
+        self._running = set()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stops: Dict[str, Tuple[str, str]] = {}
+        self._runners = set()
+        self._released = set()
+        self._lost = set()
+
+    def start(self):
+        """Start the claim loop on the running event loop. It first releases the jobs of dead workers on this host."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the claim loop and release the jobs still running, so they are resumed by the next worker."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for job_id, task in list(self._tasks.items()):
+            self._released.add(job_id)
+            task.cancel()
+        if self._runners:
+            await asyncio.gather(*self._runners, return_exceptions=True)
+
+    def is_released(self, job_id: str) -> bool:
+        """
+        Whether a job was interrupted because the worker is stopping or lost its claim, and should be resumed rather than finished.
+        """
+        return job_id in self._released or job_id in self._lost
+
+    def _is_orphaned(self, worker_id: str) -> bool:
+        """Whether a worker id belongs to a process on this host that is no longer running."""
+        host, _, rest = worker_id.partition(":")
+        pid = rest.partition(":")[0]
+        if host != socket.gethostname() or not pid.isdigit() or worker_id == self.worker_id:
+            return False
+        if int(pid) == os.getpid():
+            # An earlier process with our pid, e.g. the previous run of a container
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def notify(self):
+        """Wake the claim loop, e.g. right after a job was submitted to this process."""
+        self._wake.set()
+
+    def track(self, job_id: str, context: Any):
+        """Register the context of a job this worker is running, so its state gets flushed."""
+        self._contexts[job_id] = context
+
+    def cancel(self, job_id: str, status: str = "cancelled", reason: str = "Cancelled by request") -> bool:
+        """
+        Cancel a job running in this process. Returns False if it is not running here.
+
+        Args:
+            job_id: The job
+            status: Final status of the job ("cancelled" or "timed_out")
+            reason: Reported as the job's error
+        """
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        # The first reason wins, e.g. a deadline that fires while a cancel is in progress
+        self._stops.setdefault(job_id, (status, reason))
+        task.cancel()
+        return True
+
+    def stop_reason(self, job_id: str) -> Optional[Tuple[str, str]]:
+        """(status, reason) of a job that was cancelled through cancel(), else None."""
+        return self._stops.get(job_id)
+
+    @property
+    def running(self) -> int:
+        """Number of jobs this worker is running."""
+        return len(self._running)
+
+    async def _run(self):
+        released = await asyncio.to_thread(self.backend.release_orphans, self._is_orphaned)
+        if released:
+            print(f"Released {released} jobs of stopped workers")
+        while True:
+            await self._slots.acquire()
+            claimed = await asyncio.to_thread(self.backend.claim_job, self.worker_id)
+            if claimed is None:
+                self._slots.release()
+                await self._purge()
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, payload = claimed
+            self._running.add(job_id)
+            runner = asyncio.create_task(self._run_job(job_id, payload))
+            self._runners.add(runner)
+            runner.add_done_callback(self._runners.discard)
+
+    async def _purge(self):
+        """Purge expired finished jobs from the backend, at most once a minute."""
+        now = time.time()
+        if self.ttl_seconds is not None and now - self._last_purge > 60:
+            await asyncio.to_thread(self.backend.purge, self.ttl_seconds)
+            self._last_purge = now
+
+    async def _run_job(self, job_id: str, payload: Dict[str, Any]):
+        flusher = asyncio.create_task(self._flush_loop(job_id))
+        task = asyncio.create_task(self.handler(job_id, payload))
+        self._tasks[job_id] = task
+        error = None
+        try:
+            await task
+        except asyncio.CancelledError:
+            # The handler did not handle its cancellation itself
+            status, error = self._stops.get(job_id, ("cancelled", "Job was cancelled"))
+            context = self._contexts.get(job_id)
+            if context is not None and not self.is_released(job_id):
+                context.set_status(status, error=error)
+        except Exception as e:
+            error = str(e)
+            print(f"Error running job {job_id}: {error}")
+        finally:
+            flusher.cancel()
+            self._tasks.pop(job_id, None)
+            self._stops.pop(job_id, None)
+            self._running.discard(job_id)
+            self._slots.release()
+            # A slot is free, so look for the next job right away
+            self._wake.set()
+            context = self._contexts.pop(job_id, None)
+            await self._settle(job_id, context, error)
+
+    async def _settle(self, job_id: str, context: Any, error: Optional[str]):
+        """Release or finish a job that stopped running here, unless another worker has claimed it since."""
+        if job_id in self._lost:
+            self._lost.discard(job_id)
+            self._released.discard(job_id)
+        elif job_id in self._released:
+            self._released.discard(job_id)
+            await asyncio.to_thread(
+                self.backend.release_job, job_id, self.worker_id, context.public_state if context is not None else None
+            )
+        elif context is not None:
+            if not await asyncio.to_thread(self.backend.finish_job, job_id, self.worker_id, context.public_state):
+                print(f"Job {job_id} was claimed by another worker before it finished here")
+        else:
+            # The job never got as far as creating its context; don't leave it claimable
+            state = await asyncio.to_thread(self.backend.get_state, job_id) or {}
+            state.update({"status": "error", "error": error or "Job failed to start"})
+            state["version"] = state.get("version", 0) + 1
+            state.setdefault("field_versions", {}).update(status=state["version"], error=state["version"])
+            await asyncio.to_thread(self.backend.finish_job, job_id, self.worker_id, state)
+
+    async def _flush_loop(self, job_id: str):
+        last = None
+        while True:
+            context = self._contexts.get(job_id)
+            if context is not None:
+                state = json.dumps(context.public_state)
+                if state != last:
+                    claimed = await asyncio.to_thread(self.backend.save_state, job_id, self.worker_id, state)
+                    last = state
+                else:
+                    # Nothing changed, but keep the lease alive
+                    claimed = await asyncio.to_thread(self.backend.heartbeat, job_id, self.worker_id)
+                if not claimed:
+                    self._lose(job_id)
+                    return
+                if await asyncio.to_thread(self.backend.is_cancel_requested, job_id):
+                    self.cancel(job_id)
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+
+    def _lose(self, job_id: str):
+        """Stop a job whose claim another worker took over after its lease expired."""
+        print(f"Job {job_id} was claimed by another worker; stopping it here")
+        self._lost.add(job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
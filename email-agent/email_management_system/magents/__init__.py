@@ -1,9 +1,19 @@
 from .manager_agent import ManagerAgent
 from .automation_agent import AutomationAgent
 from .react_prompt import REACT_PROMPT
+from .automation_executor import AutomationExecutor
+from .router import ModelRouter, email_complexity, FAST_TIER, REASONING_TIER
+from .model_client import configure_model_client, close_model_client
 
 __all__ = [
     'ManagerAgent',
     'AutomationAgent',
-    'REACT_PROMPT'
+    'REACT_PROMPT',
+    'AutomationExecutor',
+    'ModelRouter',
+    'email_complexity',
+    'FAST_TIER',
+    'REASONING_TIER',
+    'configure_model_client',
+    'close_model_client'
 ] 
\ No newline at end of file
@@ -1,11 +1,14 @@
+from typing import Union
 from agents import Agent, Runner
+from agents.models.interface import Model
 from email_management_system.models.email_models import AutomationResult, EmailContext
-from email_management_system.tools.email_tools import reply_to_email, unsubscribe_from_email, get_automated_emails
+from email_management_system.tools.email_tools import apply_email_actions, reply_to_email, unsubscribe_from_email, get_automated_emails
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 from .react_prompt import REACT_PROMPT
 
 # Define tools outside the class for easier testing
 AUTOMATION_TOOLS = [
+    apply_email_actions,
     reply_to_email, 
     unsubscribe_from_email, 
     get_automated_emails
@@ -27,20 +30,26 @@ You are the automation agent. Your job is to:
 
 You have the following tools available:
 - get_automated_emails: Retrieves the list of emails marked for automated processing
+- apply_email_actions: Replies to, unsubscribes from or ignores many emails in one call
 - reply_to_email: Sends an automated reply to an email
 - unsubscribe_from_email: Unsubscribes from a mailing list or newsletter
 
+Emails are provided as a compact table with one email per row. Use the short id in the
+first column (e.g. e3) as the email_id when calling tools.
+
 Guidelines for actions:
 - Reply: For simple queries that can be answered automatically
 - Unsubscribe: For marketing emails, newsletters, or unwanted communications
 - Ignore: For spam or low-priority automated notifications
 
 First, get the list of emails marked for automated processing using the get_automated_emails tool.
-Then, for each email:
-1. Analyze the content
-2. Determine the most appropriate action
-3. Execute the action using the appropriate tool (reply_to_email or unsubscribe_from_email)
-4. Record the result
+Then:
+1. Analyze the content of each email
+2. Determine the most appropriate action for each email
+3. Execute all actions with a single apply_email_actions call (one entry per email). Only use
+   reply_to_email or unsubscribe_from_email to retry an individual email
+4. Check the returned statuses; if any action failed, nothing was applied, so fix the failed
+   entries and call apply_email_actions again with the whole batch
 
 Finally, provide a summary of all actions taken.
 
@@ -48,13 +57,46 @@ IMPORTANT: Once you have finished processing the emails, hand off to the manager
 
 """
 
+# Tools and instructions of the worker agent the AutomationExecutor runs per email (or small group)
+AUTOMATION_WORKER_TOOLS = [
+    apply_email_actions,
+    reply_to_email,
+    unsubscribe_from_email
+]
+
+AUTOMATION_WORKER_INSTRUCTIONS = """
+You are an automation worker. You are given one or a few emails that were marked for automated
+handling, as a compact table with one email per row. Use the short id in the first column
+(e.g. e3) as the email_id when calling tools.
+
+For each email, decide the most appropriate action:
+- Reply: For simple queries that can be answered automatically
+- Unsubscribe: For marketing emails, newsletters, or unwanted communications
+- Ignore: For spam or low-priority automated notifications
+
+Execute the actions for all your emails with a single apply_email_actions call (one entry per
+email). If any action failed, nothing was applied: fix the failed entries and send the whole
+batch again.
+
+Handle only the emails you were given. When you are done, answer with one line per email
+stating the action taken.
+"""
+
 class AutomationAgent:
-    def __init__(self):
+    def __init__(self, model: Union[str, Model] = "o1-2024-12-17"):
         self.agent = Agent(
             name="automation_agent",
             instructions=AUTOMATION_INSTRUCTIONS,
             tools=AUTOMATION_TOOLS,
-            model="o1-2024-12-17"
+            model=model
+        )
+        
+        # Stand-alone worker for the AutomationExecutor: no listing tool and no handoff
+        self.worker = Agent(
+            name="automation_worker",
+            instructions=AUTOMATION_WORKER_INSTRUCTIONS,
+            tools=AUTOMATION_WORKER_TOOLS,
+            model=model
         )
     
     # The process_automated_emails method is removed as it's no longer needed with handoffs 
\ No newline at end of file
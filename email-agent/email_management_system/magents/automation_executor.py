@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List
+from agents import Agent, Runner, RunConfig
+from agents.usage import Usage
+from email_management_system.models.email_models import Email, EmailContext
+from email_management_system.magents.limits import JobLimitExceeded, current_limits
+from email_management_system.processing.encoding import encode_emails
+
+# How many worker runs may be in flight at once, and how many emails each run handles
+AUTOMATION_CONCURRENCY = int(os.getenv("EMAIL_AUTOMATION_CONCURRENCY", "8"))
+AUTOMATION_GROUP_SIZE = int(os.getenv("EMAIL_AUTOMATION_GROUP_SIZE", "10"))
+
+class AutomationExecutor:
+    """
+    Processes automated emails with many small, independent agent runs.
+
+    Instead of one conversation that works through every automated email turn
+    after turn, each email (or small group of emails) gets its own short run of
+    the automation worker agent, and up to max_concurrency runs are in flight
+    at once. All runs share the job's EmailContext, so their tool calls write
+    their results through add_automation_result as usual. A run that fails
+    records an "error" result for its emails and does not affect the others.
+    Runs can start while the emails are still being classified (see run).
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        max_concurrency: int = AUTOMATION_CONCURRENCY,
+        group_size: int = AUTOMATION_GROUP_SIZE,
+        run_config: Callable[[], RunConfig] = RunConfig,
+        on_run: Callable[[int, float, Usage], None] = None
+    ):
+        """
+        Args:
+            agent: The worker agent run for each group (see AutomationAgent.worker)
+            max_concurrency: Maximum number of runs in flight
+            group_size: Number of emails per run
+            run_config: Factory for the configuration of each run
+            on_run: Called with (email_count, seconds, usage) after every successful run
+        """
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self.group_size = max(group_size, 1)
+        self.run_config = run_config
+        self.on_run = on_run
+
+    async def run(self, context: EmailContext, classification: "asyncio.Future[Any]" = None) -> Dict[str, Any]:
+        """
+        Process every automated email in the context that has no result yet.
+
+        If a classification is still running, automated emails are processed
+        while it runs: every full group of emails whose decision a tool call has
+        recorded is started right away, and the rest once the classification is
+        done. Decisions still being streamed (see EmailContext.unconfirmed_ids)
+        are never acted on, not even after the classification is done, and a
+        group drops the emails that were escalated or moved to human review by
+        the time it starts; they are launched again if they are saved for
+        automation again. The classification itself is not
+        awaited for its result, so its errors stay with its owner.
+
+        Args:
+            context: The email context
+            classification: Future of the classification that is still saving emails, if any
+
+        Returns:
+            dict: Number of emails, runs and failed runs, and the wall time
+        """
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        launched = set()
+        tasks: List[asyncio.Task] = []
+
+        async def run_group(group: List[Email]) -> bool:
+            async with semaphore:
+                # The decisions may have changed while the group waited
+                automated = set(context.automation_ids)
+                dropped = {email.id for email in group if email.id not in automated or email.id in context.escalated}
+                launched.difference_update(dropped)
+                group = [email for email in group if email.id not in dropped and email.id not in context.automation_results]
+                if not group:
+                    return True
+                return await self._run_group(group, context)
+
+        def launch(partial: bool):
+            pending = [
+                email for email in context.get_unprocessed_automated_emails()
+                if email.id not in launched and email.id not in context.unconfirmed_ids
+            ]
+            for i in range(0, len(pending), self.group_size):
+                group = pending[i:i + self.group_size]
+                if len(group) < self.group_size and not partial:
+                    break
+                launched.update(email.id for email in group)
+                tasks.append(asyncio.create_task(run_group(group)))
+
+        changed = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        listener = lambda event_type, data: loop.call_soon_threadsafe(changed.set)
+        context.add_listener(listener)
+        try:
+            while classification is not None and not classification.done():
+                changed.clear()
+                launch(partial=False)
+                waiter = asyncio.ensure_future(changed.wait())
+                await asyncio.wait([waiter, classification], return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+            launch(partial=True)
+            outcomes = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            context.remove_listener(listener)
+
+        return {
+            "emails": len(launched),
+            "runs": len(tasks),
+            "failed_runs": list(outcomes).count(False),
+            "seconds": time.perf_counter() - start
+        }
+
+    async def _run_group(self, group: List[Email], context: EmailContext) -> bool:
+        """Run the worker agent on one group of emails. Returns False if the run failed."""
+        start = time.perf_counter()
+        try:
+            result = await Runner.run(
+                self.agent,
+                [{"role": "user", "content": f"Process these {len(group)} emails:\n{encode_emails(group, context)}"}],
+                context=context,
+                run_config=self.run_config(),
+                hooks=current_limits()
+            )
+        except JobLimitExceeded:
+            # Not a failure of this run: the whole job is out of budget
+            raise
+        except Exception as e:
+            print(f"Error in automation run for {len(group)} emails: {str(e)}")
+            for email in group:
+                if email.id not in context.automation_results:
+                    context.add_automation_result(email.id, "error", f"Error: {str(e)}")
+            return False
+
+        if self.on_run is not None:
+            self.on_run(len(group), time.perf_counter() - start, result.context_wrapper.usage)
+        return True
@@ -0,0 +1,266 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from agents.tracing import (
+    AgentSpanData,
+    FunctionSpanData,
+    GenerationSpanData,
+    HandoffSpanData,
+    ResponseSpanData,
+    Span,
+    Trace,
+    TracingProcessor,
+    TurnSpanData,
+    add_trace_processor
+)
+from email_management_system.models.email_models import EmailContext
+
+# Record per-job spans and timing; when off nothing is registered with the SDK at all
+INSTRUMENTATION_ENABLED = os.getenv("EMAIL_INSTRUMENTATION", "1") != "0"
+
+# Directory of the per-job trace files (one JSON line per span); empty to keep traces in memory only
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+TRACE_DIR = os.getenv("EMAIL_TRACE_DIR", os.path.join(_DATA_DIR, "traces"))
+# Only the newest trace files are kept; older ones are deleted whenever a trace is written (0 keeps all)
+TRACE_MAX_FILES = int(os.getenv("EMAIL_TRACE_MAX_FILES", "500"))
+
+# How often the timing breakdown of a running job is republished
+PUBLISH_INTERVAL_SECONDS = float(os.getenv("EMAIL_TIMING_PUBLISH_SECONDS", "1.0"))
+
+def _busy_seconds(intervals: List[Tuple[float, float]]) -> float:
+    """Wall time covered by at least one of the intervals."""
+    total, end = 0.0, float("-inf")
+    for start, stop in sorted(intervals):
+        if stop > end:
+            total += stop - max(start, end)
+            end = stop
+    return total
+
+class JobTimer:
+    """
+    Spans of one job: agent turns, model calls, tool calls and handoffs.
+
+    Spans are collected by the TimingProcessor while the job's timer is
+    active (see job_timing). breakdown() aggregates them into the timing
+    summary published as public_state["timing"].
+    """
+
+    def __init__(self, context: EmailContext, job_id: str):
+        self.context = context
+        self.job_id = job_id
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._open: Dict[str, Tuple[float, Optional[str]]] = {}  # span id -> (start, agent name)
+        self._last_publish = 0.0
+
+    def span_started(self, span: Span[Any]):
+        data = span.span_data
+        agent = data.name if isinstance(data, AgentSpanData) else data.agent_name if isinstance(data, TurnSpanData) else None
+        if agent is None and span.parent_id in self._open:
+            agent = self._open[span.parent_id][1]
+        self._open[span.span_id] = (time.perf_counter(), agent)
+
+    def span_ended(self, span: Span[Any]):
+        if span.span_id not in self._open:
+            return
+        start, agent = self._open.pop(span.span_id)
+        data = span.span_data
+        record = {
+            "start": start - self.start,
+            "seconds": time.perf_counter() - start,
+            "agent": agent,
+            "error": span.error["message"] if span.error else None
+        }
+
+        if isinstance(data, TurnSpanData):
+            record.update(type="turn", name=data.agent_name, turn=data.turn)
+        elif isinstance(data, (ResponseSpanData, GenerationSpanData)):
+            usage = data.usage or {}
+            if isinstance(data, ResponseSpanData) and data.response is not None and data.response.usage is not None:
+                usage = {"input_tokens": data.response.usage.input_tokens, "output_tokens": data.response.usage.output_tokens}
+            model = data.model if isinstance(data, GenerationSpanData) else (data.response.model if data.response else None)
+            record.update(
+                type="model",
+                name=model or "model",
+                input_tokens=usage.get("input_tokens", 0) or 0,
+                output_tokens=usage.get("output_tokens", 0) or 0
+            )
+        elif isinstance(data, FunctionSpanData):
+            # Our tools report failures by returning "Error: ..." instead of raising
+            if record["error"] is None and str(data.output or "").startswith("Error:"):
+                record["error"] = str(data.output)[:200]
+            record.update(type="tool", name=data.name)
+        elif isinstance(data, HandoffSpanData):
+            record.update(type="handoff", name=f"{data.from_agent}->{data.to_agent}")
+        elif isinstance(data, AgentSpanData):
+            record.update(type="agent", name=data.name)
+        else:
+            return
+
+        self.spans.append(record)
+        if record["type"] == "turn" and time.perf_counter() - self._last_publish >= PUBLISH_INTERVAL_SECONDS:
+            self.publish()
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Aggregate the spans into a timing breakdown of the job."""
+        wall = time.perf_counter() - self.start
+        turns = {"count": 0, "seconds": 0.0, "max_seconds": 0.0}
+        model = {"calls": 0, "seconds": 0.0, "busy_seconds": 0.0, "max_seconds": 0.0, "input_tokens": 0, "output_tokens": 0}
+        handoffs = {"count": 0, "seconds": 0.0, "routes": {}}
+        tools: Dict[str, Dict[str, Any]] = {}
+        agents: Dict[str, Dict[str, Any]] = {}
+        model_intervals, tool_intervals = [], []
+
+        for span in self.spans:
+            seconds = span["seconds"]
+            interval = (span["start"], span["start"] + seconds)
+            if span["type"] == "turn":
+                turns["count"] += 1
+                turns["seconds"] += seconds
+                turns["max_seconds"] = max(turns["max_seconds"], seconds)
+                agent = agents.setdefault(span["name"], {"turns": 0, "seconds": 0.0})
+                agent["turns"] += 1
+                agent["seconds"] += seconds
+            elif span["type"] == "model":
+                model["calls"] += 1
+                model["seconds"] += seconds
+                model["max_seconds"] = max(model["max_seconds"], seconds)
+                model["input_tokens"] += span["input_tokens"]
+                model["output_tokens"] += span["output_tokens"]
+                model_intervals.append(interval)
+            elif span["type"] == "tool":
+                tool = tools.setdefault(span["name"], {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "errors": 0})
+                tool["calls"] += 1
+                tool["seconds"] += seconds
+                tool["max_seconds"] = max(tool["max_seconds"], seconds)
+                tool["errors"] += 1 if span["error"] else 0
+                tool_intervals.append(interval)
+            elif span["type"] == "handoff":
+                handoffs["count"] += 1
+                handoffs["seconds"] += seconds
+                handoffs["routes"][span["name"]] = handoffs["routes"].get(span["name"], 0) + 1
+
+        model["busy_seconds"] = _busy_seconds(model_intervals)
+        return {
+            "wall_seconds": wall,
+            "turns": turns,
+            "model": model,
+            "tools": tools,
+            "tools_busy_seconds": _busy_seconds(tool_intervals),
+            "handoffs": handoffs,
+            "agents": agents,
+            # Time in which no model or tool call was in flight: our own code, queueing and scheduling
+            "other_seconds": max(wall - _busy_seconds(model_intervals + tool_intervals), 0.0),
+            "trace_file": self.trace_path()
+        }
+
+    def publish(self):
+        """Publish the current breakdown in the context's public state."""
+        self._last_publish = time.perf_counter()
+        self.context.public_state["timing"] = self.breakdown()
+        self.context.touch("timing")
+
+    def trace_path(self) -> Optional[str]:
+        return os.path.join(TRACE_DIR, f"{self.job_id}.jsonl") if TRACE_DIR else None
+
+    def write_trace(self):
+        """Write every span as one JSON line to the job's trace file."""
+        path = self.trace_path()
+        if path is None:
+            return
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for span in sorted(self.spans, key=lambda s: s["start"]):
+                    f.write(json.dumps(span) + "\n")
+        except OSError as e:
+            print(f"Error writing trace file {path}: {str(e)}")
+            return
+        prune_traces()
+
+def prune_traces(max_files: int = TRACE_MAX_FILES) -> int:
+    """Delete all but the max_files newest trace files. Returns the number deleted."""
+    if not TRACE_DIR or max_files <= 0:
+        return 0
+    try:
+        with os.scandir(TRACE_DIR) as entries:
+            files = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.name.endswith(".jsonl") and entry.is_file()]
+    except OSError as e:
+        print(f"Error listing trace files in {TRACE_DIR}: {str(e)}")
+        return 0
+    deleted = 0
+    for _, path in sorted(files, reverse=True)[max_files:]:
+        try:
+            os.remove(path)
+            deleted += 1
+        except FileNotFoundError:
+            # Another worker pruned it first
+            pass
+        except OSError as e:
+            print(f"Error removing trace file {path}: {str(e)}")
+    return deleted
+
+# The timer of the job running in the current task (asyncio tasks inherit it)
+_current_timer: ContextVar[Optional[JobTimer]] = ContextVar("email_job_timer", default=None)
+
+class TimingProcessor(TracingProcessor):
+    """SDK trace processor that hands spans to the timer of the job they belong to."""
+
+    def on_trace_start(self, trace: Trace):
+        pass
+
+    def on_trace_end(self, trace: Trace):
+        pass
+
+    def on_span_start(self, span: Span[Any]):
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.span_started(span)
+
+    def on_span_end(self, span: Span[Any]):
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.span_ended(span)
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self):
+        pass
+
+_processor: Optional[TimingProcessor] = None
+
+def install_timing_processor():
+    """Register the TimingProcessor with the SDK (once)."""
+    global _processor
+    if _processor is None:
+        _processor = TimingProcessor()
+        add_trace_processor(_processor)
+
+@contextmanager
+def job_timing(context: EmailContext, job_id: str = None) -> Iterator[Optional[JobTimer]]:
+    """
+    Record the spans of everything run inside the block for one job.
+
+    On exit the timing breakdown is published as public_state["timing"] and
+    the spans are written to the job's trace file. Yields None (and does
+    nothing) when instrumentation is disabled. Spans are only produced while
+    SDK tracing is enabled.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        yield None
+        return
+
+    install_timing_processor()
+    timer = JobTimer(context, job_id or str(uuid.uuid4()))
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+        timer.publish()
+        timer.write_trace()
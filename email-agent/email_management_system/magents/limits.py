@@ -0,0 +1,148 @@
+import asyncio
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+from agents import Agent, RunContextWrapper, RunHooks, Tool
+from agents.exceptions import AgentsException
+
+# Per-job limits (0 disables a limit); a request can lower them for its job, but not raise them
+JOB_DEADLINE_SECONDS = float(os.getenv("EMAIL_JOB_DEADLINE_SECONDS", "900"))
+JOB_MAX_TURNS = int(os.getenv("EMAIL_JOB_MAX_TURNS", "200"))
+JOB_MAX_TOOL_CALLS = int(os.getenv("EMAIL_JOB_MAX_TOOL_CALLS", "1000"))
+
+TIMED_OUT = "timed_out"
+
+class JobLimitExceeded(AgentsException):
+    """Raised from the hooks of an agent run instead of a model or tool call the job has no budget (or time) left for."""
+
+    def __init__(self, reason: str, status: str = TIMED_OUT):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+class JobLimits(RunHooks):
+    """
+    Wall-clock deadline and turn and tool call budgets of one job.
+
+    The budgets count every model call (turn) and tool call across all agent
+    runs of the job, so they also stop agents that keep handing off to each
+    other. When a limit is hit, on_exceeded is called once with the
+    "timed_out" status and a reason; it is expected to cancel the job (see
+    JobWorker.cancel), which keeps the partial results. Whether or not the
+    job could be cancelled, every model or tool call the job starts after
+    that raises JobLimitExceeded, so no call is made over a limit.
+    """
+
+    def __init__(
+        self,
+        on_exceeded: Callable[[str, str], Any],
+        deadline_seconds: float = JOB_DEADLINE_SECONDS,
+        max_turns: int = JOB_MAX_TURNS,
+        max_tool_calls: int = JOB_MAX_TOOL_CALLS
+    ):
+        """
+        Args:
+            on_exceeded: Called with (status, reason) when the first limit is hit
+            deadline_seconds: Wall-clock time the job may run for
+            max_turns: Model calls the job may make
+            max_tool_calls: Tool calls the job may make
+        """
+        self.on_exceeded = on_exceeded
+        self.deadline_seconds = deadline_seconds
+        self.max_turns = max_turns
+        self.max_tool_calls = max_tool_calls
+        self.turns = 0
+        self.tool_calls = 0
+        self.exceeded: Optional[str] = None
+        self._deadline: Optional[asyncio.TimerHandle] = None
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], on_exceeded: Callable[[str, str], Any]) -> "JobLimits":
+        """
+        Limits of a job, with the overrides of its request.
+
+        None (or a value below 1) keeps the server's limit, and an override is
+        clamped to it, so a request cannot lift a job past the EMAIL_JOB_*
+        maximums. Overrides only apply on their own when the server disables
+        that limit (0).
+        """
+        maximums = {
+            "deadline_seconds": JOB_DEADLINE_SECONDS,
+            "max_turns": JOB_MAX_TURNS,
+            "max_tool_calls": JOB_MAX_TOOL_CALLS
+        }
+        overrides = {}
+        for key, maximum in maximums.items():
+            value = payload.get(key)
+            if value is not None and value > 0:
+                overrides[key] = min(value, maximum) if maximum else value
+        return cls(on_exceeded, **overrides)
+
+    def start(self):
+        """Start the deadline clock."""
+        if self.deadline_seconds and self._deadline is None:
+            self._deadline = asyncio.get_running_loop().call_later(
+                self.deadline_seconds, self._exceed, f"Deadline of {self.deadline_seconds:g}s exceeded"
+            )
+
+    def stop(self):
+        """Stop the deadline clock."""
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+
+    def _exceed(self, reason: str):
+        if self.exceeded is None:
+            self.exceeded = reason
+            self.on_exceeded(TIMED_OUT, reason)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Usage of the budgets."""
+        return {
+            "turns": self.turns,
+            "max_turns": self.max_turns,
+            "tool_calls": self.tool_calls,
+            "max_tool_calls": self.max_tool_calls,
+            "deadline_seconds": self.deadline_seconds,
+            "exceeded": self.exceeded
+        }
+
+    async def on_llm_start(self, context: RunContextWrapper, agent: Agent, system_prompt: Optional[str], input_items: Any):
+        self.turns += 1
+        if self.max_turns and self.turns > self.max_turns:
+            self._exceed(f"Turn budget of {self.max_turns} exceeded")
+        self._check()
+
+    async def on_tool_start(self, context: RunContextWrapper, agent: Agent, tool: Tool):
+        self.tool_calls += 1
+        if self.max_tool_calls and self.tool_calls > self.max_tool_calls:
+            self._exceed(f"Tool call budget of {self.max_tool_calls} exceeded")
+        self._check()
+
+    def _check(self):
+        # Don't make the call, even if on_exceeded could not cancel the job
+        if self.exceeded is not None:
+            raise JobLimitExceeded(self.exceeded)
+
+# The limits of the job running in the current task (asyncio tasks inherit them)
+_current_limits: ContextVar[Optional[JobLimits]] = ContextVar("email_job_limits", default=None)
+
+def current_limits() -> Optional[JobLimits]:
+    """The limits of the job running in the current task, to pass as hooks to Runner.run."""
+    return _current_limits.get()
+
+@contextmanager
+def job_limits(limits: Optional[JobLimits]) -> Iterator[Optional[JobLimits]]:
+    """Apply a job's limits to every agent run inside the block. Does nothing for None."""
+    if limits is None:
+        yield None
+        return
+
+    limits.start()
+    token = _current_limits.set(limits)
+    try:
+        yield limits
+    finally:
+        _current_limits.reset(token)
+        limits.stop()
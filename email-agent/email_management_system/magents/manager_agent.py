@@ -1,19 +1,43 @@
-from agents import Agent, Runner, RunConfig, RunContextWrapper
-from typing import List, Dict, Any
-import json
-from email_management_system.models.email_models import Email, EmailContext
+from agents import Agent, RunConfig, RunContextWrapper
+from agents.models.interface import ModelProvider
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import os
+import time
+from email_management_system.models.email_models import Email, EmailContext, ClassificationResult, HUMAN_REVIEW, AUTOMATED
 from email_management_system.tools.email_tools import (
     save_emails_to_human_review, 
     save_emails_to_automation,
     get_statistics,
     write_human_review_report,
-    get_human_review_emails
+    get_human_review_emails,
+    escalate_emails
 )
 from email_management_system.magents.automation_agent import AutomationAgent
+from email_management_system.magents.automation_executor import AutomationExecutor
+from email_management_system.magents.router import ModelRouter, FAST_TIER, REASONING_TIER, TIERS, job_routing
+from email_management_system.magents.instrumentation import job_timing
+from email_management_system.magents.limits import JobLimitExceeded, JobLimits, current_limits, job_limits
+from email_management_system.magents.streaming import run_streamed
+from email_management_system.processing.chunking import chunk_emails
+from email_management_system.processing.encoding import encode_emails, encode_row
+from email_management_system.processing.preprocess import PREPROCESS_ENABLED, preprocess_emails
+from email_management_system.processing.near_duplicates import NEAR_DUPLICATES_ENABLED, NearDuplicateClusterer
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 from email_management_system.magents.react_prompt import REACT_PROMPT
 
 
+# Token budget for the emails of a single manager run, and how many runs may be in flight at once
+MAX_CHUNK_TOKENS = int(os.getenv("EMAIL_CHUNK_TOKENS", "12000"))
+MAX_CONCURRENT_CHUNKS = int(os.getenv("EMAIL_CHUNK_CONCURRENCY", "4"))
+# Process automated emails with concurrent per-email runs instead of a handoff to one automation conversation
+PARALLEL_AUTOMATION = os.getenv("EMAIL_PARALLEL_AUTOMATION", "1") != "0"
+# Classify every chunk in one structured-output turn (a typed list of ClassificationResult) instead of tool calls
+STRUCTURED_CLASSIFICATION = os.getenv("EMAIL_STRUCTURED_CLASSIFICATION", "0") == "1"
+
+# Label with which the fast tier's structured answer leaves an email to the reasoning tier
+ESCALATE = "escalate"
+
 # Define tools outside the class for easier testing
 MANAGER_TOOLS = [
     save_emails_to_human_review, 
@@ -22,6 +46,22 @@ MANAGER_TOOLS = [
     write_human_review_report,
 ]
 
+# Shared by the tool-driven and the structured-output manager
+CLASSIFICATION_GUIDELINES = """Classification Guidelines:
+Human Review if:
+- Contains sensitive or confidential information
+- Requires complex decision making
+- Contains important business information
+- From key stakeholders or clients
+- Contains legal or compliance matters
+
+Automated Processing if:
+- Marketing or promotional emails
+- Newsletter subscriptions
+- Automated notifications
+- Simple queries that can be answered automatically
+- Spam or unwanted communications"""
+
 # Define instructions outside the class for easier testing
 MANAGER_INSTRUCTIONS = f"""
 
@@ -43,20 +83,10 @@ You have the following tools available:
 - get_statistics: Get processing statistics
 - write_human_review_report: Write a report for emails needing human review
 
-Classification Guidelines:
-Human Review if:
-- Contains sensitive or confidential information
-- Requires complex decision making
-- Contains important business information
-- From key stakeholders or clients
-- Contains legal or compliance matters
+Emails are provided as a compact table with one email per row. Refer to emails by the short id
+in the first column (e.g. e3) in all tool calls and in the report.
 
-Automated Processing if:
-- Marketing or promotional emails
-- Newsletter subscriptions
-- Automated notifications
-- Simple queries that can be answered automatically
-- Spam or unwanted communications
+{CLASSIFICATION_GUIDELINES}
 
 After classification:
 1. Save the emails to their respective lists using the appropriate tools:
@@ -76,72 +106,624 @@ After classification:
 4. Hand off to the automation_agent for emails that can be processed automatically
 5. Create a final report summarizing the actions taken"""
 
+# Variant used when automated emails are processed by the AutomationExecutor instead of a handoff
+MANAGER_EXECUTOR_INSTRUCTIONS = MANAGER_INSTRUCTIONS.replace(
+    "5. Handing off to specialized agents for processing\n",
+    "5. Leaving automated emails to the automation executor\n"
+).replace(
+    "3. IMPORTANT: Make sure to save all emails to their respective lists BEFORE handing off to the automation_agent\n"
+    "4. Hand off to the automation_agent for emails that can be processed automatically\n"
+    "5. Create",
+    "3. IMPORTANT: Make sure to save every email to one of the lists. Automated emails are processed\n"
+    "   after you finish, so do not try to process them yourself\n"
+    "4. Create"
+)
+
+# Added to the fast tier's instructions, which also get the escalate_emails tool
+ESCALATION_INSTRUCTIONS = """
+
+If you cannot classify an email confidently (ambiguous intent, possible legal or financial
+consequences, a long thread you cannot follow), do not guess: call escalate_emails with its id
+and a short reason, and leave it out of both lists and the report. Escalated emails are
+classified separately by a stronger model."""
+
+# Instructions of the structured-output manager, which answers with its decisions instead of calling tools
+STRUCTURED_INSTRUCTIONS = f"""
+You are the manager agent responsible for classifying incoming emails into two categories:
+- Human Review: Emails requiring human attention
+- Automated Processing: Emails that can be handled automatically
+
+Emails are provided as a compact table with one email per row. Refer to emails by the short id
+in the first column (e.g. e3).
+
+{CLASSIFICATION_GUIDELINES}
+
+Answer with one classification result for every email in the table, in table order:
+- email_id: the short id of the email
+- classification: "{HUMAN_REVIEW}" or "{AUTOMATED}"
+- reasoning: one short sentence on why
+- action_needed: for human review, what the reviewer has to do; otherwise null
+
+The human review report is written from your reasoning and action_needed, and automated
+emails are processed after you answer, so do not process any email yourself."""
+
+# Added to the fast tier's structured instructions
+STRUCTURED_ESCALATION_INSTRUCTIONS = f"""
+
+If you cannot classify an email confidently (ambiguous intent, possible legal or financial
+consequences, a long thread you cannot follow), do not guess: classify it as "{ESCALATE}" and give
+the reason as reasoning. Escalated emails are classified separately by a stronger model."""
+
+def _render_email(email: Email) -> str:
+    """Render an email the way it appears in the manager prompt, for token budgeting."""
+    return encode_row("e0000", email)
+
+def _review_entries(entries: List[Tuple[Email, Optional[ClassificationResult]]]) -> List[str]:
+    """Write one report bullet per email, with the reasoning and the action needed if there are any."""
+    lines = []
+    for email, item in entries:
+        subject = " ".join(email.subject.split()).replace("[", "(").replace("]", ")") or "(no subject)"
+        line = f"- [{subject}]({email.id})"
+        if item is not None and item.reasoning:
+            line += f": {item.reasoning}"
+        lines.append(line)
+        if item is not None and item.action_needed:
+            lines.append(f"  > {item.action_needed}")
+    return lines
+
+def _review_report(entries: List[Tuple[Email, Optional[ClassificationResult]]]) -> str:
+    """Write the human review report of a structured answer: one bullet per email with the model's reasoning."""
+    lines = ["# Human Review Report", "", "## Emails Needing Review"] + _review_entries(entries)
+    lines += ["", "### Summary", f"**{len(entries)}** emails need human review."]
+    return "\n".join(lines)
+
+def _local_review_report(report: str, entries: List[Tuple[Email, Optional[ClassificationResult]]]) -> str:
+    """Add the emails the pre-classifiers sent to human review to the report, which may be empty."""
+    if not report:
+        return _review_report(entries)
+    return "\n".join([report, "", "## Decided Without the Model"] + _review_entries(entries))
+
 class ManagerAgent:
-    def __init__(self):
+    def __init__(
+        self,
+        max_chunk_tokens: int = MAX_CHUNK_TOKENS,
+        max_concurrency: int = MAX_CONCURRENT_CHUNKS,
+        pre_classifiers: List[Any] = None,
+        router: ModelRouter = None,
+        model_provider: ModelProvider = None,
+        parallel_automation: bool = PARALLEL_AUTOMATION,
+        preprocess: bool = PREPROCESS_ENABLED,
+        deduplicate: bool = NEAR_DUPLICATES_ENABLED,
+        structured_output: bool = STRUCTURED_CLASSIFICATION
+    ):
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_concurrency = max_concurrency
+        
+        # Local classifiers tried in order before the model. Each has a name, a
+        # classify(emails) -> {email_id: label} method and optionally
+        # learn(emails, context) and metrics() methods.
+        self.pre_classifiers = pre_classifiers or []
+        
+        # Which model tier each email goes to; model names are resolved by
+        # model_provider when one is given (e.g. a local stand-in), else by the SDK default
+        self.router = router or ModelRouter()
+        self.model_provider = model_provider
+        
+        # With parallel automation the manager does not hand off; the executor
+        # processes the automated emails once classification is done
+        self.parallel_automation = parallel_automation
+        
+        # Normalize email bodies (MIME, HTML, quotes, signatures) before anything reads them
+        self.preprocess = preprocess
+        
+        # Near-duplicate emails are sent to the model once, through a representative
+        self.clusterer = NearDuplicateClusterer() if deduplicate else None
+        
+        # Classify in one structured-output turn per chunk; the decisions are applied to the context in code
+        self.structured_output = structured_output
+        self.classifiers: Dict[str, Agent] = {tier: self._build_classifier(tier) for tier in TIERS}
+        
+        # One manager/automation agent pair per model tier
+        self.graphs: Dict[str, Tuple[Agent, Agent]] = {tier: self._build_graph(tier) for tier in TIERS}
+        self.agent, self.automation_agent = self.graphs[FAST_TIER]
+        
+        self.automation_executor = AutomationExecutor(
+            AutomationAgent(model=self.router.model_for(FAST_TIER)).worker,
+            run_config=self._run_config,
+            on_run=lambda count, seconds, usage: self.router.record_run(FAST_TIER, count, seconds, usage)
+        )
+    
+    def _build_graph(self, tier: str) -> Tuple[Agent, Agent]:
+        """Create the manager agent and automation agent of a model tier."""
+        model = self.router.model_for(tier)
+        
         # Create automation agent
-        automation_agent = AutomationAgent().agent
+        automation_agent = AutomationAgent(model=model).agent
+        
+        instructions = MANAGER_EXECUTOR_INSTRUCTIONS if self.parallel_automation else MANAGER_INSTRUCTIONS
+        tools = MANAGER_TOOLS
         
-        self.agent = Agent(
+        # Only the fast tier can escalate; the reasoning tier has to decide
+        if tier == FAST_TIER:
+            instructions = instructions + ESCALATION_INSTRUCTIONS
+            tools = MANAGER_TOOLS + [escalate_emails]
+        
+        agent = Agent(
             name="manager_agent",
-            instructions=MANAGER_INSTRUCTIONS,
-            tools=MANAGER_TOOLS,
-            handoffs=[
+            instructions=instructions,
+            tools=tools,
+            handoffs=[] if self.parallel_automation else [
                 automation_agent
             ],
-            model="o1-2024-12-17"
+            model=model
         )
 
         # give the automation agent its handoff as well
         # the automation agent will hand off to the manager agent when done processing 
-        automation_agent.handoffs = [self.agent]
+        if not self.parallel_automation:
+            automation_agent.handoffs = [agent]
+        return agent, automation_agent
+    
+    def _build_classifier(self, tier: str) -> Agent:
+        """Create the structured-output manager agent of a model tier, which has no tools and answers with its decisions."""
+        instructions = STRUCTURED_INSTRUCTIONS
+        if tier == FAST_TIER:
+            instructions = instructions + STRUCTURED_ESCALATION_INSTRUCTIONS
+        return Agent(
+            name="manager_agent",
+            instructions=instructions,
+            output_type=List[ClassificationResult],
+            model=self.router.model_for(tier)
+        )
     
-    async def process_emails(self, emails: List[Email], context: EmailContext):
+    async def process_emails(self, emails: List[Email], context: EmailContext, job_id: str = None, limits: JobLimits = None):
         """
         Process all emails by classifying and routing them.
         
+        Email bodies are first normalized (see preprocess_emails) and the result is
+        cached on each Email for the prompts of classification and automation.
+        Emails are then offered to the local pre-classifiers; whatever they are
+        confident about is saved to the context directly and only the remainder is
+        sent to the model, one representative per cluster of near-duplicates (see
+        NearDuplicateClusterer). The router sends simple emails to the fast tier and
+        complex ones to the reasoning tier, and emails the fast tier escalates are
+        classified again by the reasoning tier. With structured_output each chunk is
+        classified in one structured-output turn whose typed answer is applied to
+        the context in code (see _run_structured). With parallel automation the
+        automated emails are then processed by the automation executor. Decisions
+        the model makes are fed back to the pre-classifiers that can learn from
+        them. Agent runs are streamed, so classifications are published as the model
+        writes them, and with parallel automation the executor starts on the
+        automated emails whose tool calls have run while classification is still
+        running. Agent turns, model calls, tool calls and handoffs are timed and
+        published as public_state["timing"] (see job_timing). If the job is
+        cancelled (e.g. because it hit one of its limits), everything classified so
+        far, including the partial work of runs still in flight, stays in the
+        context. Emails that already have a decision in the context, as in a job
+        resumed from its journal, are not classified again.
+        
         Args:
             emails: List of emails to process
             context: The email context
+            job_id: Name of the job's trace file (a random id if not given)
+            limits: Deadline and turn and tool call budgets of the job
             
         Returns:
             dict: Processing results
         """
-        try:
-            # Prepare email data for the model
-            email_data = []
-            for email in emails:
-                email_data.append({
-                    "id": email.id,
-                    "sender": email.sender,
-                    "recipient": email.recipient,
-                    "subject": email.subject,
-                    "body": email.body,
-                    "timestamp": email.timestamp,
-                    "is_read": email.is_read,
-                    "folder": email.folder
-                })
-                
-            config = RunConfig(
-                workflow_name="Email Management Flow",
-                tracing_disabled=False,
-            )
-                
-            # Run the manager agent, which will handle classification and handoffs
-            result = await Runner.run(
-                self.agent,
-                [{"role": "user", "content": f"Process these {len(emails)} emails: {json.dumps(email_data, indent=2)}"}],
-                context=context,
-                run_config=config
-            )
+        with job_timing(context, job_id), job_limits(limits), job_routing() as routing:
+            try:
+                if self.parallel_automation:
+                    classification = asyncio.ensure_future(self._classify(emails, context))
+                    try:
+                        automation = await self.automation_executor.run(context, classification)
+                    except BaseException:
+                        classification.cancel()
+                        await asyncio.gather(classification, return_exceptions=True)
+                        raise
+                    remaining, result = await classification
+                    self._publish_automation(context, automation)
+                else:
+                    remaining, result = await self._classify(emails, context)
             
-            # Get statistics after processing - using the context directly instead of calling the tool
-            stats = context.get_statistics()
+                for classifier in self.pre_classifiers:
+                    if hasattr(classifier, "learn"):
+                        classifier.learn(remaining, context)
+                context.public_state["model_routing"] = self.router.metrics(routing)
+                context.touch("model_routing")
             
-            return {
-                "result": result,
-                "statistics": stats
-            }
+                # Get statistics after processing - using the context directly instead of calling the tool
+                stats = context.get_statistics()
+            
+                return {
+                    "result": result,
+                    "statistics": stats
+                }
             
-        except Exception as e:
-            print(f"Error in manager agent: {str(e)}")
-            return {"error": str(e)} 
\ No newline at end of file
+            except JobLimitExceeded:
+                # The caller stops the job, keeping what was classified so far
+                raise
+            except Exception as e:
+                print(f"Error in manager agent: {str(e)}")
+                return {"error": str(e)}
+    
+    async def _classify(self, emails: List[Email], context: EmailContext) -> Tuple[List[Email], Any]:
+        """
+        Classify emails with the pre-classifiers and then the model.
+        
+        Returns the emails the pre-classifiers left to the model, and the result of the model runs.
+        """
+        if self.preprocess:
+            context.public_state["preprocessing"] = await preprocess_emails(emails)
+            context.touch("preprocessing")
+        
+        # A resumed job (see JobJournal) already has decisions for some emails
+        classified = set(context.human_review_ids) | set(context.automation_ids)
+        resumed_report = context.human_review_report
+        unclassified = [email for email in emails if email.id not in classified]
+        remaining, sources = self._pre_classify(unclassified, context)
+        
+        result = None
+        if remaining:
+            clusters = self._cluster(remaining, context)
+            result = await self._classify_representatives(clusters, context)
+            self._keep_report(resumed_report, context)
+        self._report_local_decisions(unclassified, sources, context)
+        if (
+            (not remaining or self.structured_output) and not self.parallel_automation
+            and context.get_unprocessed_automated_emails()
+        ):
+            # Nothing handed off to the automation agent (everything was classified locally,
+            # or in structured turns); the automated emails still need handling
+            automation = await self._run_automation(context)
+            result = automation if result is None else [result, automation]
+        return remaining, result
+    
+    @staticmethod
+    def _report_local_decisions(emails: List[Email], sources: Dict[str, str], context: EmailContext):
+        """Add the emails the pre-classifiers sent to human review to the review report, which only the model writes."""
+        entries = [
+            (email, ClassificationResult(
+                email_id=email.id,
+                classification=HUMAN_REVIEW,
+                reasoning=f"decided by the {sources[email.id]} pre-classifier"
+            ))
+            for email in emails
+            if email.id in sources and context.get_classification(email.id) == HUMAN_REVIEW
+        ]
+        if entries:
+            context.set_human_review_report(_local_review_report(context.human_review_report, entries))
+    
+    @staticmethod
+    def _keep_report(resumed_report: str, context: EmailContext):
+        """Put the review report of the interrupted run back in front of a report the resumed run wrote over it."""
+        report = context.human_review_report
+        if resumed_report and report != resumed_report and not report.startswith(resumed_report):
+            context.set_human_review_report(f"{resumed_report}\n\n{report}" if report else resumed_report)
+    
+    def _pre_classify(self, emails: List[Email], context: EmailContext) -> Tuple[List[Email], Dict[str, str]]:
+        """
+        Run the pre-classifiers in order.
+        
+        Returns the emails none of them decided, and the name of the pre-classifier that decided each of the others.
+        """
+        remaining = emails
+        sources: Dict[str, str] = {}
+        metrics: Dict[str, Dict[str, Any]] = {}
+        for classifier in self.pre_classifiers:
+            if not remaining:
+                break
+            decisions = classifier.classify(remaining)
+            metrics[classifier.name] = {
+                "evaluated": len(remaining),
+                "decided": len(decisions),
+                "decision_rate": len(decisions) / len(remaining)
+            }
+            if decisions:
+                context.save_classifications(decisions, source=classifier.name)
+                sources.update((email_id, classifier.name) for email_id in decisions)
+                remaining = [email for email in remaining if email.id not in decisions]
+        
+        # Only this job's emails; the pre-classifiers' own counters cover every job of the process
+        if metrics:
+            context.public_state["pre_classifiers"] = metrics
+            context.touch("pre_classifiers")
+        return remaining, sources
+    
+    def _cluster(self, emails: List[Email], context: EmailContext) -> List[List[Email]]:
+        """Group emails into near-duplicate clusters, each starting with its representative, and publish the reduction."""
+        if self.clusterer is None:
+            return [[email] for email in emails]
+        clusters, metrics = self.clusterer.cluster(emails)
+        context.public_state["near_duplicates"] = metrics
+        context.touch("near_duplicates")
+        return clusters
+    
+    async def _classify_representatives(self, clusters: List[List[Email]], context: EmailContext):
+        """
+        Classify the representative of every cluster with the model and give each member its representative's decision.
+        
+        Decisions made on the shared context are passed on once they are
+        confirmed: a decision still streaming waits for its tool call, so a
+        member never gets a decision its representative could still lose. When
+        a representative is escalated, its members are escalated with it.
+        Decisions of child contexts (chunks, the reasoning tier) are passed on
+        when classification is done.
+        """
+        members = {cluster[0].id: cluster[1:] for cluster in clusters if len(cluster) > 1}
+        if not members:
+            return await self._classify_routed([cluster[0] for cluster in clusters], context)
+        
+        operations = {"emails_added_to_review": HUMAN_REVIEW, "emails_added_to_automation": AUTOMATED}
+        
+        def follow(event_type: str, data: Dict[str, Any]):
+            if event_type != "operation" or data.get("source") == self.clusterer.name:
+                return
+            kind = data.get("type")
+            member_ids = [member.id for email_id in data.get("email_ids", []) for member in members.get(email_id, [])]
+            if not member_ids:
+                return
+            if kind == "emails_confirmed" or (kind in operations and data.get("confirmed", True)):
+                label = data["classification"] if kind == "emails_confirmed" else operations[kind]
+                context.save_classifications({member_id: label for member_id in member_ids}, source=self.clusterer.name)
+            elif kind == "emails_escalated":
+                classified = [member_id for member_id in member_ids if context.get_classification(member_id) is not None]
+                if classified:
+                    context.escalate(classified, data.get("reason", ""))
+        
+        context.add_listener(follow)
+        try:
+            return await self._classify_routed([cluster[0] for cluster in clusters], context)
+        finally:
+            context.remove_listener(follow)
+            decisions = {}
+            for representative, cluster_members in members.items():
+                if representative in context.unconfirmed_ids:
+                    continue
+                label = context.get_classification(representative)
+                for member in cluster_members:
+                    if label is not None and context.get_classification(member.id) != label:
+                        decisions[member.id] = label
+            context.save_classifications(decisions, source=self.clusterer.name)
+    
+    def pre_classifier_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Get the metrics of every pre-classifier, totalled over all jobs of this process."""
+        return {
+            classifier.name: classifier.metrics()
+            for classifier in self.pre_classifiers
+            if hasattr(classifier, "metrics")
+        }
+    
+    async def _classify_routed(self, emails: List[Email], context: EmailContext):
+        """
+        Classify emails with the model tier the router picks for each of them.
+        
+        The fast tier runs on the shared context while the emails routed
+        straight to the reasoning tier run concurrently in a child context.
+        Children are merged only after both passes are done, so an automation
+        agent never sees emails another pass is handling. Emails the fast tier
+        escalated are then classified by the reasoning tier.
+        """
+        fast, reasoning = self.router.split(emails)
+        
+        passes = []
+        if fast:
+            passes.append(self._classify_with_agent(fast, context, FAST_TIER))
+        if reasoning:
+            passes.append(self._classify_in_child(reasoning, REASONING_TIER, context))
+        results = list(await asyncio.gather(*passes))
+        if reasoning:
+            child, results[-1] = results[-1]
+            context.merge_from(child)
+        
+        escalated = [email for email in fast if email.id in context.escalated]
+        if escalated:
+            self.router.record_escalations(len(escalated))
+            child, result = await self._classify_in_child(escalated, REASONING_TIER, context)
+            context.merge_from(child)
+            results.append(result)
+        
+        return results[0] if len(results) == 1 else results
+    
+    async def _classify_in_child(self, emails: List[Email], tier: str, context: EmailContext) -> Tuple[EmailContext, Any]:
+        """
+        Classify emails on a model tier in a child context, to be merged by the caller.
+        
+        If the run is cancelled or hits a job limit, the child's partial results are merged into the context right away.
+        """
+        child = EmailContext(emails)
+        try:
+            result = await self._classify_with_agent(emails, child, tier)
+        except (asyncio.CancelledError, JobLimitExceeded):
+            context.merge_from(child)
+            raise
+        return child, result
+    
+    async def _classify_with_agent(self, emails: List[Email], context: EmailContext, tier: str = FAST_TIER):
+        """
+        Classify emails with the manager agent.
+        
+        Large jobs are split into token-budgeted chunks that are run concurrently
+        (at most max_concurrency at a time), each against its own child context.
+        Finished chunks are merged into the shared context in chunk order, so the
+        final lists do not depend on which chunk finished first. Only a single-chunk
+        run on the shared context publishes its decisions as they stream in; chunks
+        publish theirs when they are merged.
+        """
+        chunks = chunk_emails(emails, self.max_chunk_tokens, _render_email)
+        
+        # Small jobs run directly against the shared context, as before
+        if len(chunks) <= 1:
+            return await self._run_chunk(emails, context, tier)
+        
+        context.public_state["chunks"] = [
+            {"index": i, "email_count": len(chunk), "status": "pending"}
+            for i, chunk in enumerate(chunks)
+        ]
+        context.public_state["chunks_completed"] = 0
+        context.touch("chunks", "chunks_completed")
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        chunk_contexts = [EmailContext(chunk) for chunk in chunks]
+        finished = [asyncio.Event() for _ in chunks]
+        
+        async def run_one(index: int):
+            chunk_state = context.public_state["chunks"][index]
+            async with semaphore:
+                chunk_state["status"] = "processing"
+                context.touch("chunks")
+                try:
+                    result = await self._run_chunk(chunks[index], chunk_contexts[index], tier)
+                    chunk_state["status"] = "completed"
+                    return result
+                except JobLimitExceeded:
+                    chunk_state["status"] = "cancelled"
+                    raise
+                except Exception as e:
+                    chunk_state["status"] = "error"
+                    chunk_state["error"] = str(e)
+                    return None
+                finally:
+                    context.touch("chunks")
+                    finished[index].set()
+        
+        async def merge_in_order():
+            for index, chunk_context in enumerate(chunk_contexts):
+                await finished[index].wait()
+                context.merge_from(chunk_context)
+                chunk_state = context.public_state["chunks"][index]
+                chunk_state["human_review_count"] = len(chunk_context.human_review_ids)
+                chunk_state["automation_count"] = len(chunk_context.automation_ids)
+                context.public_state["chunks_completed"] = index + 1
+                context.touch("chunks", "chunks_completed")
+        
+        merger = asyncio.create_task(merge_in_order())
+        runs = [asyncio.ensure_future(run_one(i)) for i in range(len(chunks))]
+        try:
+            results = await asyncio.gather(*runs)
+        except (asyncio.CancelledError, JobLimitExceeded):
+            # Keep what the unmerged chunks classified before the job was stopped
+            merger.cancel()
+            for run in runs:
+                run.cancel()
+            await asyncio.gather(*runs, return_exceptions=True)
+            merged = context.public_state.get("chunks_completed", 0)
+            for chunk_context in chunk_contexts[merged:]:
+                context.merge_from(chunk_context)
+            raise
+        await merger
+        return results
+    
+    def _run_config(self) -> RunConfig:
+        """Create the run configuration, with the model provider if one was given."""
+        config = RunConfig(
+            workflow_name="Email Management Flow",
+            tracing_disabled=False,
+        )
+        if self.model_provider is not None:
+            config.model_provider = self.model_provider
+        return config
+    
+    async def _run_automation(self, context: EmailContext):
+        """
+        Process the emails saved for automation that have no result yet, when no manager run handed them off.
+        
+        The automation agent of the handoff graph would hand back to a manager
+        with nothing left to do, so the emails go to the automation executor's
+        stand-alone worker instead.
+        """
+        automation = await self.automation_executor.run(context)
+        self._publish_automation(context, automation)
+        return automation
+    
+    @staticmethod
+    def _publish_automation(context: EmailContext, automation: Dict[str, Any]):
+        """Expose the automation executor's summary in the public state."""
+        if automation["emails"]:
+            context.public_state["automation"] = automation
+            context.touch("automation")
+    
+    async def _run_chunk(self, emails: List[Email], context: EmailContext, tier: str = FAST_TIER):
+        """Run the manager agent of a model tier over one chunk of emails against the given context."""
+        if self.structured_output:
+            return await self._run_structured(emails, context, tier)
+        encoded = encode_emails(emails, context)
+        agent = self.graphs[tier][0]
+        
+        # Run the manager agent, which will handle classification and handoffs;
+        # its decisions are saved to the context as they stream in
+        start = time.perf_counter()
+        result = await run_streamed(
+            agent,
+            [{"role": "user", "content": f"Process these {len(emails)} emails:\n{encoded}"}],
+            context,
+            run_config=self._run_config(),
+            hooks=current_limits()
+        )
+        self.router.record_run(tier, len(emails), time.perf_counter() - start, result.context_wrapper.usage)
+        return result
+    
+    async def _run_structured(self, emails: List[Email], context: EmailContext, tier: str = FAST_TIER):
+        """
+        Classify one chunk of emails in a single structured-output turn and apply the answer to the context.
+        
+        The tool-driven manager needs a turn for its tool calls and another for
+        its final message (more if it calls the tools one at a time); here the
+        model's only turn returns a List[ClassificationResult].
+        """
+        encoded = encode_emails(emails, context)
+        start = time.perf_counter()
+        result = await run_streamed(
+            self.classifiers[tier],
+            [{"role": "user", "content": f"Classify these {len(emails)} emails:\n{encoded}"}],
+            context,
+            run_config=self._run_config(),
+            hooks=current_limits()
+        )
+        self.router.record_run(tier, len(emails), time.perf_counter() - start, result.context_wrapper.usage)
+        self._apply_classifications(emails, result.final_output or [], context, tier)
+        return result
+    
+    @staticmethod
+    def _apply_classifications(emails: List[Email], results: List[ClassificationResult], context: EmailContext, tier: str):
+        """
+        Save a structured answer's decisions to the context and write the human review report from it.
+        
+        Results for emails outside the chunk are ignored. Emails the answer left
+        out or gave an unknown label are escalated from the fast tier; the
+        reasoning tier cannot escalate, so they go to human review.
+        """
+        chunk = {email.id: email for email in emails}
+        decisions: Dict[str, str] = {}
+        reviewed: Dict[str, ClassificationResult] = {}
+        escalations: Dict[str, List[str]] = {}  # reason -> email ids
+        for item in results:
+            email_id = context.resolve_email_id(item.email_id)
+            if email_id not in chunk or email_id in decisions:
+                continue
+            label = item.classification.strip().lower()
+            if label not in (HUMAN_REVIEW, AUTOMATED) and tier != FAST_TIER:
+                label = HUMAN_REVIEW
+            if label in (HUMAN_REVIEW, AUTOMATED):
+                decisions[email_id] = label
+                if label == HUMAN_REVIEW:
+                    reviewed[email_id] = item
+            else:
+                escalations.setdefault(item.reasoning or "unclear classification", []).append(email_id)
+        
+        escalated = {email_id for email_ids in escalations.values() for email_id in email_ids}
+        missing = [email_id for email_id in chunk if email_id not in decisions and email_id not in escalated]
+        if missing and tier == FAST_TIER:
+            escalations.setdefault("not classified", []).extend(missing)
+        elif missing:
+            decisions.update((email_id, HUMAN_REVIEW) for email_id in missing)
+        
+        context.save_classifications(decisions)
+        for reason, email_ids in escalations.items():
+            context.escalate(email_ids, reason)
+        
+        human_review = [email_id for email_id, label in decisions.items() if label == HUMAN_REVIEW]
+        if human_review:
+            context.set_human_review_report(_review_report(
+                [(chunk[email_id], reviewed.get(email_id)) for email_id in human_review]
+            ))
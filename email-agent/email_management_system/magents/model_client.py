@@ -0,0 +1,56 @@
+import os
+from typing import Optional
+import httpx
+from openai import AsyncOpenAI
+from agents import set_default_openai_client
+
+# Connection pool shared by every model call in this process
+MAX_CONNECTIONS = int(os.getenv("EMAIL_MODEL_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("EMAIL_MODEL_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("EMAIL_MODEL_KEEPALIVE_SECONDS", "60"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("EMAIL_MODEL_TIMEOUT_SECONDS", "300"))
+
+_client: Optional[AsyncOpenAI] = None
+
+def configure_model_client(api_key: str = None) -> Optional[AsyncOpenAI]:
+    """
+    Create the process-wide model client and make it the SDK default.
+
+    Without a default client every Runner.run builds a new provider with its
+    own OpenAI client and connection pool, so each job (and each chunk) pays
+    for fresh TCP and TLS handshakes. The shared client keeps connections
+    alive between runs. It is also used to export traces.
+
+    Args:
+        api_key: The OpenAI API key (defaults to OPENAI_API_KEY)
+
+    Returns:
+        AsyncOpenAI: The shared client, or None if no API key is configured
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("OPENAI_API_KEY is not set; model calls will fail until it is")
+        return None
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10.0)
+    )
+    _client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+    set_default_openai_client(_client, use_for_tracing=True)
+    return _client
+
+async def close_model_client():
+    """Close the shared model client and its connections."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
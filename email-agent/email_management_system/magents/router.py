@@ -0,0 +1,186 @@
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from agents.models.interface import Model
+from agents.usage import Usage
+from email_management_system.models.email_models import Email
+from email_management_system.processing.chunking import estimate_tokens
+from email_management_system.processing.encoding import clean_body
+
+FAST_TIER = "fast"
+REASONING_TIER = "reasoning"
+TIERS = (FAST_TIER, REASONING_TIER)
+
+# Models used by each tier
+FAST_MODEL = os.getenv("EMAIL_FAST_MODEL", "gpt-4o-mini")
+REASONING_MODEL = os.getenv("EMAIL_REASONING_MODEL", "o1-2024-12-17")
+
+# Emails scoring at least this complexity skip the fast tier
+COMPLEXITY_THRESHOLD = float(os.getenv("EMAIL_ROUTER_COMPLEXITY_THRESHOLD", "0.5"))
+
+# A cleaned body of this many tokens counts as fully "long"
+LONG_EMAIL_TOKENS = 400
+
+_SENSITIVE = re.compile(
+    r"\b(confidential|legal|lawyer|attorney|lawsuit|contract|compliance|gdpr|subpoena|"
+    r"invoice dispute|refund|termination|resignation|acquisition|merger|board meeting|"
+    r"salary|payroll|audit|breach|incident)\b",
+    re.IGNORECASE
+)
+_THREAD_MARKER = re.compile(r"^\s*(>|On\s.+wrote:|-{2,}\s*Original Message)", re.IGNORECASE | re.MULTILINE)
+_RECIPIENT_SEPARATOR = re.compile(r"[,;]")
+
+def email_complexity(email: Email) -> float:
+    """
+    Score how hard an email is to classify, from 0 (trivial) to 1.
+
+    The score adds up cheap signals: body length, depth of the quoted thread,
+    attachments, sensitive business or legal vocabulary, and several recipients.
+    Length and vocabulary are taken from the normalized body if the email was
+    preprocessed, so MIME parts and HTML markup don't count.
+    """
+    body_tokens = estimate_tokens(clean_body(email.text, max_chars=4000, strip=not email.is_stripped))
+    thread_depth = len(_THREAD_MARKER.findall(email.body or ""))
+
+    score = 0.35 * min(body_tokens / LONG_EMAIL_TOKENS, 1.0)
+    score += 0.2 * min(thread_depth / 3, 1.0)
+    if email.attachments or (email.normalized is not None and email.normalized.attachments):
+        score += 0.15
+    if _SENSITIVE.search(f"{email.subject}\n{email.text}"):
+        score += 0.5
+    if _RECIPIENT_SEPARATOR.search(email.recipient or ""):
+        score += 0.1
+    return min(score, 1.0)
+
+class RoutingMetrics:
+    """Emails routed per tier, escalations, and the latency and token usage of the runs on each tier."""
+
+    def __init__(self):
+        self.routed = 0
+        self.routed_to_reasoning = 0
+        self.escalated = 0
+        self.tier_metrics: Dict[str, Dict[str, Any]] = {
+            tier: {"runs": 0, "emails": 0, "seconds": 0.0, "requests": 0, "input_tokens": 0, "output_tokens": 0}
+            for tier in TIERS
+        }
+
+    def record_split(self, routed: int, routed_to_reasoning: int):
+        self.routed += routed
+        self.routed_to_reasoning += routed_to_reasoning
+
+    def record_run(self, tier: str, email_count: int, seconds: float, usage: Usage = None):
+        metrics = self.tier_metrics[tier]
+        metrics["runs"] += 1
+        metrics["emails"] += email_count
+        metrics["seconds"] += seconds
+        if usage is not None:
+            metrics["requests"] += usage.requests
+            metrics["input_tokens"] += usage.input_tokens
+            metrics["output_tokens"] += usage.output_tokens
+
+    def record_escalations(self, count: int):
+        self.escalated += count
+
+    def to_dict(self, models: Dict[str, Union[str, Model]]) -> Dict[str, Any]:
+        """Get per-tier latency and token metrics and the escalation rate, naming each tier's model."""
+        tiers = {}
+        for tier, metrics in self.tier_metrics.items():
+            model = models[tier]
+            tiers[tier] = dict(
+                metrics,
+                model=model if isinstance(model, str) else type(model).__name__,
+                seconds_per_run=metrics["seconds"] / metrics["runs"] if metrics["runs"] else 0.0
+            )
+        fast_emails = self.routed - self.routed_to_reasoning
+        return {
+            "tiers": tiers,
+            "routed": self.routed,
+            "routed_to_reasoning": self.routed_to_reasoning,
+            "escalated": self.escalated,
+            "escalation_rate": self.escalated / fast_emails if fast_emails else 0.0,
+            "reasoning_share": (self.routed_to_reasoning + self.escalated) / self.routed if self.routed else 0.0
+        }
+
+_current_routing: ContextVar[Optional[RoutingMetrics]] = ContextVar("email_job_routing", default=None)
+
+@contextmanager
+def job_routing() -> Iterator[RoutingMetrics]:
+    """Count the routing of everything run inside the block (one job) separately from the router's process totals."""
+    metrics = RoutingMetrics()
+    token = _current_routing.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_routing.reset(token)
+
+class ModelRouter:
+    """
+    Routes emails between a fast model tier and a reasoning model tier.
+
+    Emails go to the fast tier unless their complexity score reaches the
+    threshold. The fast tier can also escalate emails it is not confident
+    about (see the escalate_emails tool), which are then classified again by
+    the reasoning tier. Latency, token usage and escalations are tracked per
+    tier. The router is shared by every job in the process, so metrics() gives
+    the process totals; each job's own numbers are counted inside job_routing.
+    """
+
+    def __init__(
+        self,
+        fast_model: Union[str, Model] = FAST_MODEL,
+        reasoning_model: Union[str, Model] = REASONING_MODEL,
+        complexity_threshold: float = COMPLEXITY_THRESHOLD
+    ):
+        """
+        Args:
+            fast_model: Model name (or Model instance) of the fast tier
+            reasoning_model: Model name (or Model instance) of the reasoning tier
+            complexity_threshold: Complexity score from which emails skip the fast tier
+        """
+        self.models = {FAST_TIER: fast_model, REASONING_TIER: reasoning_model}
+        self.complexity_threshold = complexity_threshold
+
+        # Metrics of every job in the process
+        self.totals = RoutingMetrics()
+
+    def model_for(self, tier: str) -> Union[str, Model]:
+        """Get the model of a tier."""
+        return self.models[tier]
+
+    def split(self, emails: List[Email]) -> Tuple[List[Email], List[Email]]:
+        """Split emails into (fast tier, reasoning tier) by complexity, keeping their order."""
+        fast, reasoning = [], []
+        for email in emails:
+            if email_complexity(email) >= self.complexity_threshold:
+                reasoning.append(email)
+            else:
+                fast.append(email)
+        for metrics in self._recorders():
+            metrics.record_split(len(emails), len(reasoning))
+        return fast, reasoning
+
+    def record_run(self, tier: str, email_count: int, seconds: float, usage: Usage = None):
+        """Record the latency and token usage of one agent run on a tier."""
+        for metrics in self._recorders():
+            metrics.record_run(tier, email_count, seconds, usage)
+
+    def record_escalations(self, count: int):
+        """Record emails the fast tier escalated to the reasoning tier."""
+        for metrics in self._recorders():
+            metrics.record_escalations(count)
+
+    def _recorders(self) -> List[RoutingMetrics]:
+        """The process totals, and the metrics of the job running in the current task if there is one."""
+        job = _current_routing.get()
+        return [self.totals] if job is None else [self.totals, job]
+
+    def metrics(self, job: RoutingMetrics = None) -> Dict[str, Any]:
+        """
+        Get per-tier latency and token metrics and the escalation rate.
+
+        Args:
+            job: The metrics of one job (see job_routing); the process totals if not given
+        """
+        return (job or self.totals).to_dict(self.models)
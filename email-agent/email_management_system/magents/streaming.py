@@ -0,0 +1,97 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+from agents import Agent, RunConfig, RunHooks, Runner
+from agents.result import RunResultStreaming
+from openai.types.responses import ResponseFunctionCallArgumentsDeltaEvent, ResponseOutputItemAddedEvent
+from email_management_system.models.email_models import EmailContext
+
+# A complete string inside the email_ids array of a partially streamed tool call
+_STREAMED_ID = re.compile(r'"((?:[^"\\]|\\.)*)"\s*(?=[,\]])')
+
+class ClassificationStream:
+    """
+    Publishes classification decisions while the model is still writing them.
+
+    save_emails_to_human_review and save_emails_to_automation calls are read
+    from the streamed tool call arguments: every email id is saved to the
+    context as soon as its closing quote arrives, long before the tool call
+    itself runs. These decisions are unconfirmed (see
+    EmailContext.unconfirmed_ids), since a later call of the same run may
+    still escalate or move the email; nothing irreversible is done with them.
+    The tool then saves the same ids again, which confirms them. Decisions
+    whose tool call never ran are taken back with rollback.
+    """
+
+    def __init__(self, context: EmailContext):
+        self.context = context
+        self.targets: Dict[str, Callable[[List[str]], None]] = {
+            "save_emails_to_human_review": lambda email_ids: context.save_to_human_review(email_ids, confirmed=False),
+            "save_emails_to_automation": lambda email_ids: context.save_to_automation(email_ids, confirmed=False)
+        }
+        self._calls: Dict[str, Dict[str, Any]] = {}  # streamed item id -> tool name, arguments so far, scan position
+        self.published = 0
+        self._published_ids: Dict[str, None] = {}  # in order, without duplicates
+
+    def feed(self, event: Any):
+        """Handle one raw model stream event."""
+        if isinstance(event, ResponseOutputItemAddedEvent):
+            item = event.item
+            if getattr(item, "type", None) == "function_call" and item.name in self.targets:
+                self._calls[item.id] = {"name": item.name, "arguments": item.arguments or "", "position": None}
+        elif isinstance(event, ResponseFunctionCallArgumentsDeltaEvent):
+            call = self._calls.get(event.item_id)
+            if call is not None:
+                call["arguments"] += event.delta
+                self._publish(call)
+
+    def _publish(self, call: Dict[str, Any]):
+        arguments = call["arguments"]
+        if call["position"] is None:
+            # Ids start after the opening bracket of the email_ids array
+            start = arguments.find("[")
+            if start < 0:
+                return
+            call["position"] = start + 1
+
+        email_ids = []
+        for match in _STREAMED_ID.finditer(arguments, call["position"]):
+            call["position"] = match.end()
+            if self.context.get_email_by_id(match.group(1)) is not None:
+                email_ids.append(match.group(1))
+        if email_ids:
+            self.targets[call["name"]](email_ids)
+            self.published += len(email_ids)
+            self._published_ids.update(dict.fromkeys(email_ids))
+
+    def rollback(self, reason: str):
+        """Withdraw the published decisions that no tool call has confirmed (see EmailContext.withdraw_unconfirmed)."""
+        if self._published_ids:
+            self.context.withdraw_unconfirmed(list(self._published_ids), reason)
+
+async def run_streamed(
+    agent: Agent,
+    input: Any,
+    context: EmailContext,
+    run_config: RunConfig = None,
+    hooks: Optional[RunHooks] = None
+) -> RunResultStreaming:
+    """
+    Run an agent with streaming, publishing its classification decisions as they stream in.
+
+    Returns the finished run result. Errors of the run are raised, and if the
+    caller is cancelled the run is cancelled too. Either way, streamed
+    decisions that no tool call confirmed are withdrawn when the run ends.
+    """
+    result = Runner.run_streamed(agent, input, context=context, run_config=run_config, hooks=hooks)
+    stream = ClassificationStream(context)
+    try:
+        async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                stream.feed(event.data)
+    except BaseException:
+        result.cancel()
+        stream.rollback("the run stopped before the tool call ran")
+        raise
+    # A tool call can stream and then not run, e.g. when its arguments turn out to be invalid
+    stream.rollback("the tool call never ran")
+    return result
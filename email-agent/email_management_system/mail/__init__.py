@@ -0,0 +1,12 @@
+from .client import MailBackendClient, get_mail_client, close_mail_client
+from .writeback import MailWriter, JobWriteBack, get_mail_writer, close_mail_writer
+
+__all__ = [
+    'MailBackendClient',
+    'get_mail_client',
+    'close_mail_client',
+    'MailWriter',
+    'JobWriteBack',
+    'get_mail_writer',
+    'close_mail_writer'
+]
@@ -0,0 +1,209 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from email_management_system.models.email_models import Email
+
+# The mail backend's API (aia-demo-mail/backend), which jobs can fetch their emails from
+MAIL_BACKEND_URL = os.getenv("EMAIL_MAIL_BACKEND_URL", "http://localhost:8000/api")
+# Emails per page, and how many pages are fetched at once
+PAGE_SIZE = int(os.getenv("EMAIL_MAIL_PAGE_SIZE", "100"))
+MAX_CONCURRENT_PAGES = int(os.getenv("EMAIL_MAIL_MAX_CONCURRENT_PAGES", "4"))
+# Connection pool shared by every request to the mail backend in this process
+MAX_CONNECTIONS = int(os.getenv("EMAIL_MAIL_MAX_CONNECTIONS", "10"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("EMAIL_MAIL_TIMEOUT_SECONDS", "30"))
+# Retries of a request after a connection error or a 5xx response
+MAX_RETRIES = 2
+
+class MailBackendClient:
+    """
+    Fetches emails from the mail backend by reference.
+
+    Instead of receiving every email in the /process-emails request, a job can
+    name a list of email IDs or a mailbox query (folder, read state and a
+    limit). The messages are then fetched here in pages of page_size, with up
+    to max_concurrent_pages requests in flight over one keep-alive connection
+    pool, and each page is handed to the caller as soon as it arrives.
+    Listing emails does not mark them as read in the mail backend.
+
+    Replies and read-state changes are written back in batches (see
+    write_batch and MailWriter).
+    """
+
+    def __init__(
+        self,
+        base_url: str = MAIL_BACKEND_URL,
+        page_size: int = PAGE_SIZE,
+        max_concurrent_pages: int = MAX_CONCURRENT_PAGES,
+        http_client: httpx.AsyncClient = None
+    ):
+        """
+        Args:
+            base_url: URL of the mail backend's API
+            page_size: Emails per request
+            max_concurrent_pages: Requests in flight at once
+            http_client: Client to send requests with (a pooled client is created if not given)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.page_size = page_size
+        self.max_concurrent_pages = max_concurrent_pages
+        self._http = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10.0)
+        )
+
+    async def fetch_pages(self, email_ids: List[str] = None, query: Dict[str, Any] = None) -> AsyncIterator[List[Email]]:
+        """
+        Fetch emails by ID or by mailbox query, one page at a time.
+
+        Pages are yielded in the order they arrive, which is not necessarily
+        the order of the IDs or of the mailbox. Emails that were already
+        yielded are left out of later pages, and IDs the mail backend does not
+        know are skipped.
+
+        Args:
+            email_ids: IDs of the emails to fetch
+            query: Otherwise, a mailbox query: folder, is_read and limit (all optional)
+
+        Yields:
+            list: The emails of one page
+        """
+        if email_ids is not None:
+            ids = list(dict.fromkeys(email_ids))
+            requests = [
+                {"ids": ids[start:start + self.page_size]}
+                for start in range(0, len(ids), self.page_size)
+            ]
+            pages = self._fetch_all(requests)
+        else:
+            pages = self._fetch_query(query or {})
+
+        seen = set()
+        async for page in pages:
+            emails = []
+            for item in page:
+                if item["id"] not in seen:
+                    seen.add(item["id"])
+                    emails.append(_to_email(item))
+            yield emails
+
+    async def _fetch_query(self, query: Dict[str, Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """The pages of a mailbox query: the first one tells how many emails match, the rest are fetched concurrently."""
+        params = {key: query[key] for key in ("folder", "is_read") if query.get(key) is not None}
+        if isinstance(params.get("is_read"), bool):
+            params["is_read"] = "true" if params["is_read"] else "false"
+        limit = query.get("limit")
+
+        first_size = self.page_size if limit is None else min(self.page_size, limit)
+        response = await self._get({**params, "offset": 0, "limit": first_size})
+        page = response.json()
+        yield page
+
+        total = response.headers.get("X-Total-Count")
+        if total is None:
+            # Without a count, page through until a short page
+            offset = len(page)
+            while len(page) == first_size and (limit is None or offset < limit):
+                size = self.page_size if limit is None else min(self.page_size, limit - offset)
+                page = (await self._get({**params, "offset": offset, "limit": size})).json()
+                offset += len(page)
+                yield page
+            return
+
+        end = int(total) if limit is None else min(int(total), limit)
+        requests = [
+            {**params, "offset": offset, "limit": min(self.page_size, end - offset)}
+            for offset in range(first_size, end, self.page_size)
+        ]
+        async for page in self._fetch_all(requests):
+            yield page
+
+    async def _fetch_all(self, requests: List[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Fetch pages with at most max_concurrent_pages requests in flight, yielding each as it arrives."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+
+        async def fetch(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return (await self._get(params)).json()
+
+        tasks = [asyncio.ensure_future(fetch(params)) for params in requests]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                yield await next_page
+        finally:
+            # The caller stopped early or a page failed: don't leave requests running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def write_batch(self, replies: List[Dict[str, Any]], read_states: List[Dict[str, Any]], max_retries: int = MAX_RETRIES) -> Dict[str, Any]:
+        """
+        Send replies and read-state changes to the mail backend in one request.
+
+        Replies should carry an idempotency_key, so retrying a request that
+        the mail backend already applied does not send them twice.
+
+        Args:
+            replies: Dicts with email_id, body and idempotency_key
+            read_states: Dicts with email_id and is_read
+            max_retries: Retries after a connection error or a 5xx response
+
+        Returns:
+            dict: The outcome of every reply and read-state change, in order
+        """
+        response = await self._request(
+            "POST", "/emails/batch", max_retries, json={"replies": replies, "read_states": read_states}
+        )
+        return response.json()
+
+    async def _get(self, params: Dict[str, Any]) -> httpx.Response:
+        """GET /emails."""
+        return await self._request("GET", "/emails", MAX_RETRIES, params=params)
+
+    async def _request(self, method: str, path: str, max_retries: int, **kwargs) -> httpx.Response:
+        """Send a request, retrying connection errors and 5xx responses with exponential backoff."""
+        for attempt in range(max_retries + 1):
+            try:
+                response = await self._http.request(method, f"{self.base_url}{path}", **kwargs)
+                if response.status_code < 500 or attempt == max_retries:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt == max_retries:
+                    raise
+            await asyncio.sleep(0.2 * 2 ** attempt)
+
+    async def close(self):
+        """Close the connections of the client."""
+        await self._http.aclose()
+
+def _to_email(item: Dict[str, Any]) -> Email:
+    """An Email from the mail backend's JSON representation."""
+    return Email(
+        id=item["id"],
+        sender=item["sender"],
+        recipient=item["recipient"],
+        subject=item["subject"],
+        body=item["body"],
+        timestamp=str(item["timestamp"]),
+        is_read=item.get("is_read", False),
+        folder=item.get("folder", "inbox"),
+        attachments=item.get("attachments") or [],
+        headers=item.get("headers") or {}
+    )
+
+_client: Optional[MailBackendClient] = None
+
+def get_mail_client() -> MailBackendClient:
+    """Get the process-wide mail backend client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = MailBackendClient()
+    return _client
+
+async def close_mail_client():
+    """Close the process-wide mail backend client and its connections."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from email_management_system.mail.client import MailBackendClient, get_mail_client
+from email_management_system.models.email_models import EmailContext
+
+# Automation results written back to the mail backend; failed runs ("error") and ignored emails are left unread
+WRITE_BACK_ACTIONS = ("reply", "unsubscribe")
+
+# Writes are collected for this long before a batch is sent, and at most this many go in one batch
+FLUSH_INTERVAL_SECONDS = float(os.getenv("EMAIL_MAIL_FLUSH_SECONDS", "0.2"))
+MAX_BATCH_SIZE = int(os.getenv("EMAIL_MAIL_BATCH_SIZE", "200"))
+# Retries of a batch after a connection error or a 5xx response
+WRITE_RETRIES = int(os.getenv("EMAIL_MAIL_WRITE_RETRIES", "4"))
+
+def reply_key(email_id: str, content: str) -> str:
+    """Idempotency key of a reply: the same reply to the same email is only ever sent once."""
+    digest = hashlib.sha256(f"{email_id}\x00{content}".encode("utf-8")).hexdigest()
+    return f"reply:{digest[:32]}"
+
+class MailWriter:
+    """
+    Writes replies and read-state changes back to the mail backend in batches.
+
+    Writes are queued and return a future right away. The queue is sent as
+    one POST /emails/batch request once it has been collecting for
+    flush_interval seconds or holds max_batch_size writes, so N automated
+    actions cost a few requests instead of N. Writes are coalesced while they
+    wait: a reply queued twice (same email, same content) is sent once, and
+    of several read-state changes to one email only the last is sent.
+
+    Every reply carries an idempotency key (see reply_key), so a batch that is
+    retried after a timeout, or a reply queued again by a resumed job or by a
+    user applying an action that was already applied, is not sent twice.
+    Each future resolves to the outcome of its write: "created", "updated",
+    "duplicate", "not_found" or, once the retries are used up, "failed".
+    Writes must be queued from the event loop's thread.
+    """
+
+    def __init__(
+        self,
+        client: MailBackendClient = None,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        retries: int = WRITE_RETRIES
+    ):
+        """
+        Args:
+            client: Client of the mail backend (the process-wide client if not given)
+            flush_interval: Seconds a write may wait for others to join its batch
+            max_batch_size: Maximum number of writes in one request
+            retries: Retries of a batch after a connection error or a 5xx response
+        """
+        self._client = client
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.retries = retries
+        # idempotency key -> (reply, futures); email_id -> (is_read, futures)
+        self._replies: Dict[str, Tuple[Dict[str, Any], List[asyncio.Future]]] = {}
+        self._read_states: Dict[str, Tuple[bool, List[asyncio.Future]]] = {}
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._flush_now = False
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"requests": 0, "replies": 0, "read_states": 0, "coalesced": 0, "duplicates": 0, "not_found": 0, "failed": 0}
+
+    @property
+    def client(self) -> MailBackendClient:
+        return self._client or get_mail_client()
+
+    def reply(self, email_id: str, content: str, idempotency_key: str = None) -> asyncio.Future:
+        """
+        Queue a reply to an email.
+
+        Args:
+            email_id: The email to answer; the reply goes to its sender
+            content: Body of the reply
+            idempotency_key: Key that makes the reply unique (reply_key of the email and content if not given)
+
+        Returns:
+            Future: The outcome of the reply
+        """
+        key = idempotency_key or reply_key(email_id, content)
+        future = asyncio.get_running_loop().create_future()
+        if key in self._replies:
+            self._replies[key][1].append(future)
+            self._stats["coalesced"] += 1
+        else:
+            self._replies[key] = ({"email_id": email_id, "body": content, "idempotency_key": key}, [future])
+        self._queued()
+        return future
+
+    def mark_read(self, email_ids: List[str], is_read: bool = True) -> asyncio.Future:
+        """
+        Queue marking emails as read (or unread).
+
+        Returns:
+            Future: The outcomes of the emails, in order
+        """
+        futures = []
+        for email_id in email_ids:
+            future = asyncio.get_running_loop().create_future()
+            if email_id in self._read_states:
+                self._read_states[email_id][1].append(future)
+                self._read_states[email_id] = (is_read, self._read_states[email_id][1])
+                self._stats["coalesced"] += 1
+            else:
+                self._read_states[email_id] = (is_read, [future])
+            futures.append(future)
+        self._queued()
+        return asyncio.gather(*futures)
+
+    async def flush(self):
+        """Send everything queued right away and wait until it has been written."""
+        if self._replies or self._read_states:
+            self._flush_now = True
+            self._wake.set()
+        await self._idle.wait()
+
+    async def close(self):
+        """Flush the queue and stop sending."""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, int]:
+        """Requests sent and writes by outcome, since the writer was created."""
+        return dict(self._stats)
+
+    def _queued(self):
+        self._idle.clear()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._replies) + len(self._read_states) >= self.max_batch_size:
+            self._flush_now = True
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            if not self._flush_now:
+                # Let the writes that follow join this batch
+                try:
+                    await asyncio.wait_for(self._until_full(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            self._flush_now = False
+            while self._replies or self._read_states:
+                await self._send(*self._take())
+            self._idle.set()
+
+    async def _until_full(self):
+        while not self._flush_now:
+            self._wake.clear()
+            await self._wake.wait()
+
+    def _take(self) -> Tuple[list, list]:
+        """Take up to max_batch_size writes off the queue, replies first."""
+        room = self.max_batch_size
+        replies = [self._replies.pop(key) for key in list(self._replies)[:room]]
+        room -= len(replies)
+        read_states = [(email_id, *self._read_states.pop(email_id)) for email_id in list(self._read_states)[:room]]
+        return replies, read_states
+
+    async def _send(self, replies: list, read_states: list):
+        try:
+            result = await self.client.write_batch(
+                [reply for reply, _ in replies],
+                [{"email_id": email_id, "is_read": is_read} for email_id, is_read, _ in read_states],
+                max_retries=self.retries
+            )
+            outcomes = [item["status"] for item in result["replies"]] + [item["status"] for item in result["read_states"]]
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            print(f"Error writing {len(replies) + len(read_states)} changes to the mail backend: {str(e)}")
+            outcomes = ["failed"] * (len(replies) + len(read_states))
+        else:
+            self._stats["requests"] += 1
+
+        futures = [futures for _, futures in replies] + [futures for _, _, futures in read_states]
+        for index, (outcome, waiting) in enumerate(zip(outcomes, futures)):
+            if outcome == "duplicate":
+                self._stats["duplicates"] += 1
+            elif outcome in ("not_found", "failed"):
+                self._stats[outcome] += 1
+            elif index < len(replies):
+                self._stats["replies"] += 1
+            else:
+                self._stats["read_states"] += 1
+            for future in waiting:
+                if not future.done():
+                    future.set_result(outcome)
+
+class JobWriteBack:
+    """
+    Writes a job's automation results back to the mail backend as they are recorded.
+
+    A reply is sent and its email marked as read; an email that was
+    unsubscribed from is marked as read. Other results (an ignored email, or
+    the "error" result of a failed automation run) are not written, so those
+    emails stay unread for the user to see. Results already in the context
+    when it is attached, such as those replayed from a job's journal,
+    are written too; idempotency keys keep replies from being sent twice. The
+    outcomes are counted in public_state["write_back"].
+
+    Tools may record results from worker threads, so new results are handed
+    to the writer on the event loop the write-back was created on.
+    """
+
+    def __init__(self, context: EmailContext, writer: MailWriter = None):
+        self.context = context
+        self.writer = writer or get_mail_writer()
+        self._loop = asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._pending: List[asyncio.Future] = []
+        self._counts: Dict[str, int] = {}
+        self._seen = 0
+
+    def attach(self):
+        """Write back the automation results in the context, and every one recorded from now on."""
+        self.context.public_state["write_back"] = self._counts
+        self.context.touch("write_back")
+        self.context.add_listener(self._on_change)
+        self._on_change("state", self.context.public_state)
+
+    def detach(self):
+        """Stop following the context. Writes already queued are still sent."""
+        self.context.remove_listener(self._on_change)
+
+    async def finish(self) -> Dict[str, int]:
+        """Stop following the context and wait until everything it queued has been written."""
+        self.detach()
+        # Let results handed over from other threads reach the writer first
+        await asyncio.sleep(0)
+        await self.writer.flush()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        return self._counts
+
+    def _on_change(self, event_type: str, data: Any):
+        # Checked on state changes too, since merge_from appends a child's operations without notifying each one
+        with self._lock:
+            operations = self.context.public_state["operations"]
+            if len(operations) <= self._seen:
+                return
+            new_operations = operations[self._seen:]
+            self._seen = len(operations)
+        self._loop.call_soon_threadsafe(self._write, new_operations)
+
+    def _write(self, operations: List[Dict[str, Any]]):
+        for operation in operations:
+            if operation["type"] != "email_action_performed" or operation.get("action") not in WRITE_BACK_ACTIONS:
+                continue
+            email_id = operation["email_id"]
+            if operation.get("action") == "reply" and operation.get("content"):
+                self._track(self.writer.reply(email_id, operation["content"]), "replies")
+            self._track(self.writer.mark_read([email_id]), "read_states")
+
+    def _track(self, future: asyncio.Future, kind: str):
+        self._pending.append(future)
+
+        def done(finished: asyncio.Future):
+            if finished.cancelled():
+                return
+            outcome = finished.result()
+            outcome = outcome[0] if isinstance(outcome, list) else outcome
+            key = kind if outcome in ("created", "updated") else outcome
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self.context.touch("write_back")
+
+        future.add_done_callback(done)
+
+_writer: Optional[MailWriter] = None
+
+def get_mail_writer() -> MailWriter:
+    """Get the process-wide mail writer, creating it on first use."""
+    global _writer
+    if _writer is None:
+        _writer = MailWriter()
+    return _writer
+
+async def close_mail_writer():
+    """Write out everything queued and stop the process-wide mail writer."""
+    global _writer
+    if _writer is not None:
+        await _writer.close()
+        _writer = None
@@ -1,13 +1,27 @@
 import asyncio
 import os
+import time
 import uuid
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException
+from typing import List, Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
 from email_management_system.models.email_models import Email, EmailContext
 from email_management_system.magents.manager_agent import ManagerAgent
-from agents import set_default_openai_key
+from email_management_system.processing.cache import ClassificationCache
+from email_management_system.processing.rules import RuleSet
+from email_management_system.processing.classifier import LocalClassifier
+from email_management_system.jobs.store import JobStore
+from email_management_system.jobs.backend import SQLiteJobBackend
+from email_management_system.jobs.worker import JobWorker
+from email_management_system.jobs.journal import JobJournal
+from email_management_system.jobs import events as job_events
+from email_management_system.magents.model_client import configure_model_client, close_model_client
+from email_management_system.processing.preprocess import shutdown_preprocess_pool, preprocess_emails
+from email_management_system.mail.client import get_mail_client, close_mail_client
+from email_management_system.mail.writeback import JobWriteBack, get_mail_writer, close_mail_writer
+from email_management_system.magents.limits import JobLimitExceeded, JobLimits
 import uvicorn
 
 # Create FastAPI app
@@ -22,54 +36,154 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Dictionary to store active processing jobs
-
 class EmailManagementSystem:
+    """
+    The agent graph and pre-classifiers, built once and shared by every job.
+    
+    Nothing in here holds per-job state: everything a job changes lives in the
+    EmailContext that is passed to the run. The model client is configured
+    separately (see configure_model_client).
+    """
     def __init__(self):
-        self.manager_agent = ManagerAgent()
-
-        # Make sure openai key is set for tracing to work 
-        openai_key = os.getenv("OPENAI_API_KEY")
-        set_default_openai_key(openai_key)
+        self.rules = RuleSet.load()
+        self.classification_cache = ClassificationCache()
+        self.local_classifier = LocalClassifier()
+        self.manager_agent = ManagerAgent(pre_classifiers=[self.rules, self.classification_cache, self.local_classifier])
     
-    async def process_emails(self, emails: List[Email], context: EmailContext):
+    def close(self):
+        """Release the resources held by the pre-classifiers."""
+        self.classification_cache.close()
+    
+    async def process_emails(
+        self,
+        emails: List[Email],
+        context: EmailContext,
+        job_id: str = None,
+        limits: JobLimits = None,
+        source: Dict[str, Any] = None,
+        write_back: bool = False
+    ):
         """
         Process a list of emails through the management system.
         
         Args:
             emails: List of emails to process
             context: The email context for tracking state
+            job_id: Id of the job, used to name its trace file
+            limits: Deadline and turn and tool call budgets of the job
+            source: Instead of emails, the email_ids or the mailbox query to fetch from the mail backend
+            write_back: Whether to write automation results to the mail backend (see JobWriteBack);
+                the job only completes once they are written
             
         Returns:
             dict: Processing results including human review and automation results
         """
+        writer = JobWriteBack(context) if write_back else None
         try:
             # Update public state
-            context.public_state["status"] = "processing"
+            context.set_status("processing")
+            
+            if writer is not None:
+                writer.attach()
+            if source is not None:
+                emails = await self.fetch_emails(source, context)
             
             # Create context with emails
             context = context or EmailContext(emails)
             
             # Process all emails through the manager agent
             # The manager will handle classification and handoffs to specialized agents
-            results = await self.manager_agent.process_emails(emails, context)
+            results = await self.manager_agent.process_emails(emails, context, job_id=job_id, limits=limits)
+            if writer is not None:
+                await writer.finish()
             
             # Update public state
-            context.public_state["status"] = "completed"
-            context.public_state.update(results.get("statistics", {}))
+            self._publish_statistics(context, results.get("statistics", {}))
+            context.set_status("completed")
             
             return results
             
+        except JobLimitExceeded as e:
+            # A limit was hit where the job could not be cancelled; stop it here, keeping the partial results
+            self.stop(context, e.status, e.reason)
+            return {
+                "error": e.reason,
+                "total_count": len(emails)
+            }
         except Exception as e:
             # Update public state with error
-            context.public_state["status"] = "error"
-            context.public_state["error"] = str(e)
+            context.set_status("error", error=str(e))
             
             print(f"Error processing emails: {str(e)}")
             return {
                 "error": str(e),
                 "total_count": len(emails)
             }
+        finally:
+            if writer is not None:
+                writer.detach()
+    
+    async def fetch_emails(self, source: Dict[str, Any], context: EmailContext) -> List[Email]:
+        """
+        Fetch a job's emails from the mail backend into its context.
+        
+        Each page is added to the context as soon as it arrives, so the job's
+        total grows while the rest is downloaded, and its bodies are
+        preprocessed while the next pages are fetched. Progress is published
+        as public_state["mail_source"].
+        
+        Args:
+            source: {"email_ids": [...]} or {"query": {"folder", "is_read", "limit"}}
+            context: The email context of the job
+            
+        Returns:
+            list: The fetched emails, in the order of the IDs or of the mailbox
+        """
+        start = time.perf_counter()
+        email_ids = source.get("email_ids")
+        stats = {"requested": len(email_ids) if email_ids is not None else None, "pages": 0, "emails": 0, "seconds": 0.0}
+        context.public_state["mail_source"] = stats
+        context.touch("mail_source")
+        
+        preprocessing = []
+        pages = []
+        async for page in get_mail_client().fetch_pages(email_ids=email_ids, query=source.get("query")):
+            pages.append(page)
+            context.add_emails(page)
+            if self.manager_agent.preprocess and page:
+                preprocessing.append(asyncio.ensure_future(preprocess_emails(page)))
+            stats.update(pages=stats["pages"] + 1, emails=stats["emails"] + len(page), seconds=time.perf_counter() - start)
+            context.touch("mail_source")
+        await asyncio.gather(*preprocessing)
+        
+        emails = [email for page in pages for email in page]
+        if email_ids is not None:
+            position = {email_id: index for index, email_id in enumerate(email_ids)}
+            emails.sort(key=lambda email: position.get(email.id, len(position)))
+            stats["missing"] = len(set(email_ids)) - len(emails)
+        else:
+            # Newest first, as the mailbox lists them
+            emails.sort(key=lambda email: email.timestamp, reverse=True)
+        context.emails[:] = emails
+        stats["seconds"] = time.perf_counter() - start
+        context.touch("mail_source")
+        return emails
+    
+    def stop(self, context: EmailContext, status: str, reason: str):
+        """
+        Finish a job that was cancelled while processing, keeping its partial results.
+        
+        Args:
+            context: The email context of the job
+            status: "cancelled" or "timed_out"
+            reason: Why the job was stopped, reported as its error
+        """
+        self._publish_statistics(context, context.get_statistics())
+        context.set_status(status, error=reason)
+    
+    def _publish_statistics(self, context: EmailContext, statistics: Dict[str, Any]):
+        context.public_state.update(statistics)
+        context.touch(*statistics)
         
 
 
@@ -84,9 +198,31 @@ class EmailInput(BaseModel):
     is_read: bool = False
     folder: str = "inbox"
     attachments: List[str] = []
+    headers: Dict[str, str] = {}
+
+class MailboxQuery(BaseModel):
+    folder: Optional[str] = "inbox"
+    is_read: Optional[bool] = None
+    limit: Optional[int] = Field(default=None, ge=1)
 
 class ProcessEmailsRequest(BaseModel):
-    emails: List[EmailInput]
+    # The emails themselves, or a reference to emails the worker fetches from the mail backend
+    emails: List[EmailInput] = []
+    email_ids: Optional[List[str]] = None
+    query: Optional[MailboxQuery] = None
+    # Per-job limits; None keeps the server defaults, which are also the most a request can ask
+    # for (see magents/limits.py)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    max_turns: Optional[int] = Field(default=None, gt=0)
+    max_tool_calls: Optional[int] = Field(default=None, gt=0)
+    # Send replies and mark emails as read in the mail backend as automation runs
+    write_back: bool = False
+
+    @model_validator(mode="after")
+    def _one_source(self):
+        if sum((bool(self.emails), self.email_ids is not None, self.query is not None)) != 1:
+            raise ValueError("Give exactly one of emails, email_ids or query")
+        return self
 
 class ProcessEmailsResponse(BaseModel):
     job_id: str
@@ -96,20 +232,146 @@ class ProcessEmailsResponse(BaseModel):
 class JobStatusResponse(BaseModel):
     job_id: str
     status: str
+    version: int = 0
     total_emails: int
     processed_emails: int
     human_review_count: int
     automation_count: int
     review_report: str = ""
     operations: List[Dict[str, Any]] = []
+    chunks: List[Dict[str, Any]] = []
+    chunks_completed: int = 0
+    prompt_encoding: Dict[str, int] = {}
+    preprocessing: Dict[str, Any] = {}
+    pre_classifiers: Dict[str, Dict[str, Any]] = {}
+    near_duplicates: Dict[str, Any] = {}
+    model_routing: Dict[str, Any] = {}
+    automation: Dict[str, Any] = {}
+    timing: Dict[str, Any] = {}
+    limits: Dict[str, Any] = {}
+    resumed: Dict[str, int] = {}
+    mail_source: Dict[str, Any] = {}
+    write_back: Dict[str, int] = {}
+    queue: Dict[str, Any] = {}
     error: str = None
 
+class CancelJobResponse(BaseModel):
+    job_id: str
+    status: str
+    message: str
+
+class SendReplyRequest(BaseModel):
+    email_id: str
+    content: str
+
+class MarkAsReadRequest(BaseModel):
+    email_ids: List[str]
+    is_read: bool = True
+
+class WriteBackResponse(BaseModel):
+    status: str
+    count: int
+
+
+# Job state shared by every worker process; this process only holds the jobs it runs
+job_backend = SQLiteJobBackend()
+job_store = JobStore(spill_dir="", backend=job_backend)
+
+# Agents and pre-classifiers shared by every job in this process (created at startup)
+email_system: EmailManagementSystem = None
+
+
+async def run_job(job_id: str, payload: Dict[str, Any]):
+    """
+    Run a claimed processing job and compact it in the job store once it is done.
+
+    The job's context is checkpointed to its journal as it runs. A job that was
+    interrupted (its worker stopped or crashed) is resumed from the journal, so
+    only the emails it had not finished are processed again.
+    """
+    emails = [Email(**email) for email in payload["emails"]]
+    source = payload.get("source")
+    context = EmailContext(emails)
+    limits = JobLimits.from_payload(payload, lambda status, reason: job_worker.cancel(job_id, status, reason))
+    journal = JobJournal(job_id)
+    journal.replay(context)
+    journal.attach(context)
+    
+    job_store.add(job_id, email_system, context)
+    job_worker.track(job_id, context)
+    job_events.register(job_id, context)
+    try:
+        await email_system.process_emails(emails, context, job_id=job_id, limits=limits, source=source, write_back=payload.get("write_back", False))
+    except asyncio.CancelledError:
+        if job_worker.is_released(job_id):
+            # The worker is stopping; the job is resumed from its journal
+            raise
+        # Cancelled through DELETE /jobs/{job_id}, its deadline or a budget: keep the partial results
+        stop = job_worker.stop_reason(job_id)
+        email_system.stop(context, *(stop or ("cancelled", "Job was cancelled")))
+        if stop is None:
+            raise
+    finally:
+        context.public_state["limits"] = limits.metrics()
+        context.touch("limits")
+        job_store.finish(job_id)
+        job_events.unregister(job_id)
+        journal.close(remove=not job_worker.is_released(job_id))
 
-active_jobs: Dict[str, tuple[EmailManagementSystem, EmailContext]] = {}
+
+# Claims queued jobs from the shared backend and runs them in this process
+job_worker = JobWorker(job_backend, run_job, ttl_seconds=job_store.ttl_seconds)
+
+
+@app.on_event("startup")
+async def start_job_worker():
+    global email_system
+    configure_model_client()
+    email_system = EmailManagementSystem()
+    job_worker.start()
+
+@app.on_event("shutdown")
+async def stop_job_worker():
+    await job_worker.stop()
+    if email_system is not None:
+        email_system.close()
+    await close_model_client()
+    await close_mail_writer()
+    await close_mail_client()
+    shutdown_preprocess_pool()
+
+
+# Admission control: total queued jobs, queued jobs per client, and the Retry-After hint for rejected submissions
+MAX_QUEUE_DEPTH = int(os.getenv("EMAIL_MAX_QUEUE_DEPTH", "100"))
+MAX_QUEUED_PER_CLIENT = int(os.getenv("EMAIL_MAX_QUEUED_PER_CLIENT", "10"))
+RETRY_AFTER_SECONDS = int(os.getenv("EMAIL_RETRY_AFTER_SECONDS", "30"))
+
+
+def get_client_id(http_request: Request) -> str:
+    """Identify the submitting client for per-client fairness (X-Client-ID header, else the remote address)."""
+    client_id = http_request.headers.get("X-Client-ID")
+    if client_id:
+        return client_id
+    return http_request.client.host if http_request.client else ""
 
 
 @app.post("/process-emails", response_model=ProcessEmailsResponse)
-async def process_emails_endpoint(request: ProcessEmailsRequest):
+async def process_emails_endpoint(request: ProcessEmailsRequest, http_request: Request):
+    # Reject the submission while the queue is full
+    client_id = get_client_id(http_request)
+    if await asyncio.to_thread(job_backend.queue_depth) >= MAX_QUEUE_DEPTH:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many jobs queued, try again later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    if await asyncio.to_thread(job_backend.queue_depth, client_id) >= MAX_QUEUED_PER_CLIENT:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many jobs queued for this client, try again later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    
     # Convert Pydantic models to Email objects
     emails = [
         Email(
@@ -121,45 +383,218 @@ async def process_emails_endpoint(request: ProcessEmailsRequest):
             timestamp=email.timestamp,
             is_read=email.is_read,
             folder=email.folder,
-            attachments=email.attachments
+            attachments=email.attachments,
+            headers=email.headers
         ) for email in request.emails
     ]
     
     # Create a new job ID
     job_id = str(uuid.uuid4())
     
-    # Create email system and context
-    system = EmailManagementSystem()
-    context = EmailContext(emails)
+    # Queue the job in the shared backend; any worker process may claim it
+    initial_state = EmailContext(emails).public_state
+    initial_state["status"] = "queued"
+    source = None
+    if request.email_ids is not None:
+        source = {"email_ids": request.email_ids}
+    elif request.query is not None:
+        source = {"query": request.query.model_dump()}
+    payload = {
+        "emails": [email.model_dump() for email in emails],
+        "source": source,
+        "write_back": request.write_back,
+        "deadline_seconds": request.deadline_seconds,
+        "max_turns": request.max_turns,
+        "max_tool_calls": request.max_tool_calls
+    }
+    await asyncio.to_thread(job_backend.create_job, job_id, payload, initial_state, client_id=client_id)
     
-    # Store in active jobs
-    active_jobs[job_id] = (system, context)
-    
-    # Start processing in background (don't await)
-    asyncio.create_task(system.process_emails(emails, context))
+    # Let this process's worker pick it up right away
+    job_worker.notify()
     
+    if request.query is not None:
+        # The number of emails is known once the worker has queried the mailbox
+        return ProcessEmailsResponse(job_id=job_id, message="Email processing started, emails are fetched from the mail backend", email_count=0)
     return ProcessEmailsResponse(
         job_id=job_id,
         message="Email processing started",
-        email_count=len(emails)
+        email_count=len(request.email_ids) if request.email_ids is not None else len(emails)
     )
 
+@app.delete("/jobs/{job_id}", response_model=CancelJobResponse, status_code=202)
+async def cancel_job(job_id: str):
+    """
+    Cancel a job cooperatively.
+    
+    A queued job is cancelled right away. A running job, in whichever process
+    runs it, stops at its next await and finishes with the "cancelled" status,
+    keeping everything it classified and processed so far.
+    """
+    if job_worker.cancel(job_id):
+        return CancelJobResponse(job_id=job_id, status="cancelling", message="Job is being cancelled")
+    
+    previous = await asyncio.to_thread(job_backend.request_cancel, job_id)
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if previous == "queued":
+        return CancelJobResponse(job_id=job_id, status="cancelled", message="Job was cancelled before it started")
+    if previous == "running":
+        return CancelJobResponse(job_id=job_id, status="cancelling", message="Job is being cancelled")
+    raise HTTPException(status_code=409, detail="Job has already finished")
+
+def _job_etag(version: int, queue: Dict[str, Any]) -> str:
+    """ETag of a job status: the state version, plus the queue position while the job waits."""
+    if queue.get("position") is not None:
+        return f'"{version}.{queue["position"]}"'
+    return f'"{version}"'
+
+def _etag_tags(if_none_match: str) -> List[str]:
+    """Split an If-None-Match header into its entity tags, ignoring weak prefixes."""
+    return [tag.strip().removeprefix("W/") for tag in if_none_match.split(",") if tag.strip()]
+
+def _etag_version(tags: List[str]) -> Optional[int]:
+    """Get the state version a client already has from its entity tags."""
+    for tag in tags:
+        try:
+            return int(tag.strip('"').split(".")[0])
+        except ValueError:
+            continue
+    return None
+
+# Public state keys that are not sent as scalar fields of a status delta
+_DELTA_EXCLUDED_KEYS = ("operations", "field_versions", "version")
+
 @app.get("/job-status/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str):
-    if job_id not in active_jobs:
+async def get_job_status(job_id: str, request: Request, response: Response, since_operation: Optional[int] = None):
+    """
+    Get the status of a job.
+    
+    Every response carries an ETag derived from the job's state version. A
+    client that sends it back in If-None-Match gets a 304 with no body while
+    nothing has changed.
+    
+    With since_operation=N the response is a delta instead of the full state:
+    only the operations after the first N, the total number of operations,
+    the status and version, and the fields that changed after the version in
+    If-None-Match (all fields when no ETag is sent). If the job was restarted
+    since the client's last poll (it was reclaimed or resumed, and its
+    operations were rebuilt), N or the ETag's version is ahead of the job. The
+    delta then carries every field and every operation, with reset set, and
+    the client replaces what it has instead of appending.
+    """
+    # Compare versions first, so unchanged jobs are answered without loading their state
+    version = await job_store.get_version(job_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Job not found")
+    queue = await asyncio.to_thread(job_backend.queue_info, job_id) or {}
+    etag = _job_etag(version, queue)
+    tags = _etag_tags(request.headers.get("If-None-Match", ""))
+    if etag in tags:
+        return Response(status_code=304, headers={"ETag": etag})
     
-    # Get the context for this job
-    _, context = active_jobs[job_id]
+    # Get the public state for this job
+    public_state = await job_store.get_public_state(job_id)
+    if public_state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    etag = _job_etag(public_state.get("version", 0), queue)
     
-    # Return the public state
+    if since_operation is not None:
+        operations = public_state.get("operations", [])
+        known_version = _etag_version(tags)
+        reset = since_operation > len(operations) or (
+            known_version is not None and known_version > public_state.get("version", 0)
+        )
+        if reset:
+            # The job restarted on another worker since the client's last poll; send everything
+            known_version = None
+            since_operation = 0
+        field_versions = public_state.get("field_versions", {})
+        delta = {
+            key: value for key, value in public_state.items()
+            if key not in _DELTA_EXCLUDED_KEYS
+            and (known_version is None or field_versions.get(key, 0) > known_version)
+        }
+        delta.update(
+            job_id=job_id,
+            status=public_state["status"],
+            version=public_state.get("version", 0),
+            operations=operations[max(since_operation, 0):],
+            operations_total=len(operations),
+            queue=queue,
+            reset=reset
+        )
+        return JSONResponse(delta, headers={"ETag": etag})
+    
+    # Return the public state, with the job's place in the queue
+    response.headers["ETag"] = etag
     return JobStatusResponse(
         job_id=job_id,
-        **context.public_state
+        queue=queue,
+        **public_state
+    )
+
+@app.get("/job-events/{job_id}")
+async def get_job_events(job_id: str, request: Request):
+    """
+    Stream a job's operations and state changes as server-sent events.
+    
+    Reconnecting clients send the Last-Event-ID header (the number of operations
+    already received) and the stream resumes right after it.
+    """
+    if await job_store.get_public_state(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID", "0"))
+    except ValueError:
+        last_event_id = 0
+    
+    return StreamingResponse(
+        job_events.stream_job_events(job_id, last_event_id, job_store.get_public_state),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@app.get("/jobs/metrics")
+async def get_job_metrics():
+    """
+    Get job store size, memory usage and queue metrics.
+    
+    The pre-classifiers and the model router are shared by every job of this
+    process, so their totals are reported here; a job's status only counts
+    its own emails and agent runs.
+    """
+    metrics = job_store.metrics()
+    metrics["queue_depth"] = await asyncio.to_thread(job_backend.queue_depth)
+    metrics["worker_running"] = job_worker.running
+    metrics["worker_capacity"] = job_worker.max_concurrent_jobs
+    if email_system is not None:
+        metrics["pre_classifiers"] = email_system.manager_agent.pre_classifier_metrics()
+        metrics["model_routing"] = email_system.manager_agent.router.metrics()
+    return metrics
+
+@app.post("/send-reply", response_model=WriteBackResponse, status_code=202)
+async def send_reply(request: SendReplyRequest):
+    """
+    Queue a reply to an email in the mail backend and mark the email as read.
+    
+    Replies queued within a short window are sent together in one batch. The
+    same reply to the same email is only ever sent once.
+    """
+    writer = get_mail_writer()
+    writer.reply(request.email_id, request.content)
+    writer.mark_read([request.email_id])
+    return WriteBackResponse(status="queued", count=1)
+
+@app.post("/mark-as-read", response_model=WriteBackResponse, status_code=202)
+async def mark_as_read(request: MarkAsReadRequest):
+    """Queue marking emails as read (or unread) in the mail backend, batched with other writes."""
+    get_mail_writer().mark_read(list(dict.fromkeys(request.email_ids)), is_read=request.is_read)
+    return WriteBackResponse(status="queued", count=len(set(request.email_ids)))
+
 async def main():
     # Example usage
+    configure_model_client()
     system = EmailManagementSystem()
     
     # Example emails
@@ -1,8 +1,9 @@
-from .email_models import Email, ClassificationResult, HumanReviewOutput, AutomationResult
+from .email_models import Email, ClassificationResult, HumanReviewOutput, AutomationResult, EmailAction
 
 __all__ = [
     'Email',
     'ClassificationResult',
     'HumanReviewOutput',
-    'AutomationResult'
+    'AutomationResult',
+    'EmailAction'
 ] 
\ No newline at end of file
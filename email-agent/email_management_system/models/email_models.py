@@ -1,8 +1,29 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any, Set
+from typing import Callable, List, Dict, Optional, Any, Set
 from datetime import datetime
+import re
 import time
 
+# Classification labels
+HUMAN_REVIEW = "human_review"
+AUTOMATED = "automated"
+
+# Matches `[Subject](alias)` references in the human review report
+_ALIAS_LINK = re.compile(r"\]\((e\d+)\)")
+
+class NormalizedBody(BaseModel):
+    """The readable text of an email body, as produced by processing.preprocess."""
+    text: str                      # decoded plain text without quoted replies and signature
+    language: str                  # ISO 639-1 code, or "und" if it could not be detected
+    char_count: int
+    word_count: int
+    token_count: int               # estimated model tokens of text
+    content_type: str = "text/plain"  # part the text was taken from, e.g. text/html
+    mime: bool = False             # the body was a MIME message
+    attachments: List[str] = Field(default_factory=list)  # file names found in a MIME body
+    quote_stripped: bool = False
+    signature_stripped: bool = False
+
 class Email(BaseModel):
     id: str
     sender: str
@@ -13,6 +34,19 @@ class Email(BaseModel):
     is_read: bool
     folder: str
     attachments: List[str] = Field(default_factory=list)
+    headers: Dict[str, str] = Field(default_factory=dict)  # raw message headers, e.g. List-Unsubscribe
+    # Set by processing.preprocess; derived from body, so it is not serialized
+    normalized: Optional[NormalizedBody] = Field(default=None, exclude=True)
+    
+    @property
+    def text(self) -> str:
+        """The normalized body text if the email was preprocessed, else (or if nothing was left of it) the raw body."""
+        return self.normalized.text if self.is_stripped else self.body
+    
+    @property
+    def is_stripped(self) -> bool:
+        """Whether text is a preprocessed body, with quoted replies and the signature already stripped."""
+        return self.normalized is not None and bool(self.normalized.text)
 
 class ClassificationResult(BaseModel):
     email_id: str
@@ -29,6 +63,11 @@ class AutomationResult(BaseModel):
     action_taken: str
     result: str
 
+class EmailAction(BaseModel):
+    email_id: str
+    action: str  # "reply", "unsubscribe" or "ignore"
+    response: Optional[str] = None  # reply text, only for "reply"
+
 class EmailContext:
     """Context class for storing shared data between agents."""
     
@@ -47,19 +86,41 @@ class EmailContext:
         # Human review report
         self.human_review_report: str = ""
         
+        # Emails a fast-tier model was unsure about, for the reasoning tier (email_id -> reason)
+        self.escalated: Dict[str, str] = {}
+        
+        # Emails saved from the streamed arguments of a tool call that has not run yet (see ClassificationStream)
+        self.unconfirmed_ids: Set[str] = set()
+        self._unconfirmed_from: Dict[str, str] = {}  # email_id -> the list an unconfirmed save moved it off
+        
+        # Callbacks notified of every operation and state change (see add_listener)
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        
+        # Short prompt aliases (e1, e2, ...) -> real email ids, assigned per job
+        self.email_aliases: Dict[str, str] = {}
+        self._alias_by_id: Dict[str, str] = {}
+        
         # Statistics
         self.processed_count: int = 0
         self.total_count: int = len(self.emails) if self.emails else 0
         
-        # Public state for API access
+        # Public state for API access. "version" is bumped on every change, and
+        # "field_versions" records the version at which each key last changed
         self.public_state: Dict[str, Any] = {
+            "version": 0,
+            "field_versions": {},
             "status": "initialized",
             "total_emails": self.total_count,
             "processed_emails": 0,
             "human_review_count": 0,
             "automation_count": 0,
             "review_report": "",
-            "operations": []
+            "operations": [],
+            "prompt_encoding": {
+                "original_tokens": 0,
+                "encoded_tokens": 0,
+                "saved_tokens": 0
+            }
         }
     
     def _add_operation(self, operation_type: str, **kwargs):
@@ -70,9 +131,11 @@ class EmailContext:
         
         1. "emails_added_to_review"
            - email_ids: List[str] - IDs of emails marked for human review
+           - confirmed: bool - Only present (False) for a decision read from a tool call that is still streaming
         
         2. "emails_added_to_automation"
            - email_ids: List[str] - IDs of emails marked for automated processing
+           - confirmed: bool - As for "emails_added_to_review"
         
         3. "email_action_performed"
            - email_id: str - ID of the email that was processed
@@ -86,6 +149,18 @@ class EmailContext:
         5. "review_report_added"
            - No additional fields required (the report itself is stored in public_state["review_report"])
         
+        6. "emails_escalated"
+           - email_ids: List[str] - IDs of emails left for a stronger model
+           - reason: str - Why the model was unsure
+        
+        7. "emails_withdrawn"
+           - email_ids: List[str] - IDs of emails whose streamed decision was never confirmed
+           - reason: str - Why the decisions were taken back
+        
+        8. "emails_confirmed"
+           - email_ids: List[str] - IDs of emails whose streamed decision a tool call confirmed
+           - classification: str - The confirmed decision, "human_review" or "automated"
+        
         Args:
             operation_type: The type of operation being recorded
             **kwargs: Additional fields specific to the operation type
@@ -96,43 +171,292 @@ class EmailContext:
         }
         operation.update(kwargs)
         self.public_state["operations"].append(operation)
+        self._bump_version("operations")
+        self._notify("operation", operation)
+    
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """
+        Register a callback for changes to the public state.
+        
+        The callback is called with ("operation", operation) for every new operation
+        and ("state", public_state) when the status changes.
+        """
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """Unregister a callback added with add_listener."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def _notify(self, event_type: str, data: Dict[str, Any]):
+        for listener in self._listeners:
+            listener(event_type, data)
+    
+    def _bump_version(self, *keys: str):
+        version = self.public_state["version"] + 1
+        self.public_state["version"] = version
+        for key in keys:
+            self.public_state["field_versions"][key] = version
+    
+    def touch(self, *keys: str):
+        """
+        Mark public state keys as changed after writing to them directly.
+        
+        Bumps the state version, records it for each key and notifies listeners.
+        Every write to public_state must be followed by a touch (the methods of
+        this class do it themselves) so that delta and cached status responses
+        stay correct.
+        """
+        self._bump_version(*keys)
+        self._notify("state", self.public_state)
+    
+    def set_status(self, status: str, error: str = None):
+        """Set the job status (and optionally an error message) in the public state."""
+        self.public_state["status"] = status
+        if error is not None:
+            self.public_state["error"] = error
+            self.touch("status", "error")
+        else:
+            self.touch("status")
+    
+    def alias_for(self, email_id: str) -> str:
+        """Get (or assign) the short prompt alias for an email ID."""
+        alias = self._alias_by_id.get(email_id)
+        if alias is None:
+            alias = f"e{len(self.email_aliases) + 1}"
+            self.email_aliases[alias] = email_id
+            self._alias_by_id[email_id] = alias
+        return alias
+    
+    def resolve_email_id(self, email_id: str) -> str:
+        """Map a prompt alias back to the real email ID. Real IDs are returned unchanged."""
+        return self.email_aliases.get(email_id, email_id)
+    
+    def resolve_email_ids(self, email_ids: List[str]) -> List[str]:
+        """Map a list of prompt aliases back to real email IDs."""
+        return [self.resolve_email_id(email_id) for email_id in email_ids]
+    
+    def record_prompt_encoding(self, original_tokens: int, encoded_tokens: int):
+        """Record the estimated token savings of an encoded prompt."""
+        stats = self.public_state["prompt_encoding"]
+        stats["original_tokens"] += original_tokens
+        stats["encoded_tokens"] += encoded_tokens
+        stats["saved_tokens"] = stats["original_tokens"] - stats["encoded_tokens"]
+        self.touch("prompt_encoding")
     
     def add_emails(self, emails: List[Email]):
         """Add emails to the context."""
         self.emails.extend(emails)
         self.total_count = len(self.emails)
         self.public_state["total_emails"] = self.total_count
+        self.touch("total_emails")
     
     def get_email_by_id(self, email_id: str) -> Optional[Email]:
-        """Get an email by its ID."""
+        """Get an email by its ID (or prompt alias)."""
+        email_id = self.resolve_email_id(email_id)
         for email in self.emails:
             if email.id == email_id:
                 return email
         return None
     
-    def save_to_human_review(self, email_ids: List[str]):
-        """Save emails to human review list."""
-        self.human_review_ids = email_ids
-        self.processed_count = len(self.human_review_ids) + len(self.automation_ids)
+    def save_to_human_review(self, email_ids: List[str], source: str = None, confirmed: bool = True):
+        """
+        Save emails to human review list.
         
-        # Update public state
-        self.public_state["human_review_count"] = len(self.human_review_ids)
-        self.public_state["processed_emails"] = self.processed_count
+        Emails are added to the existing list; an email that was previously saved
+        for automation is moved over, so the latest decision wins. Emails already
+        on the list are skipped, and if nothing is new no operation is recorded.
+        
+        Args:
+            email_ids: IDs (or prompt aliases) of the emails
+            source: Optional name of what made the decision (e.g. "cache"), recorded on the operation
+            confirmed: False while the decision is only read from a tool call that is still
+                streaming; the tool call confirms it when it runs
+        """
+        email_ids = self._confirm(self.resolve_email_ids(email_ids), confirmed, HUMAN_REVIEW)
+        email_ids = self._new_ids(email_ids, self.human_review_ids)
+        if not email_ids:
+            return
+        new_ids = set(email_ids)
+        if not confirmed:
+            self._track_unconfirmed(email_ids, self.automation_ids, AUTOMATED)
+        self.automation_ids = [email_id for email_id in self.automation_ids if email_id not in new_ids]
+        self._clear_escalation(new_ids)
+        existing = set(self.human_review_ids)
+        self.human_review_ids.extend(email_id for email_id in email_ids if email_id not in existing)
+        self._update_classification_counts()
+        
+        # Add operation
+        extra = {"source": source} if source else {}
+        if not confirmed:
+            extra["confirmed"] = False
+        self._add_operation("emails_added_to_review", email_ids=email_ids, **extra)
+    
+    def save_to_automation(self, email_ids: List[str], source: str = None, confirmed: bool = True):
+        """
+        Save emails to automation list.
+        
+        Emails are added to the existing list; an email that was previously saved
+        for human review is moved over, so the latest decision wins. Emails already
+        on the list are skipped, and if nothing is new no operation is recorded.
+        
+        Args:
+            email_ids: IDs (or prompt aliases) of the emails
+            source: Optional name of what made the decision (e.g. "cache"), recorded on the operation
+            confirmed: False while the decision is only read from a tool call that is still
+                streaming; the tool call confirms it when it runs
+        """
+        email_ids = self._confirm(self.resolve_email_ids(email_ids), confirmed, AUTOMATED)
+        email_ids = self._new_ids(email_ids, self.automation_ids)
+        if not email_ids:
+            return
+        new_ids = set(email_ids)
+        if not confirmed:
+            self._track_unconfirmed(email_ids, self.human_review_ids, HUMAN_REVIEW)
+        self.human_review_ids = [email_id for email_id in self.human_review_ids if email_id not in new_ids]
+        self._clear_escalation(new_ids)
+        existing = set(self.automation_ids)
+        self.automation_ids.extend(email_id for email_id in email_ids if email_id not in existing)
+        self._update_classification_counts()
+        
+        # Add operation
+        extra = {"source": source} if source else {}
+        if not confirmed:
+            extra["confirmed"] = False
+        self._add_operation("emails_added_to_automation", email_ids=email_ids, **extra)
+    
+    def escalate(self, email_ids: List[str], reason: str = ""):
+        """
+        Leave emails unclassified for a stronger model.
+        
+        The emails are taken out of both classification lists, so a decision made
+        earlier in the same run does not stick. Saving an escalated email to a
+        list again withdraws the escalation.
+        
+        Args:
+            email_ids: IDs (or prompt aliases) of the emails
+            reason: Why the emails need a stronger model
+        """
+        email_ids = self.resolve_email_ids(email_ids)
+        escalated = set(email_ids)
+        self.human_review_ids = [email_id for email_id in self.human_review_ids if email_id not in escalated]
+        self.automation_ids = [email_id for email_id in self.automation_ids if email_id not in escalated]
+        for email_id in email_ids:
+            self.escalated[email_id] = reason
+        self._forget_unconfirmed(escalated)
+        self._update_classification_counts()
+        
+        # Add operation
+        self._add_operation("emails_escalated", email_ids=email_ids, reason=reason)
+    
+    def withdraw_unconfirmed(self, email_ids: List[str] = None, reason: str = ""):
+        """
+        Take back streamed decisions whose tool call never ran.
+        
+        Emails that are still unconfirmed are taken off their classification
+        list. An email the stream had moved off the other list is put back
+        there; the others are left unclassified, to be classified again.
+        Confirmed decisions are left alone.
+        
+        Args:
+            email_ids: IDs of the emails, or None for every unconfirmed email
+            reason: Why the decisions are taken back
+        """
+        candidates = self.unconfirmed_ids if email_ids is None else self.resolve_email_ids(email_ids)
+        withdrawn = [email_id for email_id in dict.fromkeys(candidates) if email_id in self.unconfirmed_ids]
+        if not withdrawn:
+            return
+        taken = set(withdrawn)
+        self.human_review_ids = [email_id for email_id in self.human_review_ids if email_id not in taken]
+        self.automation_ids = [email_id for email_id in self.automation_ids if email_id not in taken]
+        for email_id in withdrawn:
+            previous = self._unconfirmed_from.get(email_id)
+            if previous == HUMAN_REVIEW:
+                self.human_review_ids.append(email_id)
+            elif previous == AUTOMATED:
+                self.automation_ids.append(email_id)
+        self._forget_unconfirmed(taken)
+        self._update_classification_counts()
         
         # Add operation
-        self._add_operation("emails_added_to_review", email_ids=email_ids)
+        self._add_operation("emails_withdrawn", email_ids=withdrawn, reason=reason)
+    
+    @staticmethod
+    def _new_ids(email_ids: List[str], current: List[str]) -> List[str]:
+        """The email ids that are not on a list yet, without duplicates, in order."""
+        seen = set(current)
+        new_ids = []
+        for email_id in email_ids:
+            if email_id not in seen:
+                seen.add(email_id)
+                new_ids.append(email_id)
+        return new_ids
+    
+    def _confirm(self, email_ids: List[str], confirmed: bool, label: str) -> List[str]:
+        """Confirm the streamed decisions a tool call repeats, recording an "emails_confirmed" operation."""
+        if confirmed:
+            confirmed_ids = [email_id for email_id in dict.fromkeys(email_ids) if email_id in self.unconfirmed_ids]
+            if confirmed_ids:
+                self._forget_unconfirmed(confirmed_ids)
+                self._add_operation("emails_confirmed", email_ids=confirmed_ids, classification=label)
+        return email_ids
+    
+    def _track_unconfirmed(self, email_ids: List[str], other: List[str], other_label: str):
+        """Mark emails as unconfirmed, remembering which of them were confirmed on the other list."""
+        on_other = set(other)
+        for email_id in email_ids:
+            if email_id not in self.unconfirmed_ids and email_id in on_other:
+                self._unconfirmed_from[email_id] = other_label
+        self.unconfirmed_ids.update(email_ids)
+    
+    def _forget_unconfirmed(self, email_ids):
+        self.unconfirmed_ids.difference_update(email_ids)
+        for email_id in email_ids:
+            self._unconfirmed_from.pop(email_id, None)
+    
+    def _clear_escalation(self, email_ids: Set[str]):
+        for email_id in email_ids:
+            self.escalated.pop(email_id, None)
+    
+    def save_classifications(self, decisions: Dict[str, str], source: str = None):
+        """
+        Save a batch of classification decisions.
+        
+        Args:
+            decisions: email_id -> "human_review" or "automated"
+            source: Optional name of what made the decisions, recorded on the operations
+        """
+        human_review = [email_id for email_id, label in decisions.items() if label == HUMAN_REVIEW]
+        automated = [email_id for email_id, label in decisions.items() if label == AUTOMATED]
+        if human_review:
+            self.save_to_human_review(human_review, source=source)
+        if automated:
+            self.save_to_automation(automated, source=source)
+    
+    def get_classification(self, email_id: str) -> Optional[str]:
+        """Get the current classification of an email, or None if it has not been classified."""
+        email_id = self.resolve_email_id(email_id)
+        if email_id in self.human_review_ids:
+            return HUMAN_REVIEW
+        if email_id in self.automation_ids:
+            return AUTOMATED
+        return None
     
-    def save_to_automation(self, email_ids: List[str]):
-        """Save emails to automation list."""
-        self.automation_ids = email_ids
+    def get_classifications(self) -> Dict[str, str]:
+        """Get the current classification of every classified email (email_id -> label)."""
+        classifications = {email_id: HUMAN_REVIEW for email_id in self.human_review_ids}
+        classifications.update((email_id, AUTOMATED) for email_id in self.automation_ids)
+        return classifications
+    
+    def _update_classification_counts(self):
+        """Recompute the processed count and the public classification counts."""
         self.processed_count = len(self.human_review_ids) + len(self.automation_ids)
         
         # Update public state
+        self.public_state["human_review_count"] = len(self.human_review_ids)
         self.public_state["automation_count"] = len(self.automation_ids)
         self.public_state["processed_emails"] = self.processed_count
-        
-        # Add operation
-        self._add_operation("emails_added_to_automation", email_ids=email_ids)
+        self.touch("human_review_count", "automation_count", "processed_emails")
     
     def get_human_review_emails(self) -> List[Email]:
         """Get emails marked for human review."""
@@ -142,8 +466,13 @@ class EmailContext:
         """Get emails marked for automated processing."""
         return [email for email in self.emails if email.id in self.automation_ids]
     
+    def get_unprocessed_automated_emails(self) -> List[Email]:
+        """Get emails marked for automated processing that have no automation result yet, e.g. in a resumed job."""
+        return [email for email in self.get_automated_emails() if email.id not in self.automation_results]
+    
     def add_human_review_result(self, email_id: str, summary: str):
         """Add a human review result."""
+        email_id = self.resolve_email_id(email_id)
         self.human_review_results[email_id] = summary
         
         # Add operation
@@ -159,6 +488,7 @@ class EmailContext:
             result: The result of the action
             content: The actual content of the reply (only for "reply" actions)
         """
+        email_id = self.resolve_email_id(email_id)
         self.automation_results[email_id] = {"action": action, "result": result}
         
         # Add operation with optional content
@@ -169,18 +499,86 @@ class EmailContext:
         # Add operation
         self._add_operation("email_action_performed", **operation_data)
     
+    def add_automation_results(self, results: List[Dict[str, Any]]):
+        """
+        Add a batch of automation results in one step.
+        
+        The batch is applied without yielding to other tasks, so observers never
+        see part of it. Callers validate every item before calling this.
+        
+        Args:
+            results: Dicts with email_id, action, result and optionally content
+        """
+        for item in results:
+            self.add_automation_result(item["email_id"], item["action"], item["result"], content=item.get("content"))
+    
     def set_human_review_report(self, report: str):
-        """Set the human review report."""
+        """Set the human review report. Email references written with prompt aliases are mapped back to real IDs."""
+        report = _ALIAS_LINK.sub(lambda m: f"]({self.resolve_email_id(m.group(1))})", report)
         self.human_review_report = report
         
         # Update public state
         self.public_state["review_report"] = report
+        self.touch("review_report")
         
         # Add operation
         self._add_operation("review_report_added")
     
+    def merge_from(self, other: "EmailContext"):
+        """
+        Merge the results of a child context (e.g. one classification chunk) into this one.
+
+        Classification lists are appended in order without duplicates, results are
+        copied over and the child's operations are appended with their original timestamps.
+        Decisions the child has not confirmed yet stay unconfirmed here. A child
+        review report is appended to this context's report.
+
+        Args:
+            other: The child context to merge
+        """
+        for email_id in other.human_review_ids:
+            if email_id not in self.human_review_ids:
+                self.human_review_ids.append(email_id)
+        for email_id in other.automation_ids:
+            if email_id not in self.automation_ids:
+                self.automation_ids.append(email_id)
+
+        self.human_review_results.update(other.human_review_results)
+        self.automation_results.update(other.automation_results)
+        merged = set(other.human_review_ids) | set(other.automation_ids)
+        self._clear_escalation(merged)
+        self.escalated.update(other.escalated)
+        self._forget_unconfirmed(merged - other.unconfirmed_ids)
+        for email_id in other.unconfirmed_ids:
+            if email_id not in self.unconfirmed_ids and email_id in other._unconfirmed_from:
+                self._unconfirmed_from[email_id] = other._unconfirmed_from[email_id]
+        self.unconfirmed_ids.update(other.unconfirmed_ids)
+
+        if other.human_review_report:
+            if self.human_review_report:
+                self.human_review_report = f"{self.human_review_report}\n\n{other.human_review_report}"
+            else:
+                self.human_review_report = other.human_review_report
+
+        self._update_classification_counts()
+        self.public_state["review_report"] = self.human_review_report
+        self.public_state["operations"].extend(other.public_state["operations"])
+        
+        for key in ("original_tokens", "encoded_tokens"):
+            self.public_state["prompt_encoding"][key] += other.public_state["prompt_encoding"][key]
+        self.public_state["prompt_encoding"]["saved_tokens"] = (
+            self.public_state["prompt_encoding"]["original_tokens"]
+            - self.public_state["prompt_encoding"]["encoded_tokens"]
+        )
+        self.touch("review_report", "operations", "prompt_encoding")
+
     def get_statistics(self) -> Dict[str, Any]:
-        """Get processing statistics."""
+        """
+        Get processing statistics and publish them in the public state.
+
+        The job's status is left alone: the manager agent can call this as a tool
+        mid-run, and only the code running the job decides when it has finished.
+        """
         stats = {
             "total_emails": self.total_count,
             "processed_emails": self.processed_count,
@@ -190,6 +588,6 @@ class EmailContext:
         
         # Update public state with latest statistics
         self.public_state.update(stats)
-        self.public_state["status"] = "processing" if self.processed_count < self.total_count else "completed"
+        self.touch(*stats)
         
         return stats 
\ No newline at end of file
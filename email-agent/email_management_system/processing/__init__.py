@@ -0,0 +1,22 @@
+from .chunking import estimate_tokens, chunk_emails
+from .encoding import clean_body, encode_emails
+from .cache import ClassificationCache, email_cache_key
+from .rules import ClassificationRule, RuleSet
+from .classifier import LocalClassifier
+from .preprocess import preprocess_body, preprocess_emails
+from .near_duplicates import NearDuplicateClusterer
+
+__all__ = [
+    'estimate_tokens',
+    'chunk_emails',
+    'clean_body',
+    'encode_emails',
+    'ClassificationCache',
+    'email_cache_key',
+    'ClassificationRule',
+    'RuleSet',
+    'LocalClassifier',
+    'preprocess_body',
+    'preprocess_emails',
+    'NearDuplicateClusterer'
+]
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+from email_management_system.models.email_models import Email, EmailContext, HUMAN_REVIEW, AUTOMATED
+from email_management_system.processing.encoding import clean_body
+
+# Default location of the cache database, next to the package
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMAIL_CLASSIFICATION_CACHE",
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'classification_cache.sqlite3')
+)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+
+# Parts of an email that change between otherwise identical notifications
+_VARIABLE_TOKENS = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+")
+_REPLY_PREFIX = re.compile(r"^\s*((re|fwd?|aw)\s*:\s*)+", re.IGNORECASE)
+
+def _template(text: str) -> str:
+    """Lowercase a string and replace numbers and UUIDs with a placeholder."""
+    return _VARIABLE_TOKENS.sub("#", text.lower())
+
+def email_cache_key(email: Email) -> str:
+    """
+    Compute the cache key for an email.
+
+    The key is a hash of the normalized sender, subject and body template, so
+    that daily newsletters and notifications that differ only in numbers, ids
+    or dates share a key.
+
+    Args:
+        email: The email
+
+    Returns:
+        str: Hex digest identifying the email's template
+    """
+    sender = _template(email.sender.strip())
+    subject = _template(_REPLY_PREFIX.sub("", email.subject).strip())
+    body = _template(clean_body(email.body, max_chars=2000))
+    return hashlib.sha256("\x1f".join([sender, subject, body]).encode("utf-8")).hexdigest()
+
+class ClassificationCache:
+    """
+    Disk-backed cache of classification decisions keyed on normalized email content.
+
+    Entries expire after ttl_seconds and the least recently used entries are
+    evicted once the cache holds more than max_entries. The cache is a SQLite
+    file, so it survives restarts and can be shared by several worker processes.
+    """
+
+    name = "cache"
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            "key TEXT PRIMARY KEY, label TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON classifications (last_used)")
+        self._conn.commit()
+
+    def get(self, email: Email) -> Optional[str]:
+        """Get the cached classification of an email, or None on a miss."""
+        return self.classify([email]).get(email.id)
+
+    def _lookup(self, key: str, now: float) -> Optional[str]:
+        """Look up one key inside an open transaction, dropping it if it has expired."""
+        row = self._conn.execute("SELECT label, created FROM classifications WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        if now - row[1] > self.ttl_seconds:
+            self._conn.execute("DELETE FROM classifications WHERE key = ?", (key,))
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE classifications SET last_used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put_many(self, decisions: List[tuple]):
+        """
+        Store classification decisions.
+
+        Args:
+            decisions: List of (email, label) pairs
+        """
+        now = time.time()
+        rows = [(email_cache_key(email), label, now, now) for email, label in decisions if label in (HUMAN_REVIEW, AUTOMATED)]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO classifications (key, label, created, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones above the size cap."""
+        cursor = self._conn.execute("DELETE FROM classifications WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self.evictions += cursor.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM classifications WHERE key IN "
+                "(SELECT key FROM classifications ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            self.evictions += cursor.rowcount
+
+    def classify(self, emails: List[Email]) -> Dict[str, str]:
+        """Look up every email and return the decisions for the cache hits (email_id -> label)."""
+        keys = [(email.id, email_cache_key(email)) for email in emails]
+        now = time.time()
+        decisions = {}
+        with self._lock:
+            for email_id, key in keys:
+                label = self._lookup(key, now)
+                if label is not None:
+                    decisions[email_id] = label
+            self._conn.commit()
+        return decisions
+
+    def learn(self, emails: List[Email], context: EmailContext):
+        """Store the decisions the agent made for these emails."""
+        classifications = context.get_classifications()
+        self.put_many([(email, classifications.get(email.id)) for email in emails])
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get hit-rate and size metrics."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries
+        }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
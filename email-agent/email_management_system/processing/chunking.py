@@ -0,0 +1,54 @@
+from typing import Callable, List
+from email_management_system.models.email_models import Email
+
+# Rough characters-per-token ratio for English text with the OpenAI tokenizers.
+# Good enough for budgeting; we never need an exact count here.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in a piece of text."""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def chunk_emails(
+    emails: List[Email],
+    max_tokens: int,
+    render: Callable[[Email], str],
+    max_emails: int = None
+) -> List[List[Email]]:
+    """
+    Split emails into consecutive chunks that fit a token budget.
+    
+    Emails keep their original order, so merging chunk results in chunk order
+    is deterministic. An email that is larger than the budget on its own still
+    gets a chunk of its own rather than being dropped.
+    
+    Args:
+        emails: Emails to split
+        max_tokens: Token budget for the rendered emails of a single chunk
+        render: Function that renders an email the way it will appear in the prompt
+        max_emails: Optional cap on the number of emails per chunk
+        
+    Returns:
+        List[List[Email]]: The chunks, in order
+    """
+    chunks: List[List[Email]] = []
+    current: List[Email] = []
+    current_tokens = 0
+    
+    for email in emails:
+        tokens = estimate_tokens(render(email))
+        over_budget = current and current_tokens + tokens > max_tokens
+        over_count = max_emails is not None and len(current) >= max_emails
+        if over_budget or over_count:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(email)
+        current_tokens += tokens
+    
+    if current:
+        chunks.append(current)
+    
+    return chunks
@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import time
+import zlib
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from email_management_system.models.email_models import Email, EmailContext, HUMAN_REVIEW, AUTOMATED
+from email_management_system.processing.encoding import clean_body
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+# Where agent decisions are logged, and where the trained model is stored
+DECISION_LOG_PATH = os.getenv("EMAIL_DECISION_LOG", os.path.join(_DATA_DIR, 'classification_decisions.jsonl'))
+MODEL_PATH = os.getenv("EMAIL_CLASSIFIER_MODEL", os.path.join(_DATA_DIR, 'local_classifier.npz'))
+
+# Emails are only classified locally when the model is at least this sure
+CONFIDENCE_THRESHOLD = float(os.getenv("EMAIL_CLASSIFIER_THRESHOLD", "0.9"))
+
+# Size of the hashed feature space (must be a power of two)
+N_FEATURES = 2 ** 18
+
+_WORD = re.compile(r"[a-z0-9#']+")
+_DIGITS = re.compile(r"\d+")
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(_DIGITS.sub("#", text.lower()))
+
+def email_features(sender: str, subject: str, body: str, n_features: int = N_FEATURES) -> np.ndarray:
+    """
+    Hash an email into a set of feature indices.
+
+    Features are sender parts, subject words, body words and body word bigrams,
+    each namespaced and hashed with CRC32 so they are stable across processes.
+    A constant feature acts as the bias term.
+
+    Returns:
+        np.ndarray: Sorted unique feature indices
+    """
+    tokens = ["__bias__"]
+    local, _, domain = sender.lower().strip().partition("@")
+    tokens.append(f"s:{_DIGITS.sub('#', local)}")
+    tokens.extend(f"d:{part}" for part in domain.split(".") if part)
+    tokens.append(f"d:{domain}")
+    tokens.extend(f"t:{word}" for word in _words(subject))
+    body_words = _words(clean_body(body, max_chars=2000))
+    tokens.extend(f"b:{word}" for word in body_words)
+    tokens.extend(f"b:{a}_{b}" for a, b in zip(body_words, body_words[1:]))
+    mask = n_features - 1
+    return np.unique(np.fromiter((zlib.crc32(token.encode("utf-8")) & mask for token in tokens), dtype=np.int64))
+
+class _Batch:
+    """A batch of emails as a flat sparse matrix: feature indices, per-row weights and row offsets."""
+
+    def __init__(self, rows: List[np.ndarray]):
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        self.indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        # Rows are L2-normalized so long emails do not dominate
+        self.values = np.repeat(1.0 / np.sqrt(lengths), lengths)
+        self.lengths = lengths
+
+    def scores(self, weights: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(weights[self.indices] * self.values, self.offsets)
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+class LocalClassifier:
+    """
+    Pre-classifier backed by a hashed n-gram logistic regression model.
+
+    The model is trained offline from the log of decisions the manager agent
+    made (see classifier_cli.py) and runs in-process in microseconds per
+    email. Emails the model is at least `threshold` sure about are classified
+    locally; the rest go to the agent, whose decisions are appended to the log
+    for the next training run.
+    """
+
+    name = "local_classifier"
+
+    def __init__(self, model_path: str = MODEL_PATH, log_path: str = DECISION_LOG_PATH, threshold: float = CONFIDENCE_THRESHOLD):
+        self.model_path = model_path
+        self.log_path = log_path
+        self.threshold = threshold
+        self.weights: np.ndarray = None
+        if model_path and os.path.exists(model_path):
+            self.weights = np.load(model_path)["weights"]
+
+        # Metrics
+        self.evaluated = 0
+        self.decided = 0
+        self.seconds = 0.0
+
+    def predict_proba(self, emails: List[Email]) -> np.ndarray:
+        """Probability that each email is automatable."""
+        batch = _Batch([email_features(e.sender, e.subject, e.body, len(self.weights)) for e in emails])
+        return _sigmoid(batch.scores(self.weights))
+
+    def classify(self, emails: List[Email]) -> Dict[str, str]:
+        """Classify the emails the model is confident about (email_id -> label)."""
+        if self.weights is None or not emails:
+            return {}
+        start = time.perf_counter()
+        probabilities = self.predict_proba(emails)
+        decisions = {}
+        for email, p in zip(emails, probabilities):
+            if p >= self.threshold:
+                decisions[email.id] = AUTOMATED
+            elif p <= 1.0 - self.threshold:
+                decisions[email.id] = HUMAN_REVIEW
+        self.seconds += time.perf_counter() - start
+        self.evaluated += len(emails)
+        self.decided += len(decisions)
+        return decisions
+
+    def learn(self, emails: List[Email], context: EmailContext):
+        """Append the agent's decisions for these emails to the decision log."""
+        if not self.log_path:
+            return
+        classifications = context.get_classifications()
+        records = [
+            {"sender": e.sender, "subject": e.subject, "body": clean_body(e.body, max_chars=2000), "label": classifications[e.id]}
+            for e in emails if e.id in classifications
+        ]
+        if not records:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get coverage and latency metrics."""
+        return {
+            "model_loaded": self.weights is not None,
+            "evaluated": self.evaluated,
+            "decided": self.decided,
+            "coverage": self.decided / self.evaluated if self.evaluated else 0.0,
+            "microseconds_per_email": 1e6 * self.seconds / self.evaluated if self.evaluated else 0.0
+        }
+
+def read_decision_log(path: str) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Read a decision log into feature rows and labels (1 = automated)."""
+    rows, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("label") not in (HUMAN_REVIEW, AUTOMATED):
+                continue
+            rows.append(email_features(record["sender"], record["subject"], record["body"]))
+            labels.append(1.0 if record["label"] == AUTOMATED else 0.0)
+    return rows, np.array(labels)
+
+def train(rows: List[np.ndarray], labels: np.ndarray, epochs: int = 20, learning_rate: float = 1.0, l2: float = 1e-6, batch_size: int = 256, seed: int = 0) -> np.ndarray:
+    """
+    Train logistic regression weights with mini-batch gradient descent.
+
+    Returns:
+        np.ndarray: The weight vector
+    """
+    weights = np.zeros(N_FEATURES)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(rows))
+        for start in range(0, len(order), batch_size):
+            picked = order[start:start + batch_size]
+            batch = _Batch([rows[i] for i in picked])
+            errors = _sigmoid(batch.scores(weights)) - labels[picked]
+            gradient = np.zeros_like(weights)
+            np.add.at(gradient, batch.indices, np.repeat(errors, batch.lengths) * batch.values)
+            weights -= learning_rate * (gradient / len(picked) + l2 * weights)
+    return weights
+
+def evaluate(weights: np.ndarray, rows: List[np.ndarray], labels: np.ndarray, threshold: float = CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """Report how often the model agrees with the agent, overall and on the emails it would decide."""
+    if not rows:
+        return {"examples": 0}
+    p = _sigmoid(_Batch(rows).scores(weights))
+    predicted = (p >= 0.5).astype(float)
+    confident = (p >= threshold) | (p <= 1.0 - threshold)
+    return {
+        "examples": len(rows),
+        "agreement": float((predicted == labels).mean()),
+        "coverage": float(confident.mean()),
+        "confident_agreement": float((predicted[confident] == labels[confident]).mean()) if confident.any() else 0.0
+    }
@@ -0,0 +1,52 @@
+import argparse
+import os
+import numpy as np
+from email_management_system.processing.classifier import (
+    DECISION_LOG_PATH,
+    MODEL_PATH,
+    CONFIDENCE_THRESHOLD,
+    read_decision_log,
+    train,
+    evaluate
+)
+
+def main():
+    """
+    Train or evaluate the local classifier from the command line.
+    
+    python -m email_management_system.processing.classifier_cli train
+    python -m email_management_system.processing.classifier_cli evaluate --log other_decisions.jsonl
+    """
+    parser = argparse.ArgumentParser(description='Train and evaluate the local email classifier')
+    parser.add_argument('command', choices=['train', 'evaluate'])
+    parser.add_argument('--log', default=DECISION_LOG_PATH, help='Decision log (JSON lines)')
+    parser.add_argument('--model', default=MODEL_PATH, help='Model file (.npz)')
+    parser.add_argument('--threshold', type=float, default=CONFIDENCE_THRESHOLD, help='Confidence threshold for local decisions')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of the log held out for evaluation when training')
+    parser.add_argument('--epochs', type=int, default=20)
+    args = parser.parse_args()
+
+    rows, labels = read_decision_log(args.log)
+    print(f"Loaded {len(rows)} decisions from {args.log}")
+
+    if args.command == 'train':
+        # Every n-th example is held out, which keeps the split deterministic
+        step = int(round(1 / args.holdout)) if args.holdout > 0 else 0
+        held_out = [i for i in range(len(rows)) if step and i % step == 0]
+        held = set(held_out)
+        trained = [i for i in range(len(rows)) if i not in held]
+        weights = train([rows[i] for i in trained], labels[trained], epochs=args.epochs)
+        os.makedirs(os.path.dirname(os.path.abspath(args.model)), exist_ok=True)
+        np.savez_compressed(args.model, weights=weights)
+        print(f"Trained on {len(trained)} decisions, saved model to {args.model}")
+        report = evaluate(weights, [rows[i] for i in held_out], labels[held_out], args.threshold)
+    else:
+        weights = np.load(args.model)["weights"]
+        report = evaluate(weights, rows, labels, args.threshold)
+
+    print("\n=== Agreement with Agent ===")
+    for key, value in report.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import json
+import re
+from typing import List, Dict, Any
+from email_management_system.models.email_models import Email, EmailContext
+from email_management_system.processing.chunking import estimate_tokens
+
+# Bodies longer than this (after cleaning) are truncated in prompts
+MAX_BODY_CHARS = 600
+
+# Start of a quoted reply chain - everything from here on is dropped
+_QUOTE_HEADER = re.compile(
+    r"^\s*(On\s.+wrote:|-{2,}\s*Original Message\s*-{2,}|-{2,}\s*Forwarded message\s*-{2,}|From:\s.+@.+)\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# Start of a signature block - everything from here on is dropped
+_SIGNATURE = re.compile(r"^(--\s?|__+|Sent from my .+)$", re.MULTILINE)
+_QUOTED_LINE = re.compile(r"^\s*>.*$", re.MULTILINE)
+_WHITESPACE = re.compile(r"\s+")
+
+def clean_body(body: str, max_chars: int = MAX_BODY_CHARS, strip: bool = True) -> str:
+    """
+    Reduce an email body to the text the model actually needs.
+    
+    Drops quoted reply chains and signatures, collapses all whitespace into
+    single spaces and truncates the result to max_chars.
+    
+    Args:
+        body: The raw email body
+        max_chars: Maximum number of characters to keep
+        strip: False for a body processing.preprocess has already stripped, which
+            keeps the forwarded content it left in
+        
+    Returns:
+        str: The cleaned body on a single line
+    """
+    if not body:
+        return ""
+    
+    text = body
+    if strip:
+        # Searching from position 1 keeps a body that *starts* with a header line
+        match = _QUOTE_HEADER.search(text, 1)
+        if match:
+            text = text[:match.start()]
+        match = _SIGNATURE.search(text, 1)
+        if match:
+            text = text[:match.start()]
+        text = _QUOTED_LINE.sub("", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip() + "…"
+    return text
+
+def _field(value: str) -> str:
+    """Make a value safe for a single pipe-separated cell."""
+    return _WHITESPACE.sub(" ", value or "").replace("|", "/").strip()
+
+def encode_row(alias: str, email: Email, max_body_chars: int = MAX_BODY_CHARS) -> str:
+    """Render one email as a single pipe-separated table row, with its normalized body if it was preprocessed."""
+    return "|".join([
+        alias,
+        _field(email.sender),
+        _field(email.subject),
+        _field(email.timestamp[:16]),
+        clean_body(email.text, max_body_chars, strip=not email.is_stripped).replace("|", "/")
+    ])
+
+def _json_size(emails: List[Email]) -> int:
+    """Token estimate for the pretty-printed JSON the prompts used to contain."""
+    return estimate_tokens(json.dumps([email.model_dump() for email in emails], indent=2))
+
+def encode_emails(emails: List[Email], context: EmailContext, max_body_chars: int = MAX_BODY_CHARS) -> str:
+    """
+    Encode emails as a compact table for an agent prompt.
+    
+    Each email gets a short alias (e1, e2, ...) from the context, which maps it
+    back to the real email id whenever a tool is called with it. Columns that
+    have the same value for every email (recipient, folder) are stated once in
+    the header instead of on every row. The estimated token savings against the
+    old JSON encoding are recorded on the context.
+    
+    Args:
+        emails: Emails to encode
+        context: The job context that owns the aliases
+        max_body_chars: Maximum body length per email
+        
+    Returns:
+        str: The encoded emails
+    """
+    if not emails:
+        return "No emails."
+    
+    lines = []
+    recipients = {email.recipient for email in emails}
+    folders = {email.folder for email in emails}
+    if len(recipients) == 1:
+        lines.append(f"All emails sent to {next(iter(recipients))}.")
+    if len(folders) == 1:
+        lines.append(f"All emails are in the {next(iter(folders))} folder.")
+    lines.append("Columns: id|from|subject|date|body (use the short id when calling tools)")
+    
+    for email in emails:
+        row = encode_row(context.alias_for(email.id), email, max_body_chars)
+        if len(recipients) > 1:
+            row = f"{row}|to:{_field(email.recipient)}"
+        if len(folders) > 1:
+            row = f"{row}|folder:{email.folder}"
+        lines.append(row)
+    
+    encoded = "\n".join(lines)
+    context.record_prompt_encoding(_json_size(emails), estimate_tokens(encoded))
+    return encoded
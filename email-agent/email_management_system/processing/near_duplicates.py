@@ -0,0 +1,208 @@
+import os
+import re
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from email_management_system.models.email_models import Email
+
+# Send one representative per cluster of near-duplicate emails to the model (EMAIL_NEAR_DUPLICATES=0 sends every email)
+NEAR_DUPLICATES_ENABLED = os.getenv("EMAIL_NEAR_DUPLICATES", "1") != "0"
+
+# Estimated Jaccard similarity of the word 3-grams above which two emails are near-duplicates
+SIMILARITY_THRESHOLD = float(os.getenv("EMAIL_NEAR_DUPLICATE_THRESHOLD", "0.7"))
+
+# MinHash signature length, split into LSH bands of NUM_PERMUTATIONS // BANDS rows each.
+# 16 bands of 4 rows make emails with a similarity of about 0.5 or more candidates;
+# candidates are then checked against the threshold.
+NUM_PERMUTATIONS = 64
+BANDS = 16
+
+# Only the start of the body is shingled; templates differ from each other early on
+MAX_SHINGLE_CHARS = 1000
+
+# Words without digits, so numbers, ids and amounts never tell emails apart;
+# the separator between subject and body counts as a word
+_WORD = re.compile(r"[^\W\d_]+|\x1f")
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+def _words(subject: str, body: str) -> List[str]:
+    return _WORD.findall(f"{subject}\x1f{body[:MAX_SHINGLE_CHARS]}".lower())
+
+def _domain(sender: str) -> str:
+    return sender.lower().strip().rpartition("@")[2].rstrip(">")
+
+class NearDuplicateClusterer:
+    """
+    Groups a job's emails into clusters of near-duplicates, such as copies of
+    one notification template that only differ in numbers or names.
+
+    Emails from the same sender domain whose subject and body words are the
+    same once digits are left out are exact duplicates. The remaining emails
+    are compared by MinHash signatures of their word 3-grams, bucketed with
+    locality-sensitive hashing; candidate pairs whose estimated similarity
+    reaches the threshold end up in one cluster. Everything is vectorized
+    with NumPy, so a job of 100k emails clusters in seconds.
+    """
+
+    name = "near_duplicates"
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        num_permutations: int = NUM_PERMUTATIONS,
+        bands: int = BANDS,
+        seed: int = 1
+    ):
+        """
+        Args:
+            threshold: Estimated Jaccard similarity at which two emails are near-duplicates
+            num_permutations: Length of the MinHash signatures
+            bands: Number of LSH bands (must divide num_permutations)
+            seed: Seed of the hash functions, so clusters are reproducible
+        """
+        if num_permutations % bands:
+            raise ValueError(f"bands ({bands}) must divide num_permutations ({num_permutations})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_permutations // bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions h(x) = (a * x + b) >> 32 with odd a, one per permutation
+        self._a = rng.integers(1, 2 ** 63, size=num_permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_permutations, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2 ** 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+    def cluster(self, emails: List[Email]) -> Tuple[List[List[Email]], Dict[str, Any]]:
+        """
+        Cluster emails into near-duplicate groups.
+
+        Args:
+            emails: Emails of one job
+
+        Returns:
+            tuple: The clusters in order of their first email (each starting with its
+            representative, singletons included), and metrics of the reduction
+        """
+        start = time.perf_counter()
+
+        # Exact duplicates of a template share a key; only the first of each goes through MinHash
+        keys: Dict[Tuple[str, str], int] = {}
+        template_of = np.empty(len(emails), dtype=np.int64)
+        template_words: List[List[str]] = []
+        template_domains: List[str] = []
+        for index, email in enumerate(emails):
+            domain = _domain(email.sender)
+            words = _words(email.subject, email.text)
+            key = (domain, " ".join(words))
+            template = keys.get(key)
+            if template is None:
+                template = keys[key] = len(template_words)
+                template_words.append(words)
+                template_domains.append(domain)
+            template_of[index] = template
+
+        labels = self._near_duplicate_labels(template_words, template_domains)
+
+        # Label every email with the first email of its cluster
+        first_email = np.full(len(template_words), len(emails), dtype=np.int64)
+        np.minimum.at(first_email, labels[template_of], np.arange(len(emails)))
+        email_labels = first_email[labels[template_of]]
+
+        members: Dict[int, List[Email]] = {}
+        for index, label in enumerate(email_labels.tolist()):
+            members.setdefault(label, []).append(emails[index])
+        clusters = list(members.values())
+
+        duplicates = [cluster for cluster in clusters if len(cluster) > 1]
+        return clusters, {
+            "emails": len(emails),
+            "templates": len(template_words),
+            "clusters": len(duplicates),
+            "clustered_emails": sum(len(cluster) for cluster in duplicates),
+            "largest_cluster": max((len(cluster) for cluster in clusters), default=0),
+            "sent_to_model": len(clusters),
+            "reduction": 1.0 - len(clusters) / len(emails) if emails else 0.0,
+            "seconds": time.perf_counter() - start
+        }
+
+    def _near_duplicate_labels(self, documents: List[List[str]], domains: List[str]) -> np.ndarray:
+        """Connected components of the near-duplicate graph, as the smallest document index of each component."""
+        count = len(documents)
+        if count < 2:
+            return np.arange(count, dtype=np.int64)
+
+        signatures = self._signatures(documents)
+
+        # LSH: documents sharing a band (and a sender domain) are candidates
+        vocabulary: Dict[str, int] = {}
+        domain_ids = np.array([vocabulary.setdefault(domain, len(vocabulary)) for domain in domains], dtype=np.uint64)
+        sources, targets = [], []
+        for band in range(self.bands):
+            rows = signatures[:, band * self.rows:(band + 1) * self.rows]
+            keys = (rows * self._band_mix).sum(axis=1) ^ (domain_ids * np.uint64(0x9E3779B97F4A7C15))
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            new_group = np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])
+            # Every document of a bucket is linked to the bucket's first document
+            firsts = order[np.flatnonzero(new_group)][np.cumsum(new_group) - 1]
+            linked = firsts != order
+            sources.append(order[linked])
+            targets.append(firsts[linked])
+
+        u, v = np.concatenate(sources), np.concatenate(targets)
+        if len(u):
+            pairs = np.unique(np.stack([np.minimum(u, v), np.maximum(u, v)], axis=1), axis=0)
+            u, v = pairs[:, 0], pairs[:, 1]
+            similar = (signatures[u] == signatures[v]).mean(axis=1) >= self.threshold
+            u, v = u[similar], v[similar]
+        return self._components(count, u, v)
+
+    def _signatures(self, documents: List[List[str]]) -> np.ndarray:
+        """MinHash signatures of the word 3-grams of each document, one row per document."""
+        vocabulary: Dict[str, int] = {}
+        ids, lengths = [], []
+        for words in documents:
+            # Short documents are padded so every document has at least one 3-gram
+            row = [vocabulary.setdefault(word, len(vocabulary)) for word in words] + [-1, -2]
+            ids.extend(row)
+            lengths.append(len(row))
+        ids = np.array(ids, dtype=np.int64).astype(np.uint64)
+        lengths = np.array(lengths, dtype=np.int64)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+
+        # A 3-gram starts at every position except the last two of each document
+        valid = np.ones(len(ids) - 2, dtype=bool)
+        valid[ends[:-1] - 2] = False
+        valid[ends[:-1] - 1] = False
+        positions = np.flatnonzero(valid)
+        shingles = (
+            ids[positions] * np.uint64(0x9E3779B97F4A7C15)
+            ^ ids[positions + 1] * np.uint64(0xC2B2AE3D27D4EB4F)
+            ^ ids[positions + 2] * np.uint64(0x165667B19E3779F9)
+        )
+        # Offsets of each document's first 3-gram in the shingle array
+        offsets = starts - 2 * np.arange(len(documents), dtype=np.int64)
+
+        signatures = np.empty((len(documents), len(self._a)), dtype=np.uint64)
+        for column, (a, b) in enumerate(zip(self._a, self._b)):
+            signatures[:, column] = np.minimum.reduceat(((shingles * a + b) >> np.uint64(32)) & _MASK32, offsets)
+        return signatures
+
+    @staticmethod
+    def _components(count: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """Label every node with the smallest node of its connected component."""
+        labels = np.arange(count, dtype=np.int64)
+        while len(u):
+            lowest = np.minimum(labels[u], labels[v])
+            previous = labels.copy()
+            np.minimum.at(labels, u, lowest)
+            np.minimum.at(labels, v, lowest)
+            # Pointer jumping: follow labels to their own labels until they settle
+            while True:
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                labels = jumped
+            if np.array_equal(labels, previous):
+                break
+        return labels
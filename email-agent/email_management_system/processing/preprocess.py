@@ -0,0 +1,422 @@
+import asyncio
+import email
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.message import Message
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from email_management_system.models.email_models import Email, NormalizedBody
+from email_management_system.processing.chunking import estimate_tokens
+
+# Preprocess email bodies before the agents see them (EMAIL_PREPROCESS=0 sends raw bodies)
+PREPROCESS_ENABLED = os.getenv("EMAIL_PREPROCESS", "1") != "0"
+
+# Worker processes of the preprocessing pool (1 or less preprocesses in the calling process)
+PREPROCESS_WORKERS = int(os.getenv("EMAIL_PREPROCESS_WORKERS", str(os.cpu_count() or 1)))
+# Jobs with fewer distinct bodies than this are preprocessed inline; the pool only pays off for big jobs
+POOL_MIN_BODIES = int(os.getenv("EMAIL_PREPROCESS_POOL_MIN", "64"))
+# Bodies sent to a worker process per task
+POOL_BATCH_SIZE = 32
+
+# Headers that make a body a MIME message rather than plain text
+_MIME_HEADER = re.compile(r"^(MIME-Version|Content-Type|Content-Transfer-Encoding):", re.IGNORECASE | re.MULTILINE)
+_HEADER_LINE = re.compile(r"^[A-Za-z][A-Za-z0-9-]*:\s")
+# A multipart body pasted without its headers: it starts with a boundary line
+_BOUNDARY_LINE = re.compile(r"\A\s*--([^\s-][^\r\n]*?)\s*$", re.MULTILINE)
+_HTML_TAG = re.compile(r"<(html|head|body|div|p|br|table|span|a|font|td)\b[^>]*>", re.IGNORECASE)
+
+# Start of a quoted reply chain (also the localized headers of common clients) - everything from here on is dropped.
+# Forwarded messages are content the sender is passing on, so "Forwarded message" markers are not matched.
+_QUOTE_HEADER = re.compile(
+    r"^\s*(On\s.+wrote:|Le\s.+a\s+écrit\s*:|Am\s.+schrieb.*:|El\s.+escribió:|"
+    r"-{2,}\s*(Original Message|Ursprüngliche Nachricht|Message d'origine)\s*-{2,})\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# A "From: someone@example.com" header line, which starts a quoted reply only if its header block has a reply subject
+_FROM_HEADER = re.compile(r"^\s*(From|Von|De)\s*:\s.+@.+$", re.IGNORECASE | re.MULTILINE)
+# Marks a quoted block as a forwarded message, which is kept
+_FORWARD_MARKER = re.compile(
+    r"-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:|^\s*(Subject|Betreff|Objet|Asunto)\s*:\s*(fwd?|wg|tr|rv)\s*:",
+    re.IGNORECASE | re.MULTILINE
+)
+_REPLY_SUBJECT = re.compile(r"^\s*(Subject|Betreff|Objet|Asunto)\s*:\s*(re|aw|antw|sv|rif|r)\s*:", re.IGNORECASE)
+MAX_HEADER_BLOCK_LINES = 6
+_QUOTED_LINE = re.compile(r"^\s*>.*(\n|$)", re.MULTILINE)
+# Start of a signature block - everything from here on is dropped
+_SIGNATURE = re.compile(r"^(--\s?|__+|Sent from my .+|Get Outlook for .+)$", re.MULTILINE)
+# A closing line followed by a short block of name and contact lines is a signature too
+_CLOSING = re.compile(
+    r"^\s*(best( regards| wishes)?|kind regards|warm regards|regards|cheers|thanks( again)?|thank you|many thanks|"
+    r"sincerely|yours( truly| sincerely)?|mit freundlichen grüßen|viele grüße|cordialement|bien à vous|"
+    r"saludos|atentamente|cordiali saluti|met vriendelijke groet)\s*[,.!]?\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+MAX_SIGNATURE_LINES = 6
+MAX_SIGNATURE_LINE_CHARS = 60
+# Contact details in a signature: an email address, a web address or a phone number
+_CONTACT_DETAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+|https?://|www\.|\+?\d[\d ()./-]{6,}\d", re.IGNORECASE)
+# A name, job title or company: a few words, mostly capitalized, without sentence punctuation
+_NAME_WORD = re.compile(r"[^\W\d_][\w'.&-]*,?$")
+MAX_NAME_WORDS = 6
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_WORD = re.compile(r"[^\W\d_]+")
+
+# Frequent short words of each language; the language with the most hits wins
+_STOPWORDS = {
+    "en": {"the", "and", "you", "that", "for", "with", "this", "are", "have", "your", "will", "not", "please", "our", "from", "is", "to", "of"},
+    "de": {"der", "die", "und", "das", "ist", "nicht", "sie", "ich", "mit", "für", "wir", "ihre", "bitte", "auf", "ein", "eine", "zu", "den"},
+    "fr": {"le", "la", "les", "et", "est", "vous", "nous", "pour", "dans", "une", "des", "pas", "avec", "merci", "sur", "du", "que", "votre"},
+    "es": {"el", "la", "los", "las", "y", "es", "usted", "para", "con", "una", "por", "que", "del", "gracias", "su", "no", "se", "en"},
+    "it": {"il", "la", "che", "di", "e", "per", "non", "con", "una", "sono", "grazie", "della", "nel", "gli", "si", "lo", "del", "vostro"},
+    "nl": {"de", "het", "een", "en", "van", "is", "niet", "voor", "met", "wij", "u", "uw", "dat", "op", "ik", "zijn", "bedankt", "graag"},
+    "pt": {"o", "a", "os", "as", "e", "de", "que", "para", "com", "não", "uma", "obrigado", "você", "por", "do", "da", "em", "seu"}
+}
+LANGUAGE_SAMPLE_WORDS = 400
+MIN_LANGUAGE_HITS = 3
+
+class _HTMLText(HTMLParser):
+    """
+    Collects the visible text of an HTML body, leaving out scripts, styles and quoted replies.
+
+    Clients put forwarded messages in the same quote blocks as replies, so the
+    text of a quote block is collected and only dropped when it is not a
+    forwarded message.
+    """
+
+    _BLOCKS = {"p", "div", "br", "tr", "table", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "section", "article"}
+    _HIDDEN = {"script", "style", "head", "title", "template"}
+    _QUOTE_CLASSES = re.compile(r"gmail_quote|yahoo_quoted|moz-cite-prefix|OutlookMessageHeader", re.IGNORECASE)
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.quote_stripped = False
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._quote_tag: Optional[str] = None
+        self._quote_depth = 0
+        self._quote_parts: List[str] = []
+
+    @property
+    def _out(self) -> List[str]:
+        return self._quote_parts if self._quote_tag is not None else self.parts
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if self._quote_tag is None and (tag == "blockquote" or self._QUOTE_CLASSES.search(dict(attrs).get("class") or "")):
+            self._quote_tag, self._quote_depth, self._quote_parts = tag, 1, []
+            return
+        if tag == self._quote_tag:
+            self._quote_depth += 1
+        if tag in self._HIDDEN:
+            self._skip_tag, self._skip_depth = tag, 1
+        elif tag == "li":
+            self._out.append("\n- ")
+        elif tag in self._BLOCKS:
+            self._out.append("\n")
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if self._skip_tag is None and tag in self._BLOCKS:
+            self._out.append("\n")
+
+    def handle_endtag(self, tag: str):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag == self._quote_tag:
+            self._quote_depth -= 1
+            if self._quote_depth == 0:
+                self.end_quote()
+                return
+        if tag in self._BLOCKS or tag == "li":
+            self._out.append("\n")
+
+    def handle_data(self, data: str):
+        if self._skip_tag is None:
+            self._out.append(data)
+
+    def end_quote(self):
+        """Keep the quote block being collected if it is a forwarded message, else drop it."""
+        if self._quote_tag is None:
+            return
+        quoted = "".join(self._quote_parts)
+        if _FORWARD_MARKER.search(quoted):
+            self.parts.extend(("\n", quoted, "\n"))
+        else:
+            self.quote_stripped = True
+        self._quote_tag, self._quote_depth, self._quote_parts = None, 0, []
+
+def html_to_text(markup: str) -> Tuple[str, bool]:
+    """
+    Convert an HTML body to plain text.
+
+    Returns:
+        tuple: The text, and whether a quoted reply (blockquote or a client's quote block that
+            is not a forwarded message) was dropped
+    """
+    parser = _HTMLText()
+    parser.feed(markup)
+    parser.close()
+    # A quote block that is never closed runs to the end of the body
+    parser.end_quote()
+    return "".join(parser.parts), parser.quote_stripped
+
+def _part_text(part: Message) -> str:
+    payload = part.get_payload(decode=True) or b""
+    try:
+        return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    except LookupError:
+        # Unknown charset: decode the bytes as well as we can
+        return payload.decode("utf-8", errors="replace")
+
+def decode_mime(body: str) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    Extract the readable part of a MIME message body.
+
+    Accepts a full message with headers, or a multipart body that starts
+    with its boundary line. The text/plain part is preferred over text/html.
+
+    Returns:
+        tuple: (text, content type of the part, attachment file names), or None if the body is not MIME
+    """
+    head = body.lstrip()[:4096]
+    if _HEADER_LINE.match(head) and _MIME_HEADER.search(head.split("\n\n", 1)[0]):
+        # The compat32 policy keeps headers as plain strings, which parses several times faster
+        message = email.message_from_string(body.lstrip())
+    else:
+        boundary = _BOUNDARY_LINE.match(body)
+        if boundary is None or f"--{boundary.group(1)}" not in body[boundary.end():]:
+            return None
+        message = email.message_from_string(
+            f'Content-Type: multipart/mixed; boundary="{boundary.group(1)}"\n\n{body.lstrip()}'
+        )
+
+    plain, html, attachments = None, None, []
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        content_type = part.get_content_type()
+        filename = part.get_filename()
+        if part.get_content_disposition() == "attachment" or (filename and not content_type.startswith("text/")):
+            attachments.append(filename or content_type)
+        elif content_type == "text/plain" and plain is None:
+            plain = _part_text(part)
+        elif content_type == "text/html" and html is None:
+            html = _part_text(part)
+
+    if plain is not None:
+        return plain, "text/plain", attachments
+    if html is not None:
+        return html, "text/html", attachments
+    return "", message.get_content_type(), attachments
+
+def _reply_header_start(text: str) -> Optional[int]:
+    """Position of the first "From:" header block whose subject marks it as a quoted reply, or None."""
+    for match in _FROM_HEADER.finditer(text, 1):
+        block = text[match.end():].lstrip("\n").split("\n")[:MAX_HEADER_BLOCK_LINES]
+        if any(_REPLY_SUBJECT.match(line) for line in block):
+            return match.start()
+    return None
+
+def strip_quoted_reply(text: str) -> Tuple[str, bool]:
+    """
+    Drop the quoted reply chain and any quoted (>) lines. Returns the text and whether anything was dropped.
+
+    Forwarded messages are kept: neither a "Forwarded message" marker nor a
+    "From:" header block starts a quoted reply, unless the block's subject is
+    a reply (Re:, AW:, ...).
+    """
+    stripped = text
+    # Searching from position 1 keeps a body that *starts* with a header line
+    match = _QUOTE_HEADER.search(stripped, 1)
+    starts = [start for start in (match.start() if match else None, _reply_header_start(stripped)) if start is not None]
+    if starts:
+        stripped = stripped[:min(starts)]
+    stripped = _QUOTED_LINE.sub("", stripped)
+    return stripped, stripped != text
+
+def _is_signature_line(line: str) -> bool:
+    """Whether a line after a closing phrase looks like part of a signature: contact details, or a name or title."""
+    if len(line) > MAX_SIGNATURE_LINE_CHARS:
+        return False
+    if _CONTACT_DETAIL.search(line):
+        return True
+    words = line.split()
+    if len(words) > MAX_NAME_WORDS or not all(_NAME_WORD.match(word) for word in words):
+        return False
+    # "Head of Sales" passes, "Call me tomorrow" does not
+    return sum(word[0].isupper() for word in words) * 2 >= len(words)
+
+def strip_signature(text: str) -> Tuple[str, bool]:
+    """
+    Drop a signature block. Returns the text and whether it was dropped.
+
+    A signature starts at a "-- " line (or a client's "Sent from my ..."
+    line), or at a closing phrase followed by nothing but a short block of
+    names, titles and contact details. Text after a closing phrase that reads
+    like anything else (a P.S., a question) is kept, closing phrase and all.
+    """
+    match = _SIGNATURE.search(text, 1)
+    if match:
+        return text[:match.start()], True
+
+    for match in reversed(list(_CLOSING.finditer(text))):
+        if match.start() == 0:
+            break
+        rest = [line.strip() for line in text[match.end():].split("\n") if line.strip()]
+        if len(rest) <= MAX_SIGNATURE_LINES and all(_is_signature_line(line) for line in rest):
+            return text[:match.start()], True
+        break
+    return text, False
+
+def detect_language(text: str) -> str:
+    """Guess the language of a text from its most frequent short words. Returns an ISO 639-1 code or "und"."""
+    words = _WORD.findall(text.lower())[:LANGUAGE_SAMPLE_WORDS]
+    if not words:
+        return "und"
+    hits = {language: sum(1 for word in words if word in stopwords) for language, stopwords in _STOPWORDS.items()}
+    language, best = max(hits.items(), key=lambda item: item[1])
+    return language if best >= MIN_LANGUAGE_HITS else "und"
+
+def _tidy(text: str) -> str:
+    lines = [_SPACES.sub(" ", line).strip() for line in text.replace("\r\n", "\n").split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+def preprocess_body(body: str) -> NormalizedBody:
+    """
+    Normalize one email body.
+
+    Decodes MIME, converts HTML to text, strips quoted replies and the
+    signature, and detects the language and length of what is left. Line
+    breaks are kept; prompts collapse them further (see clean_body).
+
+    Args:
+        body: The raw email body
+
+    Returns:
+        NormalizedBody: The normalized text and what was found out about it
+    """
+    text, content_type, attachments = body or "", "text/plain", []
+    decoded = decode_mime(text) if text else None
+    if decoded is not None:
+        text, content_type, attachments = decoded
+    elif _HTML_TAG.search(text):
+        content_type = "text/html"
+
+    quote_stripped = False
+    if content_type == "text/html":
+        text, quote_stripped = html_to_text(text)
+    text, quoted = strip_quoted_reply(text)
+    text, signature_stripped = strip_signature(_tidy(text))
+    text = _tidy(text)
+
+    return NormalizedBody(
+        text=text,
+        language=detect_language(text),
+        char_count=len(text),
+        word_count=len(_WORD.findall(text)),
+        token_count=estimate_tokens(text),
+        content_type=content_type,
+        mime=decoded is not None,
+        attachments=attachments,
+        quote_stripped=quote_stripped or quoted,
+        signature_stripped=signature_stripped
+    )
+
+def _preprocess_batch(bodies: List[str]) -> List[NormalizedBody]:
+    """Pool task: normalize a batch of bodies."""
+    return [preprocess_body(body) for body in bodies]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    """The process-wide preprocessing pool, started on first use."""
+    global _pool
+    if _pool is None:
+        # Spawned workers don't inherit the server's threads and open connections
+        _pool = ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_preprocess_pool():
+    """Stop the worker processes of the preprocessing pool."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+async def preprocess_emails(emails: List[Email]) -> Dict[str, Any]:
+    """
+    Normalize the bodies of emails and cache the result on each Email (Email.normalized).
+
+    Emails that were already preprocessed are skipped and identical bodies are
+    normalized once. Big jobs are spread over the worker processes of the
+    preprocessing pool; small ones run inline, where starting the work in
+    another process would cost more than it saves. If there is no pool (one
+    worker) or it breaks, a big job is preprocessed in a thread instead.
+
+    Args:
+        emails: Emails to preprocess
+
+    Returns:
+        dict: What was done: counts, languages, tokens before and after, worker count and seconds
+    """
+    start = time.perf_counter()
+    pending: Dict[str, List[Email]] = {}
+    for message in emails:
+        if message.normalized is None:
+            pending.setdefault(message.body or "", []).append(message)
+    bodies = list(pending)
+
+    workers = 0
+    results: List[NormalizedBody] = []
+    big = len(bodies) >= POOL_MIN_BODIES
+    if big and PREPROCESS_WORKERS > 1:
+        loop = asyncio.get_running_loop()
+        batches = [bodies[i:i + POOL_BATCH_SIZE] for i in range(0, len(bodies), POOL_BATCH_SIZE)]
+        try:
+            pool = _get_pool()
+            for batch in await asyncio.gather(*(loop.run_in_executor(pool, _preprocess_batch, batch) for batch in batches)):
+                results.extend(batch)
+            workers = PREPROCESS_WORKERS
+        except BrokenProcessPool as e:
+            print(f"Preprocessing pool failed, preprocessing inline: {str(e)}")
+            shutdown_preprocess_pool()
+            results = []
+    if len(results) != len(bodies):
+        # Without a pool a big job still runs off the event loop, so status requests are served meanwhile
+        results = await asyncio.to_thread(_preprocess_batch, bodies) if big else _preprocess_batch(bodies)
+
+    for body, normalized in zip(bodies, results):
+        for message in pending[body]:
+            message.normalized = normalized
+
+    processed = [message for group in pending.values() for message in group]
+    languages: Dict[str, int] = {}
+    for message in processed:
+        languages[message.normalized.language] = languages.get(message.normalized.language, 0) + 1
+    return {
+        "emails": len(processed),
+        "already_preprocessed": len(emails) - len(processed),
+        "distinct_bodies": len(bodies),
+        "mime": sum(1 for m in processed if m.normalized.mime),
+        "html": sum(1 for m in processed if m.normalized.content_type == "text/html"),
+        "quotes_stripped": sum(1 for m in processed if m.normalized.quote_stripped),
+        "signatures_stripped": sum(1 for m in processed if m.normalized.signature_stripped),
+        "languages": languages,
+        "raw_tokens": sum(estimate_tokens(m.body) for m in processed),
+        "text_tokens": sum(m.normalized.token_count for m in processed),
+        "workers": workers,
+        "seconds": time.perf_counter() - start
+    }
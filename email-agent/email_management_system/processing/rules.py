@@ -0,0 +1,173 @@
+import json
+import os
+import re
+from collections import Counter
+from email.utils import parseaddr
+from typing import List, Dict, Any, Set
+from pydantic import BaseModel, Field
+from email_management_system.models.email_models import Email, HUMAN_REVIEW, AUTOMATED
+
+# Optional JSON file with a list of rules, replacing DEFAULT_RULES
+RULES_PATH = os.getenv("EMAIL_RULES_PATH")
+
+class ClassificationRule(BaseModel):
+    """
+    A deterministic classification rule.
+
+    Every condition that is set must match (at least one entry of it), and
+    conditions that are left empty are ignored. A rule with no conditions never
+    matches.
+    """
+    name: str
+    label: str = AUTOMATED  # "human_review" or "automated"
+    sender_patterns: List[str] = Field(default_factory=list)  # regexes searched in the sender address, without display name
+    domains: List[str] = Field(default_factory=list)          # sender domains, subdomains included
+    headers: List[str] = Field(default_factory=list)          # header names that must be present
+    keywords: List[str] = Field(default_factory=list)         # words or phrases in the subject or body
+
+DEFAULT_RULES = [
+    ClassificationRule(
+        name="noreply_sender",
+        sender_patterns=[r"^(no-?reply|do-?not-?reply|donotreply|notifications?|mailer-daemon)@"]
+    ),
+    ClassificationRule(
+        name="list_unsubscribe_header",
+        headers=["List-Unsubscribe"]
+    ),
+    ClassificationRule(
+        name="bulk_mail_domain",
+        domains=["mailchimp.com", "mcsv.net", "sendgrid.net", "mailgun.org", "constantcontact.com", "hubspotemail.net", "amazonses.com"]
+    ),
+    ClassificationRule(
+        name="newsletter_sender",
+        sender_patterns=[r"^(newsletters?|news|marketing|promo(tions)?|offers|deals)@"]
+    ),
+]
+
+class RuleSet:
+    """
+    Pre-classifier that routes emails matching deterministic rules.
+
+    Rules are compiled once into lookup tables so that each email is scanned a
+    single time: the sender domain and header names are looked up in dicts, and
+    all keywords of all rules are found by one combined regex over the subject
+    and body. Rules are tried in order and the first match wins.
+    """
+
+    name = "rules"
+
+    def __init__(self, rules: List[ClassificationRule] = None):
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        for rule in self.rules:
+            if rule.label not in (HUMAN_REVIEW, AUTOMATED):
+                raise ValueError(f"Rule {rule.name} has unknown label {rule.label}")
+
+        # Metrics
+        self.evaluated = 0
+        self.hits: Counter = Counter()
+
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        """Load rules from a JSON file containing a list of rule objects."""
+        with open(path) as f:
+            return cls([ClassificationRule(**rule) for rule in json.load(f)])
+
+    @classmethod
+    def load(cls) -> "RuleSet":
+        """Load the rules from EMAIL_RULES_PATH if it is set, otherwise the default rules."""
+        if RULES_PATH:
+            return cls.from_file(RULES_PATH)
+        return cls()
+
+    def _compile(self):
+        """Build the lookup tables and the combined keyword regex."""
+        self._sender_patterns: Dict[int, re.Pattern] = {}
+        self._domains: Dict[str, Set[int]] = {}
+        self._headers: Dict[str, Set[int]] = {}
+        self._keywords: Dict[str, Set[int]] = {}
+
+        for index, rule in enumerate(self.rules):
+            if rule.sender_patterns:
+                self._sender_patterns[index] = re.compile("|".join(f"(?:{p})" for p in rule.sender_patterns), re.IGNORECASE)
+            for domain in rule.domains:
+                self._domains.setdefault(domain.lower().lstrip("."), set()).add(index)
+            for header in rule.headers:
+                self._headers.setdefault(header.lower(), set()).add(index)
+            for keyword in rule.keywords:
+                self._keywords.setdefault(" ".join(keyword.lower().split()), set()).add(index)
+
+        # The combined regex reports the longest keyword at each position, so a
+        # match also satisfies every shorter keyword that is a whole-word prefix of it
+        keywords = sorted(self._keywords, key=len, reverse=True)
+        self._keyword_rules: Dict[str, Set[int]] = {}
+        for keyword in keywords:
+            rules = set()
+            for other in keywords:
+                if keyword == other or (keyword.startswith(other) and not keyword[len(other)].isalnum()):
+                    rules |= self._keywords[other]
+            self._keyword_rules[keyword] = rules
+        self._keyword_regex = None
+        if keywords:
+            alternatives = "|".join(r"\s+".join(re.escape(word) for word in keyword.split()) for keyword in keywords)
+            self._keyword_regex = re.compile(rf"(?<!\w)(?=({alternatives})(?!\w))", re.IGNORECASE)
+
+    @staticmethod
+    def _sender_address(sender: str) -> str:
+        """The bare address of a sender such as "Shop <noreply@shop.com>", lower-cased."""
+        address = parseaddr(sender)[1] or sender
+        return address.strip().lower()
+
+    def match(self, email: Email) -> ClassificationRule:
+        """Get the first rule that matches an email, or None."""
+        sender = self._sender_address(email.sender)
+
+        sender_ok = {index for index, pattern in self._sender_patterns.items() if pattern.search(sender)}
+
+        domain_ok: Set[int] = set()
+        parts = sender.rpartition("@")[2].split(".")
+        for i in range(len(parts) - 1):
+            domain_ok |= self._domains.get(".".join(parts[i:]), set())
+
+        header_ok: Set[int] = set()
+        for header in email.headers:
+            header_ok |= self._headers.get(header.lower(), set())
+
+        keyword_ok: Set[int] = set()
+        if self._keyword_regex is not None:
+            for found in self._keyword_regex.finditer(f"{email.subject}\n{email.body}"):
+                keyword_ok |= self._keyword_rules[" ".join(found.group(1).lower().split())]
+
+        for index, rule in enumerate(self.rules):
+            conditions = [
+                (rule.sender_patterns, sender_ok),
+                (rule.domains, domain_ok),
+                (rule.headers, header_ok),
+                (rule.keywords, keyword_ok),
+            ]
+            active = [satisfied for values, satisfied in conditions if values]
+            if active and all(index in satisfied for satisfied in active):
+                return rule
+        return None
+
+    def classify(self, emails: List[Email]) -> Dict[str, str]:
+        """Classify the emails matched by a rule (email_id -> label) and record hits per rule."""
+        decisions = {}
+        for email in emails:
+            self.evaluated += 1
+            rule = self.match(email)
+            if rule is not None:
+                self.hits[rule.name] += 1
+                decisions[email.id] = rule.label
+        return decisions
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get per-rule hit counts."""
+        matched = sum(self.hits.values())
+        return {
+            "evaluated": self.evaluated,
+            "matched": matched,
+            "match_rate": matched / self.evaluated if self.evaluated else 0.0,
+            "hits": dict(self.hits)
+        }
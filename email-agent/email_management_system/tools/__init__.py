@@ -1,8 +1,10 @@
 from .email_tools import (
     reply_to_email,
     unsubscribe_from_email,
+    apply_email_actions,
     save_emails_to_human_review,
     save_emails_to_automation,
+    escalate_emails,
     get_human_review_emails,
     get_automated_emails,
     add_human_review_result,
@@ -12,8 +14,10 @@ from .email_tools import (
 __all__ = [
     'reply_to_email',
     'unsubscribe_from_email',
+    'apply_email_actions',
     'save_emails_to_human_review',
     'save_emails_to_automation',
+    'escalate_emails',
     'get_human_review_emails',
     'get_automated_emails',
     'add_human_review_result',
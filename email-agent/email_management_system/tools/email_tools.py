@@ -1,7 +1,9 @@
 from typing import Dict, List, Any
 from agents.tool import function_tool
 from agents import RunContextWrapper
-from email_management_system.models.email_models import Email, EmailContext
+from email_management_system.models.email_models import Email, EmailContext, EmailAction
+from email_management_system.processing.encoding import encode_emails
+import json
 import logging
 
 # Configure logging
@@ -11,6 +13,15 @@ logger = logging.getLogger('email_tools')
 # Verbose mode flag - set to False by default
 verbose_mode = False
 
+# Actions accepted by apply_email_actions
+EMAIL_ACTIONS = ("reply", "unsubscribe", "ignore")
+
+def _reply_result(email_id: str, email: Email) -> str:
+    return f"Successfully replied to email {email_id} from {email.sender}"
+
+def _unsubscribe_result(email_id: str) -> str:
+    return f"Successfully unsubscribed from mailing list for email {email_id}"
+
 def enable_verbose_logging():
     """Enable verbose logging for all email tools."""
     global verbose_mode
@@ -59,7 +70,7 @@ def reply_to_email(context: RunContextWrapper[EmailContext], email_id: str, resp
             logger.debug(f"Sending response: {response[:50]}...")
         
         # Here you would implement actual email sending logic
-        result = f"Successfully replied to email {email_id} from {email.sender}"
+        result = _reply_result(email_id, email)
         
         # Store the result in context, including the actual response content
         context.context.add_automation_result(email_id, "reply", result, content=response)
@@ -107,7 +118,7 @@ def unsubscribe_from_email(context: RunContextWrapper[EmailContext], email_id: s
             logger.debug(f"Processing unsubscribe request")
         
         # Here you would implement actual unsubscribe logic
-        result = f"Successfully unsubscribed from mailing list for email {email_id}"
+        result = _unsubscribe_result(email_id)
         
         # Store the result in context
         context.context.add_automation_result(email_id, "unsubscribe", result)
@@ -122,6 +133,81 @@ def unsubscribe_from_email(context: RunContextWrapper[EmailContext], email_id: s
             logger.exception(f"Exception in unsubscribe_from_email: {str(e)}")
         return error_msg
 
+@function_tool
+def apply_email_actions(context: RunContextWrapper[EmailContext], actions: List[EmailAction]) -> str:
+    """
+    Reply to, unsubscribe from or ignore many emails in a single call.
+    
+    This function:
+    1. Validates every action first: the email must exist, appear only once in the
+       batch, and a reply must have a response
+    2. If any action is invalid, applies none of them; otherwise applies all of them
+    3. Adds an "email_action_performed" operation for every action, exactly like
+       reply_to_email and unsubscribe_from_email, so ignored emails count as handled too
+    
+    Args:
+        context: The agent context
+        actions: One entry per email: email_id, action ("reply", "unsubscribe" or "ignore")
+            and response (the reply text, only for "reply")
+        
+    Returns:
+        str: JSON list with the status of every action
+    """
+    if verbose_mode:
+        logger.debug(f"apply_email_actions called with {len(actions)} actions")
+    
+    try:
+        # Validate the whole batch before changing anything
+        statuses = []
+        results = []
+        seen = set()
+        for item in actions:
+            email = context.context.get_email_by_id(item.email_id)
+            error = None
+            if item.action not in EMAIL_ACTIONS:
+                error = f"Unknown action {item.action}; use one of {', '.join(EMAIL_ACTIONS)}"
+            elif not email:
+                error = f"Email with ID {item.email_id} not found"
+            elif email.id in seen:
+                error = f"Email {item.email_id} appears more than once in the batch"
+            elif item.action == "reply" and not (item.response or "").strip():
+                error = "A reply needs a response"
+            
+            if error:
+                statuses.append({"email_id": item.email_id, "status": "error", "error": error})
+                continue
+            seen.add(email.id)
+            
+            # Here you would implement actual email sending and unsubscribe logic
+            if item.action == "reply":
+                result = _reply_result(item.email_id, email)
+                results.append({"email_id": email.id, "action": "reply", "result": result, "content": item.response})
+            elif item.action == "unsubscribe":
+                result = _unsubscribe_result(item.email_id)
+                results.append({"email_id": email.id, "action": "unsubscribe", "result": result})
+            else:
+                result = f"Ignored email {item.email_id}"
+                results.append({"email_id": email.id, "action": "ignore", "result": result})
+            statuses.append({"email_id": item.email_id, "status": "ok", "result": result})
+        
+        if any(status["status"] == "error" for status in statuses):
+            # All or nothing: fix the failed items and send the whole batch again
+            for status in statuses:
+                if status["status"] == "ok":
+                    status.update(status="not_applied", result="Not applied because other actions in the batch failed")
+        else:
+            context.context.add_automation_results(results)
+        
+        if verbose_mode:
+            logger.debug(f"apply_email_actions statuses: {statuses}")
+            
+        return json.dumps(statuses)
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        if verbose_mode:
+            logger.exception(f"Exception in apply_email_actions: {str(e)}")
+        return error_msg
+
 @function_tool
 def save_emails_to_human_review(context: RunContextWrapper[EmailContext], email_ids: List[str]) -> str:
     """
@@ -199,15 +285,55 @@ def save_emails_to_automation(context: RunContextWrapper[EmailContext], email_id
         return error_msg
 
 @function_tool
-def get_human_review_emails(context: RunContextWrapper[EmailContext]) -> List[Email]:
+def escalate_emails(context: RunContextWrapper[EmailContext], email_ids: List[str], reason: str) -> str:
+    """
+    Leave emails you are not confident about for a stronger model.
+    
+    This function:
+    1. Removes the specified emails from both classification lists
+    2. Marks them for classification by the reasoning model
+    3. Adds an "emails_escalated" operation to the operations history
+       with the list of email IDs and the reason
+    
+    Args:
+        context: The agent context
+        email_ids: List of email IDs you cannot classify confidently
+        reason: Short explanation of what makes these emails hard to classify
+        
+    Returns:
+        str: Confirmation message
+    """
+    if verbose_mode:
+        logger.debug(f"escalate_emails called with {len(email_ids)} email IDs: {reason}")
+    
+    try:
+        # Save to context
+        context.context.escalate(email_ids, reason)
+        
+        result = f"Successfully escalated {len(email_ids)} emails to the reasoning model"
+        if verbose_mode:
+            logger.debug(result)
+            
+        return result
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        if verbose_mode:
+            logger.exception(f"Exception in escalate_emails: {str(e)}")
+        return error_msg
+
+@function_tool
+def get_human_review_emails(context: RunContextWrapper[EmailContext]) -> str:
     """
     Get the list of emails marked for human review.
     
+    Emails are returned as a compact table. Each row starts with a short id
+    (e.g. e3) that can be passed to the other tools in place of the full email ID.
+    
     Args:
         context: The agent context
         
     Returns:
-        List[Email]: Emails requiring human review
+        str: Encoded emails requiring human review
     """
     if verbose_mode:
         logger.debug("get_human_review_emails called")
@@ -223,29 +349,33 @@ def get_human_review_emails(context: RunContextWrapper[EmailContext]) -> List[Em
                 if len(emails) > 3:
                     logger.debug(f"... and {len(emails) - 3} more")
         
-        return emails
+        return encode_emails(emails, context.context)
     except Exception as e:
         if verbose_mode:
             logger.exception(f"Exception in get_human_review_emails: {str(e)}")
         print(f"Error retrieving human review emails: {str(e)}")
-        return []
+        return f"Error: {str(e)}"
 
 @function_tool
-def get_automated_emails(context: RunContextWrapper[EmailContext]) -> List[Email]:
+def get_automated_emails(context: RunContextWrapper[EmailContext]) -> str:
     """
-    Get the list of emails marked for automated processing.
+    Get the list of emails marked for automated processing that have not been processed yet.
+    
+    Emails that already have a result (e.g. from before a resumed job was
+    interrupted) are left out. Emails are returned as a compact table. Each row starts with a short id
+    (e.g. e3) that can be passed to the other tools in place of the full email ID.
     
     Args:
         context: The agent context
         
     Returns:
-        List[Email]: Emails for automated processing
+        str: Encoded emails for automated processing
     """
     if verbose_mode:
         logger.debug("get_automated_emails called")
     
     try:
-        emails = context.context.get_automated_emails()
+        emails = context.context.get_unprocessed_automated_emails()
         
         if verbose_mode:
             logger.debug(f"Retrieved {len(emails)} emails for automated processing")
@@ -255,12 +385,12 @@ def get_automated_emails(context: RunContextWrapper[EmailContext]) -> List[Email
                 if len(emails) > 3:
                     logger.debug(f"... and {len(emails) - 3} more")
         
-        return emails
+        return encode_emails(emails, context.context)
     except Exception as e:
         if verbose_mode:
             logger.exception(f"Exception in get_automated_emails: {str(e)}")
         print(f"Error retrieving automated emails: {str(e)}")
-        return []
+        return f"Error: {str(e)}"
 
 @function_tool
 def add_human_review_result(context: RunContextWrapper[EmailContext], email_id: str, summary: str) -> str: